@@ -0,0 +1,29 @@
+import importlib
+
+#Paquete Device: dispositivos de entrada/salida, DMA y controlador de interrupciones
+#Como en el paquete cpu, los nombres se importan la primera vez que se usan
+
+_EXPORTS = {
+    'Device': 'moduloEntradaySalida',
+    'DMAEngine': 'moduloEntradaySalida',
+    'InterruptController': 'moduloEntradaySalida',
+}
+
+_SUBMODULES = ('moduloEntradaySalida',)
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f"{__name__}.{_EXPORTS[name]}"), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
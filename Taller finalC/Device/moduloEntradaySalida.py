@@ -1,28 +1,244 @@
+import heapq
+import sys
+
+#Ciclo de "no hay eventos programados"
+NEVER = sys.maxsize
+
+
+#Clase Device: dispositivo que genera datos y pide una interrupcion
+#Conectado a un InterruptController (attach), generate_data levanta su linea de interrupcion
 class Device:
-    def __init__(self):
+    def __init__(self, name='device'):
+        self.name = name
         self.data_ready = False
         self.data = None
+        self.controller = None
+        self.line = None
 
     def generate_data(self, value):
         self.data = value
         self.data_ready = True
+        if self.controller is not None:
+            self.controller.request(self.line)
 
     def clear(self):
         self.data_ready = False
         self.data = None
+        if self.controller is not None:
+            self.controller.withdraw(self.line)
+
+    #Metodo schedule que programa generate_data(value) para el ciclo cycle de la CPU
+    def schedule(self, cycle, value=None):
+        self.controller.schedule(cycle, self.line, value)
+
+    #Metodo fire que llama la cola de eventos cuando llega el ciclo de un evento de este dispositivo
+    def fire(self, payload):
+        self.generate_data(payload)
+
+    #Metodo rebase para los dispositivos que guardan ciclos (ver InterruptController.rebase)
+    def rebase(self, offset):
+        pass
+
+    def get_state(self):
+        return {'data_ready': self.data_ready, 'data': self.data}
+
+    def set_state(self, state):
+        self.data_ready = state['data_ready']
+        self.data = state['data']
+
+
+#Clase InterruptController: varios dispositivos, cada uno en una linea con su prioridad
+#Las lineas se pueden enmascarar una por una (mask / unmask) o todas a la vez (enabled)
+#Los eventos de los dispositivos se guardan en un heap ordenado por ciclo: la CPU solo mira
+#next_event y active en cada ciclo, no le pregunta a cada dispositivo
+class InterruptController:
+    def __init__(self):
+        self.devices = []
+        self.priorities = []
+        #Rutina de servicio de cada linea: handler(cpu, line, data) o None (la de siempre, R0 = 999)
+        self.handlers = []
+        #Interrupciones atendidas por linea
+        self.counts = []
+        #Mascaras de bits por linea
+        self.pending = 0
+        self.masked = 0
+        self.enabled = True
+        #Hay alguna linea pendiente sin enmascarar
+        self.active = False
+        #Heap de eventos (ciclo, orden, linea, dato) y ciclo del primero
+        self.events = []
+        self.next_event = NEVER
+        self._sequence = 0
+
+    #Metodo attach que conecta un dispositivo y devuelve su linea
+    #priority: menor numero = mas urgente (por defecto la linea, asi la linea 0 es la mas urgente)
+    def attach(self, device, priority=None, handler=None):
+        line = len(self.devices)
+        self.devices.append(device)
+        self.priorities.append(line if priority is None else priority)
+        self.handlers.append(handler)
+        self.counts.append(0)
+        device.controller = self
+        device.line = line
+        if device.data_ready:
+            self.request(line)
+        return line
+
+    def _update(self):
+        self.active = self.enabled and bool(self.pending & ~self.masked)
+
+    def request(self, line):
+        self.pending |= 1 << line
+        self._update()
+
+    def withdraw(self, line):
+        self.pending &= ~(1 << line)
+        self._update()
+
+    def mask(self, line):
+        self.masked |= 1 << line
+        self._update()
+
+    def unmask(self, line):
+        self.masked &= ~(1 << line)
+        self._update()
+
+    def enable(self):
+        self.enabled = True
+        self._update()
+
+    def disable(self):
+        self.enabled = False
+        self._update()
+
+    #Metodo acknowledge que elige la linea pendiente sin enmascarar de mayor prioridad
+    #(a igual prioridad la de menor numero), la marca como atendida y la devuelve; None si no hay
+    def acknowledge(self):
+        if not self.active:
+            return None
+        lines = self.pending & ~self.masked
+        best = None
+        line = 0
+        while lines:
+            if lines & 1 and (best is None or self.priorities[line] < self.priorities[best]):
+                best = line
+            lines >>= 1
+            line += 1
+        self.withdraw(best)
+        self.counts[best] += 1
+        return best
+
+    #Metodo schedule que programa un evento del dispositivo de la linea line para el ciclo cycle
+    #Cuando llega el ciclo se llama device.fire(payload)
+    def schedule(self, cycle, line, payload=None):
+        heapq.heappush(self.events, (cycle, self._sequence, line, payload))
+        self._sequence += 1
+        self.next_event = self.events[0][0]
+
+    #Metodo advance que dispara todos los eventos con ciclo <= cycle, en orden
+    def advance(self, cycle):
+        events = self.events
+        while events and events[0][0] <= cycle:
+            _, _, line, payload = heapq.heappop(events)
+            self.devices[line].fire(payload)
+        self.next_event = events[0][0] if events else NEVER
+
+    #Metodo rebase que resta offset a los ciclos de los eventos pendientes
+    #(PipelinedCPU.run vuelve a contar los ciclos desde 0 en cada corrida)
+    def rebase(self, offset):
+        for device in self.devices:
+            device.rebase(offset)
+        if self.events:
+            self.events = [(cycle - offset, sequence, line, payload)
+                           for cycle, sequence, line, payload in self.events]
+            heapq.heapify(self.events)
+            self.next_event = self.events[0][0]
+
+    def get_state(self):
+        return {
+            'devices': [device.get_state() for device in self.devices],
+            'priorities': list(self.priorities),
+            'counts': list(self.counts),
+            'pending': self.pending,
+            'masked': self.masked,
+            'enabled': self.enabled,
+            'events': [list(event) for event in sorted(self.events)],
+            'sequence': self._sequence,
+        }
+
+    def set_state(self, state):
+        if len(state['devices']) != len(self.devices):
+            raise ValueError(f"El estado tiene {len(state['devices'])} dispositivos y el controlador {len(self.devices)}")
+        for device, device_state in zip(self.devices, state['devices']):
+            device.set_state(device_state)
+        self.priorities = list(state['priorities'])
+        self.counts = list(state['counts'])
+        self.pending = state['pending']
+        self.masked = state['masked']
+        self.enabled = state['enabled']
+        self.events = [tuple(event) for event in state['events']]
+        heapq.heapify(self.events)
+        self.next_event = self.events[0][0] if self.events else NEVER
+        self._sequence = state['sequence']
+        self._update()
+
+
+#Clase DMAEngine: copia bloques de un dispositivo a la memoria de datos sin pasar por la CPU
+#Cada transferencia tarda setup ciclos mas uno por cada words_per_cycle palabras; las
+#transferencias del mismo motor van una detras de otra. Al terminar la copia se hace en bloque,
+#se invalidan en la cache los bloques escritos (las lineas sucias se copian antes a memoria) para
+#que la CPU no lea datos viejos, y si interrupt es True se pide una interrupcion con la direccion
+#cpu: la PipelinedCPU (usa su data_memory, cache, cycle_count e interrupts)
+class DMAEngine(Device):
+    def __init__(self, cpu, words_per_cycle=4, setup=10, interrupt=True, priority=None, name='dma'):
+        super().__init__(name)
+        self.cpu = cpu
+        self.words_per_cycle = words_per_cycle
+        self.setup = setup
+        self.interrupt = interrupt
+        self.busy_until = 0
+        self.transfers = 0
+        self.words = 0
+        self.invalidations = 0
+        cpu.interrupts.attach(self, priority)
+
+    #Metodo transfer que programa la copia de values a partir de address
+    #cycle: ciclo en que se pide (por defecto el ciclo actual de la CPU)
+    #Retorna el ciclo en que termina
+    def transfer(self, address, values, cycle=None):
+        values = list(values)
+        if address < 0 or address + len(values) > len(self.cpu.data_memory):
+            raise ValueError(f"Transferencia DMA fuera de la memoria: {address}..{address + len(values) - 1}")
+        start = max(self.cpu.cycle_count if cycle is None else cycle, self.busy_until)
+        done = start + self.setup + -(-len(values) // self.words_per_cycle)
+        self.busy_until = done
+        self.controller.schedule(done, self.line, [address, values])
+        return done
 
-def check_interrupt(self, device):
-    if device.data_ready:
-        print("Interrupción detectada!")
+    def fire(self, payload):
+        address, values = payload
+        cpu = self.cpu
+        self.invalidations += cpu.cache.invalidate_range(address, len(values), cpu.data_memory)
+        cpu.data_memory.load(values, address)
+        self.transfers += 1
+        self.words += len(values)
+        if self.interrupt:
+            self.generate_data(address)
 
-        # Guardar PC actual para poder regresar después
-        self.saved_PC = self.registers['PC']
+    def rebase(self, offset):
+        self.busy_until = max(0, self.busy_until - offset)
 
-        # Cambiar PC a dirección de rutina de interrupción (ejemplo: 100)
-        self.registers['PC'] = 100
+    def stats(self):
+        return {'transfers': self.transfers, 'words': self.words, 'invalidations': self.invalidations}
 
-        # Aquí puedes ejecutar directamente la rutina o marcar que estás en modo interrupción
-        self.handling_interrupt = True
+    def get_state(self):
+        state = super().get_state()
+        state.update(busy_until=self.busy_until, **self.stats())
+        return state
 
-        # Limpiar la interrupción del dispositivo
-        device.clear()
+    def set_state(self, state):
+        super().set_state(state)
+        self.busy_until = state['busy_until']
+        self.transfers = state['transfers']
+        self.words = state['words']
+        self.invalidations = state['invalidations']
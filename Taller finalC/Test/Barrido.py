@@ -0,0 +1,156 @@
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from memoria.cache import Cache
+from Test.Benchmarks import WORKLOADS, run_workload
+
+# Barrido del espacio de diseño: corre cada combinación de parámetros en paralelo
+# y guarda una fila por configuración en CSV o JSON Lines
+
+PARAMETERS = ('workload', 'num_lines', 'block_size', 'associativity', 'replacement', 'forwarding', 'seed')
+METRICS = ('cycles', 'stalls', 'cache_hits', 'cache_misses', 'interrupts')
+
+DEFAULT_GRID = {
+    'workload': list(WORKLOADS),
+    'num_lines': [8, 16, 32],
+    'block_size': [4, 8],
+    'associativity': [1, 2],
+    'replacement': ['lru'],
+    'forwarding': [True, False],
+    'seed': [42],
+}
+
+
+# Genera las configuraciones (diccionarios) del producto cartesiano de la grilla, en orden fijo
+def expand_grid(grid):
+    values = [grid.get(name, DEFAULT_GRID[name]) for name in PARAMETERS]
+    configs = []
+    for combination in itertools.product(*values):
+        config = dict(zip(PARAMETERS, combination))
+        if config['num_lines'] % config['associativity'] == 0:
+            configs.append(config)
+    return configs
+
+
+# Identificador estable de una configuración, se usa para retomar un barrido interrumpido
+def config_id(config):
+    text = json.dumps({name: config[name] for name in PARAMETERS}, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+# Corre una configuración (en un proceso del pool) y devuelve su fila de resultados
+# La semilla de la configuración fija tanto el programa aleatorio como la política 'random'
+# El barrido solo mira tiempos y contadores, así que la caché es de solo tags (mismos hits y misses)
+def run_config(config):
+    cache = Cache(config['num_lines'], config['block_size'], config['associativity'],
+                  config['replacement'], seed=config['seed'], tag_only=True)
+    start = time.perf_counter()
+    _, metrics = run_workload(config['workload'], seed=config['seed'],
+                              forwarding=config['forwarding'], cache=cache)
+    elapsed = time.perf_counter() - start
+    row = {'id': config_id(config)}
+    row.update(config)
+    for name in METRICS:
+        row[name] = metrics[name]
+    row['host_seconds'] = round(elapsed, 6)
+    return row
+
+
+# Lee las filas ya guardadas en output (CSV o JSON Lines) y devuelve sus ids
+def completed_ids(output):
+    if not os.path.exists(output):
+        return set()
+    with open(output, newline='', encoding='utf-8') as f:
+        if output.endswith('.csv'):
+            return {row['id'] for row in csv.DictReader(f)}
+        return {json.loads(line)['id'] for line in f if line.strip()}
+
+
+# Escritor de resultados que agrega una fila por configuración terminada y la guarda de inmediato
+class ResultWriter:
+    FIELDS = ('id',) + PARAMETERS + METRICS + ('host_seconds',)
+
+    def __init__(self, output):
+        self.csv = output.endswith('.csv')
+        new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+        self.file = open(output, 'a', newline='', encoding='utf-8')
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=self.FIELDS)
+            if new_file:
+                self.writer.writeheader()
+
+    def write(self, row):
+        if self.csv:
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+# Corre el barrido completo
+# grid: diccionario parámetro -> lista de valores (los que falten toman DEFAULT_GRID)
+# output: archivo .csv o .jsonl; si ya existe y resume=True se saltan las configuraciones hechas
+# workers: procesos del pool (por defecto todos los núcleos)
+def run_sweep(grid, output, workers=None, resume=True):
+    configs = expand_grid(grid)
+    if not resume and os.path.exists(output):
+        os.remove(output)
+    done = completed_ids(output)
+    pending = [config for config in configs if config_id(config) not in done]
+    writer = ResultWriter(output)
+    rows = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [pool.submit(run_config, config) for config in pending]
+            for future in as_completed(futures):
+                row = future.result()
+                writer.write(row)
+                rows.append(row)
+    finally:
+        writer.close()
+    return {'total': len(configs), 'skipped': len(configs) - len(pending), 'ran': len(rows)}
+
+
+def _bool(text):
+    return text.lower() in ('1', 'true', 'on', 'si', 'sí', 'yes')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barrido paralelo de configuraciones del simulador")
+    parser.add_argument('--workload', nargs='+', choices=list(WORKLOADS), default=DEFAULT_GRID['workload'])
+    parser.add_argument('--lines', nargs='+', type=int, default=DEFAULT_GRID['num_lines'])
+    parser.add_argument('--block', nargs='+', type=int, default=DEFAULT_GRID['block_size'])
+    parser.add_argument('--assoc', nargs='+', type=int, default=DEFAULT_GRID['associativity'])
+    parser.add_argument('--replacement', nargs='+', default=DEFAULT_GRID['replacement'])
+    parser.add_argument('--forwarding', nargs='+', type=_bool, default=DEFAULT_GRID['forwarding'])
+    parser.add_argument('--seed', nargs='+', type=int, default=DEFAULT_GRID['seed'])
+    parser.add_argument('--out', default='barrido.csv', help="archivo .csv o .jsonl")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-resume', action='store_true', help="vuelve a correr todo desde cero")
+    args = parser.parse_args(argv)
+    grid = {
+        'workload': args.workload,
+        'num_lines': args.lines,
+        'block_size': args.block,
+        'associativity': args.assoc,
+        'replacement': args.replacement,
+        'forwarding': args.forwarding,
+        'seed': args.seed,
+    }
+    summary = run_sweep(grid, args.out, args.workers, resume=not args.no_resume)
+    print(f"Configuraciones: {summary['total']}, ya hechas: {summary['skipped']}, corridas: {summary['ran']}")
+
+
+if __name__ == "__main__":
+    main()
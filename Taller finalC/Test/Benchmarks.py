@@ -1,8 +1,11 @@
 import random
+from cpu.metricas import MetricsRegistry
 from cpu.pipeline import PipelinedCPU
 
-def benchmark_secuencial():
-    print("\n=== Benchmark 1: Acceso Secuencial a Memoria ===")
+# Cada programa_* devuelve (programa, datos iniciales de memoria o None)
+# seed permite reproducir los programas aleatorios sin tocar el estado global de random
+
+def programa_secuencial(seed=None):
     program_seq = [
         {'opcode': 'MOV', 'operands': ['R1', 1]},
         {'opcode': 'MOV', 'operands': ['R2', 0]},
@@ -12,29 +15,18 @@ def benchmark_secuencial():
         program_seq.append({'opcode': 'LOAD', 'operands': ['R4', 'R3']})
         program_seq.append({'opcode': 'ADD', 'operands': ['R2', 'R2', 'R4']})
         program_seq.append({'opcode': 'ADD', 'operands': ['R3', 'R3', 'R1']})
-    cpu = PipelinedCPU(program_seq)
-    cpu.data_memory = list(range(100))
-    metrics = cpu.run()
-    print(f"Resultado acumulado: {cpu.registers['R2']} (Esperado: {sum(range(10))})")
-    print_metrics(metrics)
+    return program_seq, list(range(100))
 
-def benchmark_aleatorio():
-    print("\n=== Benchmark 2: Acceso Aleatorio a Memoria ===")
+def programa_aleatorio(seed=42):
+    rng = random.Random(seed)
     program_rand = [{'opcode': 'MOV', 'operands': ['R2', 0]}]
-    random.seed(42)
-    addresses = [random.randint(0, 99) for _ in range(10)]
-    expected_sum = sum(addresses)
+    addresses = [rng.randint(0, 99) for _ in range(10)]
     for addr in addresses:
         program_rand.append({'opcode': 'LOAD', 'operands': ['R4', addr]})
         program_rand.append({'opcode': 'ADD', 'operands': ['R2', 'R2', 'R4']})
-    cpu = PipelinedCPU(program_rand)
-    cpu.data_memory = list(range(100))
-    metrics = cpu.run()
-    print(f"Resultado acumulado acceso aleatorio: {cpu.registers['R2']} (Esperado: {expected_sum})")
-    print_metrics(metrics)
+    return program_rand, list(range(100))
 
-def benchmark_hazard():
-    print("\n=== Benchmark 3: Carga y Uso Intensivo de Registros ===")
+def programa_hazard(seed=None):
     program_hazard = [
         {'opcode': 'MOV', 'operands': ['R1', 5]},
         {'opcode': 'MOV', 'operands': ['R2', 10]},
@@ -42,27 +34,64 @@ def benchmark_hazard():
         {'opcode': 'SUB', 'operands': ['R4', 'R3', 'R1']},
         {'opcode': 'MUL', 'operands': ['R5', 'R4', 'R2']}
     ]
-    cpu = PipelinedCPU(program_hazard)
-    metrics = cpu.run()
-    print(f"Resultado R5: {cpu.registers['R5']} (Esperado: 100)")
-    print_metrics(metrics)
+    return program_hazard, None
 
-def benchmark_interrupciones():
-    print("\n=== Benchmark 4: Manejo de Interrupciones ===")
+def programa_interrupciones(seed=None):
     program_interrupt = [
         {'opcode': 'MOV', 'operands': ['R1', 1]},
         {'opcode': 'MOV', 'operands': ['R2', 2]},
         {'opcode': 'ADD', 'operands': ['R3', 'R1', 'R2']},
         {'opcode': 'NOP', 'operands': []}
     ]
-    cpu = PipelinedCPU(program_interrupt)
+    return program_interrupt, None
+
+WORKLOADS = {
+    'secuencial': programa_secuencial,
+    'aleatorio': programa_aleatorio,
+    'hazard': programa_hazard,
+    'interrupciones': programa_interrupciones,
+}
+
+# Ejecuta una carga de trabajo en una CPU nueva y devuelve (cpu, métricas)
+# cpu_options se pasan a PipelinedCPU (cache, tracer, memory_size, registry...)
+def run_workload(name, seed=42, forwarding=True, **cpu_options):
+    program, data = WORKLOADS[name](seed)
+    registry = cpu_options.pop('registry', None) or MetricsRegistry()
+    cpu = PipelinedCPU(program, registry=registry, **cpu_options)
+    cpu.forwarding = forwarding
+    if data is not None:
+        cpu.data_memory.load(data)
     metrics = cpu.run()
-    cpu.device.generate_data(42)
-    metrics_interrupt = cpu.run()
-    # Sumar métricas de ambas ejecuciones
-    for key in metrics:
-        if key in metrics_interrupt:
-            metrics[key] += metrics_interrupt[key]
+    if name == 'interrupciones':
+        cpu.device.generate_data(42)
+        cpu.run()
+        # El registro acumula los contadores de ambas ejecuciones
+        totals = registry.totals()
+        metrics = {key: totals.get(key, value) for key, value in metrics.items()}
+    return cpu, metrics
+
+def benchmark_secuencial():
+    print("\n=== Benchmark 1: Acceso Secuencial a Memoria ===")
+    cpu, metrics = run_workload('secuencial')
+    print(f"Resultado acumulado: {cpu.registers['R2']} (Esperado: {sum(range(10))})")
+    print_metrics(metrics)
+
+def benchmark_aleatorio():
+    print("\n=== Benchmark 2: Acceso Aleatorio a Memoria ===")
+    cpu, metrics = run_workload('aleatorio', seed=42)
+    expected_sum = sum(ins['operands'][1] for ins in cpu.program if ins['opcode'] == 'LOAD')
+    print(f"Resultado acumulado acceso aleatorio: {cpu.registers['R2']} (Esperado: {expected_sum})")
+    print_metrics(metrics)
+
+def benchmark_hazard():
+    print("\n=== Benchmark 3: Carga y Uso Intensivo de Registros ===")
+    cpu, metrics = run_workload('hazard')
+    print(f"Resultado R5: {cpu.registers['R5']} (Esperado: 100)")
+    print_metrics(metrics)
+
+def benchmark_interrupciones():
+    print("\n=== Benchmark 4: Manejo de Interrupciones ===")
+    cpu, metrics = run_workload('interrupciones')
     print(f"Registro R0 (debe ser 999 si se atendió interrupción): {cpu.registers['R0']}")
     print_metrics(metrics)
 
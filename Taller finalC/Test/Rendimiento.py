@@ -0,0 +1,298 @@
+import os
+import random
+import sys
+import time
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.isa import CPU
+from cpu.pipeline import PipelinedCPU
+
+# Benchmarks de rendimiento del simulador (no de la máquina simulada):
+# miden ciclos simulados por segundo, instrucciones por segundo y memoria pico de Python
+# para PipelinedCPU e isa.CPU, y comparan contra una línea base guardada en JSON
+
+DEFAULT_THRESHOLD = 0.10
+
+
+def ins(opcode, *operands):
+    return {'opcode': opcode, 'operands': list(operands)}
+
+
+# Cada carga devuelve (programa, datos iniciales, tamaño de memoria)
+# Los saltos van precedidos de un NOP: el pipeline resuelve el salto en ID y descarta EX
+
+def carga_matmul(scale=1.0, seed=42):
+    n = max(2, int(12 * scale ** (1 / 3)))
+    a, b, c = 0, n * n, 2 * n * n
+    rng = random.Random(seed)
+    data = [rng.randint(0, 9) for _ in range(2 * n * n)]
+    program = []
+    for i in range(n):
+        for j in range(n):
+            program.append(ins('MOV', 'R4', 0))
+            for k in range(n):
+                program.append(ins('LOAD', 'R1', a + i * n + k))
+                program.append(ins('LOAD', 'R2', b + k * n + j))
+                program.append(ins('MUL', 'R3', 'R1', 'R2'))
+                program.append(ins('ADD', 'R4', 'R4', 'R3'))
+            program.append(ins('STORE', 'R4', c + i * n + j))
+    return program, data, 3 * n * n
+
+
+def carga_memcpy(scale=1.0, seed=42):
+    n = max(1, int(2000 * scale))
+    rng = random.Random(seed)
+    data = [rng.randint(0, 1000) for _ in range(n)]
+    program = [
+        ins('MOV', 'R1', 0),
+        ins('MOV', 'R2', n),
+        ins('MOV', 'R3', n),
+        # bucle (4)
+        ins('LOAD', 'R4', 'R1'),
+        ins('STORE', 'R4', 'R2'),
+        ins('ADD', 'R1', 'R1', 1),
+        ins('ADD', 'R2', 'R2', 1),
+        ins('SUB', 'R3', 'R3', 1),
+        ins('NOP'),
+        ins('JNZ', 3),
+    ]
+    return program, data, 2 * n
+
+
+def carga_pointer_chase(scale=1.0, seed=42):
+    nodes = 1024
+    steps = max(1, int(5000 * scale))
+    rng = random.Random(seed)
+    order = list(range(nodes))
+    rng.shuffle(order)
+    data = [0] * nodes
+    for position, node in enumerate(order):
+        data[node] = order[(position + 1) % nodes]
+    program = [
+        ins('MOV', 'R1', order[0]),
+        ins('MOV', 'R3', steps),
+        # bucle (2)
+        ins('LOAD', 'R1', 'R1'),
+        ins('SUB', 'R3', 'R3', 1),
+        ins('NOP'),
+        ins('JNZ', 2),
+    ]
+    return program, data, nodes
+
+
+def carga_bucle(scale=1.0, seed=42):
+    iterations = max(1, int(5000 * scale))
+    program = [
+        ins('MOV', 'R1', iterations),
+        ins('MOV', 'R2', 0),
+        ins('MOV', 'R5', 3),
+        # bucle (3)
+        ins('ADD', 'R2', 'R2', 'R1'),
+        ins('AND', 'R4', 'R2', 255),
+        ins('SHL', 'R4', 'R4', 1),
+        ins('SUB', 'R1', 'R1', 1),
+        ins('NOP'),
+        ins('JNZ', 3),
+    ]
+    return program, None, 16
+
+
+WORKLOADS = {
+    'matmul': carga_matmul,
+    'memcpy': carga_memcpy,
+    'pointer_chase': carga_pointer_chase,
+    'bucle': carga_bucle,
+    'interrupciones': carga_bucle,
+}
+
+# Cada cuántos ciclos el dispositivo pide una interrupción en la carga 'interrupciones'
+INTERRUPT_PERIOD = 16
+
+# isa.CPU no modela interrupciones
+MODELS = {
+    'pipeline': tuple(WORKLOADS),
+    'isa': ('matmul', 'memcpy', 'pointer_chase', 'bucle'),
+}
+
+
+# Crea la CPU del modelo pedido con la carga ya en memoria
+def build(model, workload, scale, seed):
+    program, data, memory_size = WORKLOADS[workload](scale, seed)
+    if model == 'pipeline':
+        cpu = PipelinedCPU(program, memory_size=max(memory_size, 16))
+    else:
+        cpu = CPU(program, memory_size=max(memory_size, 16))
+    if data is not None:
+        cpu.data_memory.load(data)
+    return cpu
+
+
+# Corre la CPU y devuelve (ciclos simulados, instrucciones ejecutadas)
+def drive(model, workload, cpu):
+    if model == 'isa':
+        steps = cpu.run()
+        return steps, steps
+    if workload != 'interrupciones':
+        metrics = cpu.run()
+        return metrics['cycles'], metrics['instructions']
+    # Tormenta de interrupciones: el dispositivo genera datos cada INTERRUPT_PERIOD ciclos
+    cpu.fetch()
+    while cpu.pipeline_busy():
+        if cpu.cycle_count % INTERRUPT_PERIOD == 0:
+            cpu.device.generate_data(cpu.cycle_count)
+        cpu.step()
+    return cpu.cycle_count, cpu.instruction_count
+
+
+# Mide un caso: mejor tiempo de repeats corridas y memoria pico en una corrida aparte con tracemalloc
+def measure(model, workload, scale=1.0, repeats=3, seed=42):
+    import tracemalloc
+
+    best = None
+    for _ in range(repeats):
+        cpu = build(model, workload, scale, seed)
+        start = time.perf_counter()
+        cycles, instructions = drive(model, workload, cpu)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    tracemalloc.start()
+    cpu = build(model, workload, scale, seed)
+    drive(model, workload, cpu)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = max(best, 1e-9)
+    return {
+        'cycles': cycles,
+        'instructions': instructions,
+        'seconds': round(best, 6),
+        'cycles_per_sec': round(cycles / best, 1),
+        'instructions_per_sec': round(instructions / best, 1),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+# Arranque en frío: lo que tarda un proceso nuevo en importar el simulador (o en correr una carga mínima
+# desde la línea de comandos), descontando el arranque del intérprete; importa porque los trabajos en lote
+# lanzan miles de simulaciones cortas, cada una en su propio proceso
+COLD_START = {
+    'import cpu': ['-c', 'import cpu'],
+    'import cpu.isa': ['-c', 'import cpu.isa'],
+    'import cpu.pipeline': ['-c', 'import cpu.pipeline'],
+    'import cpu.tomasulo': ['-c', 'import cpu.tomasulo'],
+    'python -m cpu bench bucle': ['-m', 'cpu', 'bench', 'bucle', '--scale', '0.01'],
+}
+
+
+# Mediana de repeats arranques de cada caso menos la mediana de 'python -c pass', en milisegundos
+def cold_start(repeats=15):
+    import statistics
+    import subprocess
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+    def median_ms(arguments):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *arguments], cwd=root, check=True, stdout=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+        return statistics.median(times) * 1000
+
+    interpreter = median_ms(['-c', 'pass'])
+    results = {'interpreter': round(interpreter, 1)}
+    for name, arguments in COLD_START.items():
+        results[name] = round(median_ms(arguments) - interpreter, 1)
+    return results
+
+
+# Corre la suite completa (o solo los casos en only, con nombres 'modelo/carga')
+def run_suite(scale=1.0, repeats=3, only=None, seed=42):
+    import platform
+
+    results = {}
+    for model, workloads in MODELS.items():
+        for workload in workloads:
+            name = f"{model}/{workload}"
+            if only and name not in only:
+                continue
+            results[name] = measure(model, workload, scale, repeats, seed)
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'scale': scale,
+        'results': results,
+    }
+
+
+# Compara una corrida con la línea base
+# Es regresión si la velocidad (ciclos por segundo) cae más que threshold respecto de la base;
+# si cambian los ciclos simulados se avisa aparte, porque entonces cambió el modelo, no la velocidad
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    changed = []
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        if base['cycles'] != result['cycles']:
+            changed.append(name)
+        slowdown = base['cycles_per_sec'] / result['cycles_per_sec'] - 1
+        result['slowdown'] = round(slowdown, 4)
+        if slowdown > threshold:
+            regressions.append(name)
+    return regressions, changed
+
+
+def print_report(report):
+    print(f"{'caso':28} {'ciclos':>10} {'instr':>10} {'ciclos/s':>12} {'instr/s':>12} {'pico KiB':>10} {'vs base':>8}")
+    for name, result in report['results'].items():
+        slowdown = result.get('slowdown')
+        delta = f"{slowdown:+.1%}" if slowdown is not None else ''
+        print(f"{name:28} {result['cycles']:>10} {result['instructions']:>10} "
+              f"{result['cycles_per_sec']:>12.0f} {result['instructions_per_sec']:>12.0f} "
+              f"{result['peak_kib']:>10.1f} {delta:>8}")
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Benchmarks de rendimiento del simulador")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplica el tamaño de las cargas")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--only', nargs='+', help="casos 'modelo/carga' a correr")
+    parser.add_argument('--save', help="guarda el resultado como línea base JSON")
+    parser.add_argument('--compare', help="línea base JSON contra la que comparar")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="caída de velocidad tolerada antes de marcar regresión (0.10 = 10%%)")
+    parser.add_argument('--cold-start', action='store_true',
+                        help="mide también el arranque en frío del paquete y de python -m cpu")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.scale, args.repeats, args.only)
+    if args.cold_start:
+        report['cold_start_ms'] = cold_start()
+    regressions, changed = [], []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions, changed = compare(report, baseline, args.threshold)
+    print_report(report)
+    if 'cold_start_ms' in report:
+        print(f"\nArranque en frío (ms sobre los {report['cold_start_ms']['interpreter']:.1f} del intérprete)")
+        for name, ms in report['cold_start_ms'].items():
+            if name != 'interpreter':
+                print(f"{name:28} {ms:>8.1f}")
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    for name in changed:
+        print(f"Aviso: {name} simula un número distinto de ciclos que la línea base")
+    for name in regressions:
+        print(f"REGRESIÓN: {name} es {report['results'][name]['slowdown']:.1%} más lento que la línea base")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+#Paquete Test: cargas de trabajo, benchmarks y barridos del simulador
@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.checkpoint import load_checkpoint, save_checkpoint
+from cpu.isa import CPU
+from cpu.pipeline import PipelinedCPU
+from cpu.superescalar import SuperscalarCPU
+from cpu.tomasulo import TomasuloCPU
+from memoria.cache import Cache
+from memoria.jerarquia import CacheHierarchy
+
+# Los STORE que quedan en el buffer de escritura al terminar run() tienen que llegar a la memoria
+# y contarse como escrituras
+
+PROGRAM = [
+    {'opcode': 'MOV', 'operands': ['R1', 7]},
+    {'opcode': 'STORE', 'operands': ['R1', 3]},
+]
+
+
+def test_run_drains_write_buffer():
+    for model in (PipelinedCPU, SuperscalarCPU, TomasuloCPU, CPU):
+        cache = Cache(8, 4, write_buffer=4)
+        cpu = model(PROGRAM, cache=cache)
+        cpu.run()
+        assert cpu.data_memory[3] == 7, model.__name__
+        assert cache.buffer_metrics()['memory_writes'] == 1, model.__name__
+        assert not cache._buffer, model.__name__
+
+
+def test_run_drains_every_level():
+    l1 = Cache(8, 4, write_buffer=4)
+    l2 = Cache(16, 4, write_buffer=4)
+    cpu = PipelinedCPU(PROGRAM, cache=CacheHierarchy(l1d=l1, l2=l2))
+    cpu.run()
+    assert cpu.data_memory[3] == 7
+    assert not l1._buffer and not l2._buffer
+
+
+def test_paused_run_keeps_write_buffer():
+    cache = Cache(8, 4, write_buffer=4)
+    cpu = PipelinedCPU(PROGRAM + [{'opcode': 'NOP', 'operands': []}] * 4, cache=cache)
+    cpu.run(stop_cycle=5)
+    assert cpu.pipeline_busy()
+    assert cpu.data_memory[3] == 0
+    metrics = cpu.run(resume=True)
+    assert cpu.data_memory[3] == 7
+    assert metrics['memory_writes'] == 1
+
+
+def test_checkpoint_keeps_write_buffer():
+    # El checkpoint se toma con el STORE todavia en el buffer y despues no hay otro STORE:
+    # el buffer restaurado tiene que saber a donde vaciarse
+    program = PROGRAM + [{'opcode': 'NOP', 'operands': []}] * 4
+    for stop in range(1, 9):
+        cpu = PipelinedCPU(program, cache=Cache(16, 4, write_buffer=2, miss_latency=8))
+        cpu.run(stop_cycle=stop)
+        if cpu.cache._buffer:
+            break
+    assert cpu.cache._buffer
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'buffer.ckpt')
+        save_checkpoint(cpu, path)
+        restored = load_checkpoint(path)
+    metrics = restored.run(resume=True)
+    assert restored.data_memory[3] == 7
+    assert metrics['memory_writes'] == 1
+    assert not restored.cache._buffer
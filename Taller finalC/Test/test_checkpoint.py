@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.checkpoint import load_checkpoint, save_checkpoint
+from cpu.pipeline import PipelinedCPU
+from cpu.superescalar import SuperscalarCPU
+from cpu.tomasulo import TomasuloCPU
+from memoria.cache import Cache
+from memoria.jerarquia import build_hierarchy
+from Test.Rendimiento import WORKLOADS
+
+# Una corrida que se pausa, se guarda en un checkpoint y se retoma desde el archivo tiene que
+# terminar igual que la corrida sin interrupcion: mismas metricas y misma memoria
+
+HIERARCHY = {
+    'l1i': {'num_lines': 16, 'block_size': 8, 'miss_latency': 2},
+    'l1d': {'num_lines': 16, 'block_size': 8, 'miss_latency': 4, 'write_buffer': 2},
+    'l2': {'num_lines': 64, 'block_size': 8, 'associativity': 4, 'write_back': True, 'write_allocate': True,
+           'miss_latency': 12, 'mshrs': 2},
+}
+
+CONFIGS = {
+    'cache': lambda: Cache(16, 4),
+    'hierarchy': lambda: build_hierarchy(HIERARCHY),
+    'mshr': lambda: Cache(16, 4, miss_latency=8, mshrs=2),
+    'write_buffer': lambda: Cache(16, 4, write_buffer=2, miss_latency=8),
+    'victim': lambda: Cache(16, 4, write_back=True, write_allocate=True, victim_entries=2),
+}
+
+
+def build(workload, config, predictor):
+    program, data, memory_size = WORKLOADS[workload](0.02, 7)
+    cpu = PipelinedCPU(program, memory_size=max(memory_size, 16), cache=CONFIGS[config](), predictor=predictor)
+    if data is not None:
+        cpu.data_memory.load(data)
+    return cpu
+
+
+def test_checkpoint_round_trip():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'run.ckpt')
+        for workload in ('memcpy', 'pointer_chase', 'bucle'):
+            for config in CONFIGS:
+                for predictor in (None, 'gshare'):
+                    reference = build(workload, config, predictor)
+                    expected = reference.run()
+                    for stop in (1, 3, expected['cycles'] // 2, expected['cycles'] - 2):
+                        name = f"{workload} {config} {predictor} {stop}"
+                        cpu = build(workload, config, predictor)
+                        cpu.run(stop_cycle=stop)
+                        save_checkpoint(cpu, path)
+                        restored = load_checkpoint(path)
+                        assert restored.run(resume=True) == expected, name
+                        assert list(restored.data_memory.words) == list(reference.data_memory.words), name
+
+
+def test_checkpoint_rejects_other_models():
+    program = [{'opcode': 'MOV', 'operands': ['R1', 1]}]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'run.ckpt')
+        save_checkpoint(PipelinedCPU(program), path)
+        for model in (SuperscalarCPU, TomasuloCPU):
+            cpu = model(program)
+            for action in (lambda: save_checkpoint(cpu, path), lambda: load_checkpoint(path, cpu)):
+                try:
+                    action()
+                except ValueError:
+                    pass
+                else:
+                    assert False, model.__name__
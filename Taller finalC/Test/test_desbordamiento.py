@@ -0,0 +1,72 @@
+import os
+import sys
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.isa import CPU
+from cpu.pipeline import PipelinedCPU
+from cpu.superescalar import SuperscalarCPU
+from cpu.tomasulo import TomasuloCPU
+from memoria.principal import DataMemory
+
+# Registros y memoria son de 64 bits con signo: los resultados que no entran se truncan
+# en complemento a dos en todos los modelos, en vez de cortar la corrida con OverflowError
+
+BIG = (1 << 40) + 3
+
+
+def expected(value):
+    return (value + (1 << 63)) % (1 << 64) - (1 << 63)
+
+
+# Un MUL, un ADD y un SHL que se pasan de 64 bits
+PROGRAM = [
+    {'opcode': 'MOV', 'operands': ['R1', BIG]},
+    {'opcode': 'MUL', 'operands': ['R2', 'R1', 'R1']},
+    {'opcode': 'ADD', 'operands': ['R3', 'R2', (1 << 63) - 1]},
+    {'opcode': 'SHL', 'operands': ['R4', 'R1', 40]},
+    {'opcode': 'STORE', 'operands': ['R2', 1]},
+]
+
+# El mismo MUL dentro de un bucle, para que isa.CPU traduzca el bloque
+LOOP = [
+    {'opcode': 'MOV', 'operands': ['R1', BIG]},
+    {'opcode': 'MOV', 'operands': ['R5', 3]},
+    {'opcode': 'MUL', 'operands': ['R2', 'R1', 'R1']},
+    {'opcode': 'ADD', 'operands': ['R3', 'R2', (1 << 63) - 1]},
+    {'opcode': 'SUB', 'operands': ['R5', 'R5', 1]},
+    {'opcode': 'JNZ', 'operands': [2]},
+]
+
+
+def test_mul_overflow_wraps_in_every_model():
+    square = expected(BIG * BIG)
+    for model in (PipelinedCPU, SuperscalarCPU, TomasuloCPU, CPU):
+        cpu = model(PROGRAM)
+        cpu.run()
+        assert cpu.registers['R2'] == square, model.__name__
+        assert cpu.registers['R3'] == expected(square + (1 << 63) - 1), model.__name__
+        assert cpu.registers['R4'] == expected(BIG << 40), model.__name__
+        assert cpu.data_memory[1] == square, model.__name__
+
+
+def test_interpreted_and_translated_isa_agree():
+    interpreted = CPU(LOOP, translate=False)
+    interpreted.run()
+    translated = CPU(LOOP, translate=True)
+    translated.run()
+    assert translated.translator.translated > 0
+    assert interpreted.registers == translated.registers
+    assert translated.registers['R3'] == expected(expected(BIG * BIG) + (1 << 63) - 1)
+
+
+def test_register_and_memory_writes_wrap():
+    cpu = CPU([{'opcode': 'MOV', 'operands': ['R1', 1 << 70]}], translate=False)
+    cpu.run()
+    assert cpu.registers['R1'] == 0
+    cpu.registers['R2'] = (1 << 64) + 5
+    assert cpu.registers['R2'] == 5
+    memory = DataMemory(4)
+    memory[0] = 1 << 63
+    memory.load([(1 << 64) - 1], start=1)
+    assert memory[0] == -(1 << 63)
+    assert memory[1] == -1
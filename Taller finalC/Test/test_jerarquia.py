@@ -0,0 +1,20 @@
+import os
+import sys
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.isa import CPU
+from cpu.pipeline import PipelinedCPU
+from memoria.jerarquia import build_hierarchy
+
+# Un programa sin LOAD ni STORE: la unica forma de llegar a la L2 es por los fallos de la L1I
+PROGRAM = [{'opcode': 'ADD', 'operands': ['R1', 'R1', 1]} for _ in range(40)]
+
+
+def test_instruction_misses_reach_l2():
+    for model in (PipelinedCPU, CPU):
+        cache = build_hierarchy()
+        cpu = model(PROGRAM, cache=cache)
+        cpu.run()
+        assert cache.l1i.misses > 0, model.__name__
+        assert cache.l1i.next_reads == cache.l1i.misses, model.__name__
+        assert cache.l2.misses == cache.l1i.misses, model.__name__
@@ -0,0 +1,39 @@
+import os
+import sys
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.metricas import MetricsRegistry
+from cpu.pipeline import PipelinedCPU
+
+# Un mismo registro acumula las corridas de CPUs distintas: los contadores de la segunda CPU
+# empiezan en cero y no se restan de los de la primera
+
+FIRST = [
+    {'opcode': 'LOAD', 'operands': ['R1', 0]},
+    {'opcode': 'ADD', 'operands': ['R2', 'R1', 1]},
+    {'opcode': 'LOAD', 'operands': ['R3', 8]},
+    {'opcode': 'ADD', 'operands': ['R4', 'R3', 1]},
+]
+SECOND = [
+    {'opcode': 'MOV', 'operands': ['R1', 5]},
+    {'opcode': 'STORE', 'operands': ['R1', 2]},
+]
+
+
+def test_registry_accumulates_across_cpus():
+    registry = MetricsRegistry()
+    first = PipelinedCPU(FIRST, registry=registry).run()
+    second = PipelinedCPU(SECOND, registry=registry).run()
+    totals = registry.totals()
+    assert first['cycles'] > second['cycles']
+    for name in ('cycles', 'stalls', 'instructions', 'cache_misses'):
+        assert totals[name] == first[name] + second[name], name
+
+
+def test_registry_accumulates_runs_of_same_cpu():
+    registry = MetricsRegistry()
+    cpu = PipelinedCPU(FIRST, registry=registry)
+    first = cpu.run()
+    cpu.registers['PC'] = 0
+    second = cpu.run()
+    assert registry.totals()['cycles'] == first['cycles'] + second['cycles']
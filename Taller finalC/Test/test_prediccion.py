@@ -0,0 +1,27 @@
+import os
+import sys
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.prediccion import GsharePredictor, TournamentPredictor
+
+# Entre la prediccion de un salto y su resolucion se puede resolver otro salto y mover la historia:
+# el salto tiene que entrenar la entrada con la que se predijo, no la de la historia nueva
+
+
+def test_gshare_trains_predicted_entry():
+    predictor = GsharePredictor(entries=16, history_bits=4)
+    history = predictor.snapshot()
+    index = (5 ^ history) & predictor.mask
+    predictor.update(9, True)
+    assert predictor.history != history
+    predictor.update(5, True, history)
+    assert predictor.table[index] == 2
+    assert predictor.table[(5 ^ 1) & predictor.mask] == 1
+
+
+def test_tournament_passes_history_to_gshare():
+    predictor = TournamentPredictor(entries=16, history_bits=4)
+    history = predictor.snapshot()
+    predictor.update(9, True)
+    predictor.update(5, True, history)
+    assert predictor.global_.table[(5 ^ history) & predictor.global_.mask] == 2
@@ -0,0 +1,48 @@
+import importlib
+
+#Paquete cpu: modelos de CPU, ensamblador, traza y metricas del simulador
+#Importar el paquete no carga ningun modulo: los nombres de _EXPORTS y los submodulos se importan
+#la primera vez que se usan (import cpu; cpu.PipelinedCPU o cpu.pipeline), asi un proceso corto solo
+#paga lo que usa
+
+#Nombre publico -> submodulo que lo define
+_EXPORTS = {
+    'CPU': 'isa',
+    'PipelinedCPU': 'pipeline',
+    'SuperscalarCPU': 'superescalar',
+    'TomasuloCPU': 'tomasulo',
+    'BatchCPU': 'lotes',
+    'MultiCoreSystem': 'multinucleo',
+    'Sampler': 'muestreo',
+    'Profiler': 'perfil',
+    'MetricsRegistry': 'metricas',
+    'Tracer': 'traza',
+    'make_tracer': 'traza',
+    'make_predictor': 'prediccion',
+    'BranchTargetBuffer': 'prediccion',
+    'RegisterFile': 'registros',
+    'compile_program': 'instrucciones',
+    'save_checkpoint': 'checkpoint',
+    'load_checkpoint': 'checkpoint',
+}
+
+_SUBMODULES = ('checkpoint', 'ensamblador', 'instrucciones', 'isa', 'lotes', 'metricas', 'muestreo',
+               'multinucleo', 'perfil', 'pipeline', 'prediccion', 'registros', 'superescalar',
+               'tomasulo', 'traductor', 'traza')
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f"{__name__}.{_EXPORTS[name]}"), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
@@ -0,0 +1,137 @@
+import argparse
+import importlib
+import sys
+
+#Linea de comandos del simulador: python -m cpu (o el comando simulador con el paquete instalado)
+#  python -m cpu run programa.asm [opciones]   ensambla (o lee la imagen) y corre el programa
+#  python -m cpu bench matmul [opciones]       corre una carga de Test/Rendimiento.py
+#Opciones: modelo de CPU, cache (lineas, bloque, vias, latencias, MSHRs, prefetcher, buffer de escritura,
+#victim cache, modo solo tags o una jerarquia en JSON), predictor, traza y ciclos maximos; con --json las
+#metricas salen como una linea JSON
+#Los modulos del simulador se importan recien despues de leer los argumentos y solo los del modelo
+#elegido, asi las corridas cortas arrancan rapido
+
+#Modelo -> (submodulo, clase)
+MODELS = {
+    'pipeline': ('pipeline', 'PipelinedCPU'),
+    'superescalar': ('superescalar', 'SuperscalarCPU'),
+    'tomasulo': ('tomasulo', 'TomasuloCPU'),
+    'isa': ('isa', 'CPU'),
+}
+
+BENCH_WORKLOADS = ('matmul', 'memcpy', 'pointer_chase', 'bucle')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m cpu', description="Simulador de arquitectura de computadores")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help="corre un programa (.asm o imagen ensamblada)")
+    run.add_argument('source', help="programa en texto (.asm) o imagen ensamblada")
+    run.add_argument('--memory-size', type=int, default=256, help="palabras de la memoria de datos")
+    bench = commands.add_parser('bench', help="corre una carga de Test/Rendimiento.py")
+    bench.add_argument('workload', choices=BENCH_WORKLOADS)
+    bench.add_argument('--scale', type=float, default=1.0, help="multiplica el tamaño de la carga")
+    bench.add_argument('--seed', type=int, default=42)
+    for command in (run, bench):
+        command.add_argument('--model', choices=tuple(MODELS), default='pipeline')
+        command.add_argument('--max-cycles', type=int, help="corta la corrida en este ciclo (pasos en isa)")
+        command.add_argument('--max-instructions', type=int, help="deja de buscar después de estas instrucciones")
+        command.add_argument('--predictor', help="predictor de saltos (static, 1bit, 2bit, gshare, tournament)")
+        command.add_argument('--no-forwarding', action='store_true', help="desactiva el forwarding del pipeline")
+        cache = command.add_argument_group('caché de datos')
+        cache.add_argument('--lines', type=int, default=16)
+        cache.add_argument('--block', type=int, default=8)
+        cache.add_argument('--assoc', type=int, default=1)
+        cache.add_argument('--replacement', default='lru')
+        cache.add_argument('--write-back', action='store_true')
+        cache.add_argument('--hit-latency', type=int, default=0)
+        cache.add_argument('--miss-latency', type=int, default=0)
+        cache.add_argument('--mshrs', type=int, default=0, help="fallos pendientes (0 = caché bloqueante)")
+        cache.add_argument('--prefetcher', choices=('next_line', 'stride', 'stream'),
+                           help="prefetcher de la caché de datos (memoria/prebusqueda.py)")
+        cache.add_argument('--prefetch-degree', type=int, help="bloques pedidos por vez (por defecto 1, y 4 con stream)")
+        cache.add_argument('--prefetch-distance', type=int, default=1, help="bloques (o pasos) por delante")
+        cache.add_argument('--write-buffer', type=int, default=0,
+                           help="entradas del buffer de escritura con coalescencia (solo write-through)")
+        cache.add_argument('--victim', type=int, default=0, help="bloques de la victim cache")
+        cache.add_argument('--tag-only', action='store_true',
+                           help="la caché solo lleva tags, los datos se leen y escriben en la memoria")
+        cache.add_argument('--hierarchy', help="jerarquía L1I/L1D/L2/L3 en JSON (memoria/jerarquia.py)")
+        trace = command.add_argument_group('traza')
+        trace.add_argument('--trace', choices=('off', 'summary', 'events', 'cycles'), default='off')
+        trace.add_argument('--trace-sink', choices=('ring', 'console', 'jsonl', 'binary'), default='console')
+        trace.add_argument('--trace-out', help="archivo de la traza (sinks jsonl y binary)")
+        command.add_argument('--json', action='store_true', help="imprime las métricas como JSON")
+    return parser
+
+
+def build_cache(args, tracer):
+    if args.hierarchy:
+        import json
+
+        from memoria.jerarquia import build_hierarchy
+
+        with open(args.hierarchy, encoding='utf-8') as f:
+            return build_hierarchy(json.load(f), tracer)
+    from memoria.cache import Cache
+
+    return Cache(args.lines, args.block, args.assoc, args.replacement, tracer, write_back=args.write_back,
+                 write_allocate=args.write_back, hit_latency=args.hit_latency,
+                 miss_latency=args.miss_latency, mshrs=args.mshrs, prefetcher=args.prefetcher,
+                 prefetch_degree=args.prefetch_degree, prefetch_distance=args.prefetch_distance,
+                 write_buffer=args.write_buffer, victim_entries=args.victim, tag_only=args.tag_only)
+
+
+#Corre el programa con las opciones de la linea de comandos y devuelve (cpu, metricas)
+def simulate(args, program, data=None, memory_size=256):
+    from cpu.traza import make_tracer
+
+    tracer = make_tracer(args.trace, args.trace_sink, args.trace_out)
+    cache = build_cache(args, tracer)
+    module, name = MODELS[args.model]
+    model = getattr(importlib.import_module(f"cpu.{module}"), name)
+    if args.model == 'isa':
+        cpu = model(program, memory_size=memory_size, cache=cache)
+    else:
+        cpu = model(program, memory_size=memory_size, cache=cache, predictor=args.predictor, tracer=tracer)
+        cpu.forwarding = not args.no_forwarding
+    if data is not None:
+        cpu.data_memory.load(data)
+    if args.model == 'isa':
+        limits = [limit for limit in (args.max_cycles, args.max_instructions) if limit is not None]
+        steps = cpu.run(min(limits) if limits else None)
+        metrics = {'instructions': steps, 'cache_hits': cache.hits, 'cache_misses': cache.misses}
+    else:
+        metrics = cpu.run(max_instructions=args.max_instructions, stop_cycle=args.max_cycles)
+    if tracer is not None:
+        tracer.close()
+    return cpu, metrics
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'run':
+        from cpu import ensamblador
+
+        program, _ = ensamblador.load(args.source)
+        cpu, metrics = simulate(args, program, memory_size=args.memory_size)
+    else:
+        from Test.Rendimiento import WORKLOADS
+
+        program, data, memory_size = WORKLOADS[args.workload](args.scale, args.seed)
+        cpu, metrics = simulate(args, program, data, max(memory_size, 16))
+
+    if args.json:
+        import json
+
+        metrics['registers'] = cpu.registers.as_dict()
+        print(json.dumps(metrics))
+    else:
+        for key, value in metrics.items():
+            print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+        print("Registros:", cpu.registers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
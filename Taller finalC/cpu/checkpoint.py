@@ -0,0 +1,248 @@
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu import prediccion
+from cpu.pipeline import PipelinedCPU
+from cpu.superescalar import SuperscalarCPU
+from cpu.tomasulo import TomasuloCPU
+from memoria.cache import Cache
+from memoria.jerarquia import CacheHierarchy, build_hierarchy
+from memoria.principal import DataMemory
+
+#Checkpoints de PipelinedCPU: guardan todo el estado del simulador en un archivo binario
+#y lo restauran de forma que la simulacion sigue con exactamente los mismos ciclos
+#
+#Formato (little endian):
+#  cabecera: MAGIC, version (uint16), numero de secciones (uint16)
+#  cada seccion: nombre (4 bytes), comprimida (uint8), largo (uint64) y el contenido
+#Secciones:
+#  META: JSON con el programa, la configuracion y el estado de los latches, contadores,
+#        interrupcion, controlador de interrupciones (dispositivos, mascaras y eventos programados),
+#        caches (lineas, vias libres, politica, MSHRs), LOADs pendientes,
+#        predictor de saltos y BTB
+#  REGS: banco de registros, enteros de 64 bits
+#  MEM : memoria de datos en bloque (los bytes del array, con su typecode en META)
+#  LINE: palabras de todas las lineas de cache con datos, enteros de 64 bits
+#La traza (Tracer) no forma parte del estado: se vuelve a configurar con set_tracer
+#Tampoco las rutinas de servicio (handler) de los dispositivos: para restaurar una CPU con
+#dispositivos extra se pasa a load_checkpoint una CPU con los mismos dispositivos conectados
+
+MAGIC = b'CKPT'
+#Version 2: predictor de saltos (IF_predicted), MSHRs y LOADs pendientes (mem_wait) y el
+#controlador de interrupciones en lugar del dispositivo unico. Los checkpoints de la version 1
+#no tienen ese estado y no se pueden restaurar
+VERSION = 2
+MIN_VERSION = 2
+_HEADER = struct.Struct('<4sHH')
+_SECTION = struct.Struct('<4sBQ')
+
+#Las secciones de menos bytes que esto no se comprimen
+_COMPRESS_MIN = 256
+
+
+#Funcion _latch que guarda un latch como [pc de la instruccion, valor] (o None si esta vacio)
+def _latch(stage):
+    if stage is None:
+        return None
+    instruction, value = stage
+    return [instruction.pc, value]
+
+
+#Los operandos de ID son una lista; con prediccion de saltos un salto lleva (PC predicho, historia)
+def _values(values):
+    return list(values) if isinstance(values, (list, tuple)) else values
+
+
+def _unlatch(program, stage):
+    if stage is None:
+        return None
+    pc, value = stage
+    return (program[pc], value)
+
+
+#Funcion _check_model que rechaza las CPUs que no son PipelinedCPU: SuperscalarCPU y TomasuloCPU
+#tienen estado propio (grupos de IF, ROB, estaciones de reserva) que el checkpoint no guarda
+def _check_model(cpu):
+    if not isinstance(cpu, PipelinedCPU) or isinstance(cpu, (SuperscalarCPU, TomasuloCPU)):
+        raise ValueError(f"Los checkpoints son solo para PipelinedCPU, no para {type(cpu).__name__}")
+
+
+#Funcion capture que arma el estado de la CPU como (meta, secciones binarias)
+def capture(cpu):
+    _check_model(cpu)
+    cache_meta, cache_data = cpu.cache.get_state()
+    meta = {
+        'program': [instruction.as_dict() for instruction in cpu.program],
+        'cache_kind': 'hierarchy' if isinstance(cpu.cache, CacheHierarchy) else 'cache',
+        'cache_config': cpu.cache.config(),
+        'cache': cache_meta,
+        'memory_typecode': cpu.data_memory.typecode,
+        'IF': cpu.IF_stage.pc if cpu.IF_stage is not None else None,
+        'ID': None if cpu.ID_stage is None else [cpu.ID_stage[0].pc, _values(cpu.ID_stage[1])],
+        'IF_predicted': cpu.IF_predicted,
+        'IF_history': cpu.IF_history,
+        'EX': _latch(cpu.EX_stage),
+        'MEM': _latch(cpu.MEM_stage),
+        'WB': _latch(cpu.WB_stage),
+        'stall': cpu.stall,
+        'forwarding': cpu.forwarding,
+        'fetch_end': cpu.fetch_end,
+        'handling_interrupt': cpu.handling_interrupt,
+        'saved_PC': cpu.saved_PC,
+        'mem_wait': cpu.mem_wait,
+        'pending_regs': [[reg, ready] for reg, ready in cpu.pending_regs.items()],
+        'hold_until': cpu.hold_until,
+        'counters': {
+            'cycle_count': cpu.cycle_count,
+            'stall_count': cpu.stall_count,
+            'interrupt_count': cpu.interrupt_count,
+            'instruction_count': cpu.instruction_count,
+            'branch_count': cpu.branch_count,
+            'mispredict_count': cpu.mispredict_count,
+            'memory_stall_count': cpu.memory_stall_count,
+            'skipped_cycles': cpu.skipped_cycles,
+        },
+        'interrupt_line': cpu.interrupt_line,
+        'interrupt_data': cpu.interrupt_data,
+        'interrupts': cpu.interrupts.get_state(),
+        'predictor': None,
+    }
+    if cpu.predictor is not None:
+        meta['predictor'] = {
+            'name': prediccion.predictor_name(cpu.predictor),
+            'state': cpu.predictor.get_state(),
+            'btb_entries': cpu.btb.entries,
+            'btb': cpu.btb.get_state(),
+        }
+    sections = {
+        b'META': json.dumps(meta, separators=(',', ':')).encode('utf-8'),
+        b'REGS': cpu.registers.cells.tobytes(),
+        b'MEM ': cpu.data_memory.tobytes(),
+        b'LINE': array('q', cache_data).tobytes(),
+    }
+    return meta, sections
+
+
+#Funcion save_checkpoint que escribe el estado de la CPU en path
+#compress: comprime con zlib las secciones grandes (la memoria suele tener muchos ceros)
+def save_checkpoint(cpu, path, compress=True):
+    _, sections = capture(cpu)
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(sections)))
+        for name, payload in sections.items():
+            compressed = compress and len(payload) >= _COMPRESS_MIN
+            if compressed:
+                payload = zlib.compress(payload, 1)
+            f.write(_SECTION.pack(name, int(compressed), len(payload)))
+            f.write(payload)
+
+
+#Funcion read_sections que lee un checkpoint y devuelve sus secciones ya descomprimidas
+def read_sections(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path} no es un checkpoint")
+    magic, version, count = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} no es un checkpoint")
+    if version > VERSION:
+        raise ValueError(f"Versión de checkpoint no soportada: {version} (se soporta hasta {VERSION})")
+    if version < MIN_VERSION:
+        raise ValueError(f"El checkpoint {path} es de la versión {version}, anterior al predictor, los MSHRs "
+                         f"y el controlador de interrupciones: vuelva a generarlo (se soporta desde la versión {MIN_VERSION})")
+    offset = _HEADER.size
+    sections = {}
+    for _ in range(count):
+        name, compressed, size = _SECTION.unpack_from(data, offset)
+        offset += _SECTION.size
+        payload = data[offset:offset + size]
+        offset += size
+        sections[name] = zlib.decompress(payload) if compressed else payload
+    return sections
+
+
+#Crea una CPU nueva con el programa y la configuracion de cache guardados
+def _build_cpu(meta, memory_size):
+    config = meta['cache_config']
+    if meta['cache_kind'] == 'hierarchy':
+        levels = [options for key, options in config.items() if key != 'code_base']
+    else:
+        levels = [config]
+    if any(options['replacement'] is None for options in levels):
+        raise ValueError("La caché usa una política propia: pase una CPU ya creada a load_checkpoint")
+    if meta['cache_kind'] == 'hierarchy':
+        cache = build_hierarchy(config)
+    else:
+        cache = Cache(**config)
+    predictor = meta['predictor']
+    if predictor is None:
+        return PipelinedCPU(meta['program'], memory_size=memory_size, cache=cache)
+    if predictor['name'] is None:
+        raise ValueError("La CPU usa un predictor de saltos propio: pase una CPU ya creada a load_checkpoint")
+    btb = prediccion.BranchTargetBuffer(predictor['btb_entries'])
+    return PipelinedCPU(meta['program'], memory_size=memory_size, cache=cache,
+                        predictor=predictor['name'], btb=btb)
+
+
+#Funcion load_checkpoint que restaura un checkpoint
+#cpu: si se pasa, el estado se carga en esa CPU (mismo programa y misma geometria de cache);
+#si es None se crea una PipelinedCPU nueva con la configuracion guardada
+#Retorna la CPU; para continuar la simulacion se llama cpu.run(resume=True)
+def load_checkpoint(path, cpu=None):
+    sections = read_sections(path)
+    meta = json.loads(sections[b'META'].decode('utf-8'))
+    memory = array(meta['memory_typecode'])
+    memory.frombytes(sections[b'MEM '])
+    if cpu is None:
+        cpu = _build_cpu(meta, len(memory))
+    else:
+        _check_model(cpu)
+        if [instruction.as_dict() for instruction in cpu.program] != meta['program']:
+            raise ValueError("El programa de la CPU no coincide con el del checkpoint")
+
+    if len(cpu.data_memory) != len(memory) or cpu.data_memory.typecode != memory.typecode:
+        cpu.data_memory = DataMemory(len(memory), memory.typecode)
+    cpu.data_memory.load(memory)
+
+    registers = array('q')
+    registers.frombytes(sections[b'REGS'])
+    cpu.registers.cells[:] = registers
+
+    program = cpu.program
+    cpu.IF_stage = program[meta['IF']] if meta['IF'] is not None else None
+    cpu.ID_stage = _unlatch(program, meta['ID'])
+    cpu.EX_stage = _unlatch(program, meta['EX'])
+    cpu.MEM_stage = _unlatch(program, meta['MEM'])
+    cpu.WB_stage = _unlatch(program, meta['WB'])
+    cpu.IF_predicted = meta['IF_predicted']
+    cpu.IF_history = meta.get('IF_history')
+    cpu.stall = meta['stall']
+    cpu.forwarding = meta['forwarding']
+    cpu.fetch_end = meta['fetch_end']
+    cpu.handling_interrupt = meta['handling_interrupt']
+    cpu.saved_PC = meta['saved_PC']
+    cpu.mem_wait = meta['mem_wait']
+    cpu.pending_regs = {reg: ready for reg, ready in meta['pending_regs']}
+    cpu.hold_until = meta['hold_until']
+    for name, value in meta['counters'].items():
+        setattr(cpu, name, value)
+    cpu.interrupt_line = meta['interrupt_line']
+    cpu.interrupt_data = meta['interrupt_data']
+    cpu.interrupts.set_state(meta['interrupts'])
+
+    if meta['predictor'] is not None:
+        cpu.predictor.set_state(meta['predictor']['state'])
+        cpu.btb.set_state(meta['predictor']['btb'])
+
+    line_data = array('q')
+    line_data.frombytes(sections[b'LINE'])
+    cpu.cache.set_state(meta['cache'], line_data)
+    if isinstance(cpu.cache, CacheHierarchy):
+        cpu.cache.bind(cpu.data_memory)
+    return cpu
@@ -0,0 +1,278 @@
+import gc
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.instrucciones import (ALU_OPS, BRANCH_OPS, DEST_OPS, OP_CMP, OP_LOAD, OP_MOV, OP_NOP, OP_STORE,
+                               OPCODES, Instruction, compile_instruction)
+from cpu.registros import REGISTER_NAMES
+
+#Ensamblador de texto para la ISA del simulador y formato binario de programas
+#
+#Sintaxis (una instruccion por linea, mayusculas o minusculas):
+#  etiqueta:  ADD R1, R1, 1     ; comentario (tambien con #)
+#             JNZ etiqueta
+#Los operandos son registros (R0-R5), enteros (10, -3, 0x1F) o etiquetas, que valen el PC
+#de la instruccion que marcan. JE es un alias de JZ y se guarda como JZ
+#
+#Imagen binaria (little endian): cabecera MAGIC, version (uint16), largo del registro (uint16),
+#numero de instrucciones (uint32); despues un registro de largo fijo por instruccion y al final
+#las etiquetas en JSON. Cada registro: opcode (uint8), numero de operandos (uint8), bits de
+#"el operando i es un registro" (uint8), relleno y tres operandos int32 (indice de registro o valor)
+
+MAGIC = b'TASM'
+VERSION = 1
+_HEADER = struct.Struct('<4sHHI')
+_RECORD = struct.Struct('<BBBx3i')
+_INT32 = (-(1 << 31), (1 << 31) - 1)
+
+#Cantidad de operandos que acepta cada instruccion (minimo, maximo)
+_OPERAND_COUNT = {op: (3, 3) for op in ALU_OPS}
+_OPERAND_COUNT.update({op: (1, 1) for op in BRANCH_OPS})
+_OPERAND_COUNT.update({OP_NOP: (0, 0), OP_MOV: (1, 2), OP_CMP: (2, 2), OP_LOAD: (2, 2), OP_STORE: (2, 2)})
+
+#Nombre con el que se guarda cada codigo (JE se escribe como JZ)
+OP_NAMES = {op: name for name, op in OPCODES.items() if name != 'JE'}
+
+_GENERAL_REGISTERS = tuple(name for name in REGISTER_NAMES if name.startswith('R'))
+_LABEL = re.compile(r'[A-Za-z_.][A-Za-z0-9_.]*$')
+_COMMENT = re.compile(r'[;#]')
+
+
+#Funcion parse que traduce el texto a la lista de instrucciones en formato diccionario
+#Retorna (programa, etiquetas) con etiquetas como diccionario nombre -> PC
+#Las lineas iguales se traducen una sola vez (los programas grandes repiten mucho)
+def parse(text):
+    lines = []
+    labels = {}
+    for number, line in enumerate(text.splitlines(), 1):
+        if ';' in line or '#' in line:
+            line = _COMMENT.split(line, 1)[0]
+        line = line.strip()
+        while ':' in line:
+            label, line = line.split(':', 1)
+            label = label.strip()
+            if not _LABEL.match(label) or label.upper() in _GENERAL_REGISTERS:
+                raise ValueError(f"Línea {number}: etiqueta inválida: {label!r}")
+            if label in labels:
+                raise ValueError(f"Línea {number}: etiqueta repetida: {label}")
+            labels[label] = len(lines)
+            line = line.strip()
+        if line:
+            lines.append((number, line))
+
+    program = []
+    parsed = {}
+    for number, line in lines:
+        instruction = parsed.get(line)
+        if instruction is None:
+            instruction = parsed[line] = _parse_instruction(line, labels, number)
+        program.append({'opcode': instruction[0], 'operands': list(instruction[1])})
+    return program, labels
+
+
+#Traduce una linea sin etiquetas ni comentarios a (opcode, operandos)
+def _parse_instruction(line, labels, number):
+    parts = line.split(None, 1)
+    opcode = parts[0].upper()
+    op = OPCODES.get(opcode)
+    if op is None:
+        raise ValueError(f"Línea {number}: instrucción desconocida: {parts[0]}")
+    tokens = [token.strip() for token in parts[1].split(',')] if len(parts) > 1 else []
+    operands = tuple(_operand(token, labels, number) for token in tokens)
+    low, high = _OPERAND_COUNT[op]
+    if not low <= len(operands) <= high:
+        raise ValueError(f"Línea {number}: {opcode} lleva {low if low == high else f'{low} a {high}'} "
+                         f"operandos, no {len(operands)}")
+    if op in DEST_OPS and not isinstance(operands[0], str):
+        raise ValueError(f"Línea {number}: el destino de {opcode} tiene que ser un registro")
+    if op in BRANCH_OPS and isinstance(operands[0], str):
+        raise ValueError(f"Línea {number}: el destino de {opcode} tiene que ser una etiqueta o un PC")
+    return 'JZ' if opcode == 'JE' else opcode, operands
+
+
+def _operand(token, labels, number):
+    if not token:
+        raise ValueError(f"Línea {number}: falta un operando")
+    if token.upper() in _GENERAL_REGISTERS:
+        return token.upper()
+    try:
+        return int(token, 0)
+    except ValueError:
+        pass
+    if token in labels:
+        return labels[token]
+    raise ValueError(f"Línea {number}: operando desconocido: {token}")
+
+
+#Funcion encode que arma la imagen binaria de un programa (diccionarios o instrucciones compiladas)
+def encode(program, labels=None):
+    records = bytearray(_HEADER.pack(MAGIC, VERSION, _RECORD.size, len(program)))
+    encoded = {}
+    for pc, instruction in enumerate(program):
+        key = (instruction['opcode'], *instruction['operands'])
+        record = encoded.get(key)
+        if record is None:
+            record = encoded[key] = _encode_instruction(pc, instruction['opcode'], key[1:])
+        records += record
+    records += json.dumps(labels or {}, separators=(',', ':')).encode('utf-8')
+    return bytes(records)
+
+
+#Codifica una instruccion en su registro de largo fijo
+def _encode_instruction(pc, opcode, operands):
+    op = OPCODES.get(opcode)
+    if op is None:
+        raise ValueError(f"Instrucción {pc}: desconocida: {opcode}")
+    if len(operands) > 3:
+        raise ValueError(f"Instrucción {pc}: demasiados operandos")
+    kinds = 0
+    values = [0, 0, 0]
+    for position, operand in enumerate(operands):
+        if isinstance(operand, str):
+            if operand not in _GENERAL_REGISTERS:
+                raise ValueError(f"Instrucción {pc}: registro desconocido: {operand}")
+            kinds |= 1 << position
+            operand = REGISTER_NAMES.index(operand)
+        elif not _INT32[0] <= operand <= _INT32[1]:
+            raise ValueError(f"Instrucción {pc}: el valor {operand} no cabe en 32 bits")
+        values[position] = operand
+    return _RECORD.pack(op, len(operands), kinds, *values)
+
+
+#Funcion decode que lee una imagen binaria sin volver a ensamblar
+#Retorna (programa, etiquetas) con el programa ya compilado (lista de Instruction), listo para
+#PipelinedCPU o isa.CPU. Las instrucciones iguales comparten sus tuplas (solo cambia el pc)
+def decode(image):
+    if len(image) < _HEADER.size:
+        raise ValueError("La imagen no es un programa ensamblado")
+    magic, version, size, count = _HEADER.unpack_from(image, 0)
+    if magic != MAGIC:
+        raise ValueError("La imagen no es un programa ensamblado")
+    if version > VERSION or size != _RECORD.size:
+        raise ValueError(f"Versión de programa no soportada: {version}")
+    end = _HEADER.size + count * size
+    if len(image) < end:
+        raise ValueError("La imagen del programa está incompleta")
+    templates = {}
+    program = []
+    append = program.append
+    # Se crean millones de objetos sin ciclos: el recolector de ciclos solo haria mas lenta la carga
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        for pc, record in enumerate(_RECORD.iter_unpack(memoryview(image)[_HEADER.size:end])):
+            template = templates.get(record)
+            if template is None:
+                template = templates[record] = compile_instruction(_record_dict(record), 0)
+            append(Instruction(template.op, template.opcode, template.dest, template.srcs, template.args,
+                               template.slots, template.target, pc, template.operands))
+    finally:
+        if collecting:
+            gc.enable()
+    labels = json.loads(bytes(image[end:]).decode('utf-8')) if len(image) > end else {}
+    return program, labels
+
+
+def _record_dict(record):
+    op, count, kinds, *values = record
+    operands = [REGISTER_NAMES[value] if kinds >> position & 1 else value
+                for position, value in enumerate(values[:count])]
+    return {'opcode': OP_NAMES[op], 'operands': operands}
+
+
+#Funcion assemble que traduce el texto directamente a la imagen binaria
+def assemble(text):
+    return encode(*parse(text))
+
+
+#Funcion disassemble que escribe un programa como texto (con las etiquetas si se pasan)
+def disassemble(program, labels=None):
+    names = {}
+    for label, pc in (labels or {}).items():
+        names.setdefault(pc, []).append(label)
+    lines = []
+    for pc, instruction in enumerate(program):
+        for label in names.get(pc, ()):
+            lines.append(f"{label}:")
+        operands = [str(operand) for operand in instruction['operands']]
+        opcode = instruction['opcode']
+        if OPCODES[opcode] in BRANCH_OPS and names.get(instruction['operands'][0]):
+            operands[0] = names[instruction['operands'][0]][0]
+        lines.append(f"    {opcode} {', '.join(operands)}".rstrip())
+    return "\n".join(lines) + "\n"
+
+
+#Directorio por defecto de los programas ensamblados: __pycache__ junto al archivo fuente
+def _cache_dir(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), '__pycache__')
+
+
+#Funcion load que carga un programa desde un archivo de texto o una imagen binaria
+#Con texto, la imagen se guarda en cache_dir con el hash del contenido como nombre; la proxima vez
+#que se carga el mismo texto se lee la imagen sin ensamblar. cache_dir=False no usa la cache
+#Retorna (programa, etiquetas)
+def load(path, cache_dir=None):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] == MAGIC:
+        return decode(data)
+    if cache_dir is False:
+        return decode(assemble(data.decode('utf-8')))
+    if cache_dir is None:
+        cache_dir = _cache_dir(path)
+    digest = hashlib.sha256(MAGIC + struct.pack('<H', VERSION) + data).hexdigest()
+    cached = os.path.join(cache_dir, f"{digest}.tasm")
+    try:
+        with open(cached, 'rb') as f:
+            return decode(f.read())
+    except (OSError, ValueError):
+        pass
+    image = assemble(data.decode('utf-8'))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary = f"{cached}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(image)
+        os.replace(temporary, cached)
+    except OSError:
+        # Sin permiso de escritura se ensambla igual, solo que no queda en la cache
+        pass
+    return decode(image)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ensamblador de programas del simulador")
+    parser.add_argument('source', help="programa en texto (.asm) o imagen ensamblada")
+    parser.add_argument('-o', '--output', help="guarda la imagen binaria en este archivo")
+    parser.add_argument('-d', '--disassemble', action='store_true', help="muestra el programa como texto")
+    parser.add_argument('--run', choices=('pipeline', 'isa'), help="ejecuta el programa")
+    args = parser.parse_args(argv)
+
+    program, labels = load(args.source)
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(encode(program, labels))
+    if args.disassemble:
+        print(disassemble(program, labels), end='')
+    if args.run == 'pipeline':
+        from cpu.pipeline import PipelinedCPU
+        cpu = PipelinedCPU(program)
+        print(cpu.run())
+        print("Registros:", cpu.registers)
+    elif args.run == 'isa':
+        from cpu.isa import CPU
+        cpu = CPU(program)
+        print(f"Instrucciones: {cpu.run()}")
+        print("Registros:", cpu.registers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+from cpu.registros import REGISTER_INDEX, wrap
+
+#Codigos enteros de operacion, la CPU compara enteros en vez de cadenas
+OP_NOP = 0
+OP_MOV = 1
+OP_ADD = 2
+OP_SUB = 3
+OP_MUL = 4
+OP_SHL = 5
+OP_AND = 6
+OP_CMP = 7
+OP_LOAD = 8
+OP_STORE = 9
+OP_JMP = 10
+OP_JZ = 11
+OP_JNZ = 12
+
+#Traduccion del nombre de la instruccion a su codigo entero
+#JE es un alias de JZ, igual que en el decode original del pipeline
+OPCODES = {
+    'NOP': OP_NOP,
+    'MOV': OP_MOV,
+    'ADD': OP_ADD,
+    'SUB': OP_SUB,
+    'MUL': OP_MUL,
+    'SHL': OP_SHL,
+    'AND': OP_AND,
+    'CMP': OP_CMP,
+    'LOAD': OP_LOAD,
+    'STORE': OP_STORE,
+    'JMP': OP_JMP,
+    'JZ': OP_JZ,
+    'JE': OP_JZ,
+    'JNZ': OP_JNZ,
+}
+
+#Grupos de instrucciones segun como usan sus operandos
+ALU_OPS = frozenset((OP_ADD, OP_SUB, OP_MUL, OP_SHL, OP_AND))
+BRANCH_OPS = frozenset((OP_JMP, OP_JZ, OP_JNZ))
+#Instrucciones cuyo primer operando es el registro destino
+DEST_OPS = ALU_OPS | {OP_MOV, OP_LOAD}
+
+#Marca de "sin registro destino", se usa -1 para poder comparar siempre con enteros
+NO_REG = -1
+
+
+#Clase Instruction que guarda una instruccion ya decodificada en forma compacta
+#op: codigo entero de la operacion
+#opcode: nombre original, solo para mostrar el estado del pipeline
+#dest: indice del registro destino o NO_REG
+#srcs: tupla con los indices de los registros fuente
+#args: valores de los operandos fuente, con None donde va un registro
+#slots: pares (posicion en args, registro) que hay que leer al decodificar
+#target: destino de los saltos
+#pc: posicion de la instruccion dentro del programa
+#operands: operandos originales, se conservan para poder volver al formato de diccionario
+class Instruction:
+    __slots__ = ('op', 'opcode', 'dest', 'srcs', 'args', 'slots', 'target', 'pc', 'operands')
+
+    def __init__(self, op, opcode, dest, srcs, args, slots, target, pc, operands):
+        self.op = op
+        self.opcode = opcode
+        self.dest = dest
+        self.srcs = srcs
+        self.args = args
+        self.slots = slots
+        self.target = target
+        self.pc = pc
+        self.operands = operands
+
+    #Permite leer la instruccion como el diccionario original: instr['opcode'], instr['operands']
+    def __getitem__(self, key):
+        if key == 'opcode':
+            return self.opcode
+        if key == 'operands':
+            return list(self.operands)
+        raise KeyError(key)
+
+    def as_dict(self):
+        return {'opcode': self.opcode, 'operands': list(self.operands)}
+
+    def __repr__(self):
+        return f"Instruction({self.opcode} {', '.join(str(o) for o in self.operands)})"
+
+
+#Indica si un operando es un registro (cadena que empieza por "R")
+def is_register(operand):
+    return isinstance(operand, str) and operand.startswith('R')
+
+
+#Convierte el nombre de un registro en su indice
+def register_index(operand):
+    try:
+        return REGISTER_INDEX[operand]
+    except KeyError:
+        raise ValueError(f"Registro desconocido: {operand}") from None
+
+
+#Funcion compile_instruction que traduce una instruccion en formato diccionario
+#Recibe como parametros la instruccion y su posicion pc dentro del programa
+def compile_instruction(instruction, pc):
+    opcode = instruction['opcode']
+    operands = tuple(instruction.get('operands', ()))
+    op = OPCODES.get(opcode)
+    if op is None:
+        raise ValueError(f"Instrucción desconocida: {opcode}")
+
+    dest = NO_REG
+    target = None
+    sources = ()
+    if op in DEST_OPS:
+        dest = register_index(operands[0])
+        sources = operands[1:]
+    elif op in BRANCH_OPS:
+        target = operands[0]
+    elif op == OP_STORE or op == OP_CMP:
+        sources = operands
+
+    #Los operandos fuente que son registros se leen en el decode (con forwarding),
+    #los inmediatos quedan resueltos desde ahora (truncados a 64 bits, como los registros)
+    args = []
+    slots = []
+    for position, operand in enumerate(sources):
+        if is_register(operand):
+            slots.append((position, register_index(operand)))
+            args.append(None)
+        elif isinstance(operand, int):
+            args.append(wrap(operand))
+        else:
+            args.append(operand)
+    srcs = tuple(reg for _, reg in slots)
+    return Instruction(op, opcode, dest, srcs, tuple(args), tuple(slots), target, pc, operands)
+
+
+#Funcion compile_program que traduce el programa completo una sola vez al cargarlo
+#Acepta la lista de diccionarios {'opcode': ..., 'operands': [...]} o una lista ya compilada
+def compile_program(program):
+    compiled = []
+    for pc, instruction in enumerate(program):
+        if isinstance(instruction, Instruction) and instruction.pc == pc:
+            compiled.append(instruction)
+        else:
+            if isinstance(instruction, Instruction):
+                instruction = instruction.as_dict()
+            compiled.append(compile_instruction(instruction, pc))
+    return compiled
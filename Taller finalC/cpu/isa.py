@@ -1,25 +1,37 @@
+import os
+import sys
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.registros import RegisterFile, wrap
+from cpu.traductor import Translator
+from memoria.jerarquia import CacheHierarchy
+from memoria.principal import DataMemory
+
 #Clase CPU que simula los procesos de la isa como un pequeño computador
 class CPU:
     #Constructor de la clase CPU
     #Que requiere como parametros program
     #Para saber la serie de instrucciones para la CPU ejecutar
-    def __init__(self, program):
-        #La variable registers es un diccionario que contiene:
+    #memory_size es el numero de palabras de la memoria de datos
+    #cache: Cache o CacheHierarchy opcional; si se pasa, LOAD y STORE (y la busqueda de instrucciones
+    #si hay L1I) pasan por ella, asi la cache queda caliente para el modelo detallado (cpu/muestreo.py)
+    #translate: si es True run() ejecuta bloques basicos traducidos (cpu/traductor.py) en vez de
+    #interpretar instruccion por instruccion; si se modifica el programa hay que llamar a
+    #self.translator.invalidate()
+    def __init__(self, program, memory_size=256, cache=None, translate=True):
+        #La variable registers es el banco de registros (cpu/registros.py) que contiene:
         #Registros tempotales para alamacenar datos temporales, los que empiezan por "R"
         #"PC" lleva la cuenta de la posicion actual en el programa
         #"Z" es un indicador que se usa para saber si el resultado de la operacion es 0
-        self.registers = {
-            'R0': 0,
-            'R1': 0,
-            'R2': 0,
-            'R3': 0,
-            'PC': 0,    # Contador de programa
-            'Z': 0      # Flag de cero
-        }
-        #Se crea una lista de posiciones de 256 que simula la RAM donde se pueden leer y escribir datos
-        self.data_memory = [0] * 256  # Memoria de datos
+        #Se accede por nombre (registers['R0']) o por indice
+        self.registers = RegisterFile()
+        #Se crea una memoria de memory_size posiciones que simula la RAM donde se pueden leer y escribir datos
+        self.data_memory = DataMemory(memory_size)  # Memoria de datos
         #Conjunto de instrucciones a ejecutar 
         self.program = program        # Programa a ejecutar
+        self.cache = cache
+        self._icache = cache.fetch if isinstance(cache, CacheHierarchy) and cache.l1i is not None else None
+        self.translator = Translator(self) if translate else None
 
     #Funcion get_value que obtiene el valor de un operando (registro o valor inmediato)
     def get_value(self, operand):
@@ -48,29 +60,55 @@ class CPU:
         else:
             #Si se escribe una operacion no valida se muestra la operacion y un mensaje de alerta
             raise ValueError(f"Operación no soportada: {op}")
+        #El resultado se trunca a 64 bits antes de calcular Z, como en el registro
+        result = wrap(result)
         #Si el registro destino no existe en self.registers, lanzará un error de clave
         self.registers[dest] = result
         self.registers['Z'] = 1 if result == 0 else 0
 
+    #Metodo execute_logic que ejecuta SHL y AND (no modifican el flag Z, igual que en el pipeline)
+    def execute_logic(self, op, operands):
+        dest = operands[0]
+        src1 = self.get_value(operands[1])
+        src2 = self.get_value(operands[2])
+        if op == 'SHL':
+            self.registers[dest] = wrap(src1 << src2)
+        else:
+            self.registers[dest] = src1 & src2
+
+    #Metodo execute_mov copia un valor inmediato o de otro registro a un registro
+    def execute_mov(self, operands):
+        self.registers[operands[0]] = self.get_value(operands[1]) if len(operands) > 1 else 0
+
+    #Metodo execute_cmp compara dos operandos y actualiza el flag Z
+    def execute_cmp(self, operands):
+        self.registers['Z'] = 1 if self.get_value(operands[0]) == self.get_value(operands[1]) else 0
+
     #Metodo execute_load carga un valor de memoria a un registro
     #Recibe como parametro operands que es un arreglo donde se guardan registros
     def execute_load(self, operands):
         #Selecciona el registro destino.
         reg = operands[0]
-        #Seleccion la direccion de origen
-        address = operands[1]
+        #Seleccion la direccion de origen (inmediata o guardada en un registro)
+        address = self.get_value(operands[1])
         # Toma el valor del registro address de la memoria de datos y lo guarda en el registro 
-        self.registers[reg] = self.data_memory[address]
+        if self.cache is not None:
+            self.registers[reg] = self.cache.read(address, self.data_memory)
+        else:
+            self.registers[reg] = self.data_memory[address]
 
     #Metodo execute_store que almacena un valor de registro en memoria
     #Recibe como parametro operands que es un arreglo donde se guardan registros
     def execute_store(self, operands):
         #Selecciona el registro destino
         reg = operands[0]
-        #Seleccion la direccion de origen
-        address = operands[1]
+        #Seleccion la direccion de origen (inmediata o guardada en un registro)
+        address = self.get_value(operands[1])
         #Se toma el calor almacenado del registro y lo guarda en la posicion de memoria
-        self.data_memory[address] = self.registers[reg]
+        if self.cache is not None:
+            self.cache.write(address, self.get_value(reg), self.data_memory)
+        else:
+            self.data_memory[address] = self.get_value(reg)
 
     #Metodo execute_jump maneja los saltos condicionales
     #Recibe como parametros:
@@ -82,7 +120,7 @@ class CPU:
         #Selector que define que hace cada salto
         if op == 'JMP':
             self.registers['PC'] = target
-        elif op == 'JZ' and self.registers['Z'] == 1:
+        elif op in ('JZ', 'JE') and self.registers['Z'] == 1:
             self.registers['PC'] = target
         elif op == 'JNZ' and self.registers['Z'] == 0:
             self.registers['PC'] = target
@@ -94,6 +132,8 @@ class CPU:
         #Verfica si el prorgrama termino
         if pc >= len(self.program):
             return False  # Fin del programa
+        if self._icache is not None:
+            self._icache(pc)
         #Extrae la instruccion actual 
         instruction = self.program[pc]
         #Extrae el tipo de instruccion
@@ -112,8 +152,20 @@ class CPU:
         elif opcode == 'STORE':
             self.execute_store(operands)
         #Si es de salto
-        elif opcode in ['JMP', 'JZ', 'JNZ']:
+        elif opcode in ['JMP', 'JZ', 'JNZ', 'JE']:
             self.execute_jump(opcode, operands)
+        #Si es de movimiento entre registros
+        elif opcode == 'MOV':
+            self.execute_mov(operands)
+        #Si es logica
+        elif opcode in ['SHL', 'AND']:
+            self.execute_logic(opcode, operands)
+        #Si es de comparacion
+        elif opcode == 'CMP':
+            self.execute_cmp(operands)
+        #NOP no hace nada
+        elif opcode == 'NOP':
+            pass
         #En caso de no reconocer la instruccion
         else:
             raise ValueError(f"Instrucción desconocida: {opcode}")
@@ -124,13 +176,23 @@ class CPU:
 
         return True
     #Metodo que corre el programa por completo
-    def run(self):
-        cycle = 0
-        while (self.IF_stage or self.ID_stage or self.EX_stage or
-                self.MEM_stage or self.WB_stage):
-            self.step()
-            cycle += 1
-        print(f"Total ciclos: {cycle}")
+    #Esta CPU ejecuta una instruccion por ciclo, asi que retorna el numero de instrucciones ejecutadas
+    #max_steps permite cortar programas que no terminan (o avanzar solo esa cantidad de instrucciones)
+    #stop_pc detiene la ejecucion al llegar a esa instruccion, antes de ejecutarla
+    def run(self, max_steps=None, stop_pc=None):
+        if self.translator is not None:
+            cycle = self.translator.run(max_steps, stop_pc)
+        else:
+            cycle = 0
+            while max_steps is None or cycle < max_steps:
+                if stop_pc is not None and self.registers['PC'] == stop_pc:
+                    break
+                if not self.step():
+                    break
+                cycle += 1
+        #Los STORE que quedaron en el buffer de escritura de la cache llegan a la memoria al terminar
+        if self.cache is not None:
+            self.cache.drain_writes(self.data_memory)
         return cycle
 
 #Estos datos son de prueba para comprobar que la cache funcione por si sola y asi ir verificando los procesos
@@ -155,10 +217,11 @@ program = [
     {'opcode': 'JNZ', 'operands': [6]},  # Saltar a instrucción 6 si no es cero
 ]
 
-# Configurar CPU y ejecutar
-cpu = CPU(program)
-cpu.data_memory[0] = 0  # Inicializar valores en memoria
-cpu.data_memory[1] = 1
-cpu.run()
+# Configurar CPU y ejecutar (solo si se corre este archivo directamente)
+if __name__ == "__main__":
+    cpu = CPU(program)
+    cpu.data_memory[0] = 0  # Inicializar valores en memoria
+    cpu.data_memory[1] = 1
+    print(f"Total ciclos: {cpu.run()}")
 
-print("Resultado suma 1-5:", cpu.registers['R2'])  # Debería ser 15
\ No newline at end of file
+    print("Resultado suma 1-5:", cpu.registers['R2'])  # Debería ser 15
\ No newline at end of file
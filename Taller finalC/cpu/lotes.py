@@ -0,0 +1,260 @@
+import os
+import random
+import sys
+import time
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cpu.instrucciones import (ALU_OPS, NO_REG, OP_ADD, OP_AND, OP_CMP, OP_JMP, OP_JZ, OP_LOAD,
+                               OP_MOV, OP_MUL, OP_NOP, OP_SHL, OP_STORE, OP_SUB, compile_program)
+from cpu.registros import PC, REGISTER_NAMES, Z
+
+#Ejecucion en lote de isa.CPU: K instancias del mismo programa, cada una con su memoria de datos
+#(para fuzzing o barridos de entradas), avanzando juntas
+#Los registros son un arreglo de NumPy de forma (K, registros) y la memoria uno de forma (K, palabras);
+#cada instruccion se ejecuta con una sola operacion vectorizada para todas las instancias que estan
+#en ese PC. Cuando un salto se toma en unas instancias y en otras no, se separan: en cada paso se
+#ejecuta el menor PC de las instancias vivas solo para las instancias que estan ahi (mascara), asi las
+#que salen antes de un bucle esperan a las demas y se vuelven a juntar despues
+#Mientras todas las instancias estan en el mismo PC se sigue en linea recta sin armar mascaras
+#
+#El resultado de cada instancia es el mismo que con isa.CPU(program).run(max_steps, stop_pc) sobre su
+#memoria, salvo los errores; los valores que no caben en 64 bits se truncan igual que en isa.CPU
+#(salvo un SHL de 64 o mas posiciones, que en NumPy depende de la plataforma)
+
+
+#Clase BatchCPU
+#program: programa en formato diccionario o ya compilado (como lo devuelve cpu/ensamblador.py)
+#instances: numero K de instancias
+#memory_size: palabras de la memoria de datos de cada instancia
+class BatchCPU:
+    def __init__(self, program, instances, memory_size=256):
+        if np is None:
+            raise ImportError("BatchCPU necesita NumPy")
+        if instances < 1:
+            raise ValueError(f"El lote necesita al menos una instancia, no {instances}")
+        self.program = program
+        self.instances = instances
+        self._code = compile_program(program)
+        #Operandos fuente de cada instruccion como (registro, inmediato); registro NO_REG si es inmediato
+        self._sources = [tuple((NO_REG, value) if value is not None else (reg, None)
+                               for value, reg in zip(instruction.args, _slot_registers(instruction)))
+                         for instruction in self._code]
+        #Registros por fila (registro, instancia) para que cada registro sea contiguo;
+        #registers es la vista (instancia, registro)
+        self._regs = np.zeros((len(REGISTER_NAMES), instances), dtype=np.int64)
+        self.registers = self._regs.T
+        self.data_memory = np.zeros((instances, memory_size), dtype=np.int64)
+        #Instrucciones ejecutadas por cada instancia
+        self.steps = np.zeros(instances, dtype=np.int64)
+        self._rows = np.arange(instances)
+
+    #Crea un lote con una instancia por memoria inicial (cada una una secuencia de palabras)
+    @classmethod
+    def from_memories(cls, program, memories, memory_size=None):
+        memories = [list(memory) for memory in memories]
+        size = max(memory_size or 0, max(len(memory) for memory in memories))
+        batch = cls(program, len(memories), size)
+        for index, memory in enumerate(memories):
+            batch.data_memory[index, :len(memory)] = memory
+        return batch
+
+    #Metodo load que copia values a partir de start en la memoria de todas las instancias
+    #values puede ser una secuencia (la misma para todas) o un arreglo de forma (K, n)
+    def load(self, values, start=0):
+        values = np.asarray(values, dtype=np.int64)
+        self.data_memory[:, start:start + values.shape[-1]] = values
+
+    #Valores de un registro (nombre o indice) en todas las instancias
+    def register(self, name):
+        return self._regs[REGISTER_NAMES.index(name) if isinstance(name, str) else name]
+
+    #Registros de una instancia como diccionario nombre -> valor
+    def instance_registers(self, index):
+        return {name: int(value) for name, value in zip(REGISTER_NAMES, self._regs[:, index])}
+
+    #Metodo run que corre todas las instancias hasta que terminan, como isa.CPU.run
+    #max_steps y stop_pc se aplican a cada instancia por separado
+    #Retorna las instrucciones ejecutadas en esta corrida por cada instancia (arreglo de K enteros)
+    def run(self, max_steps=None, stop_pc=None):
+        code = self._code
+        n = len(code)
+        pcs = self._regs[PC]
+        steps = np.zeros(self.instances, dtype=np.int64)
+        everyone = slice(None)
+        while True:
+            live = pcs < n
+            if stop_pc is not None:
+                live &= pcs != stop_pc
+            if max_steps is not None:
+                live &= steps < max_steps
+            live_pcs = pcs[live]
+            if not len(live_pcs):
+                break
+            pc = int(live_pcs.min())
+            if len(live_pcs) == self.instances and pc == live_pcs.max():
+                # Todas en el mismo PC: se sigue en línea recta hasta que un salto las separe
+                budget = None if max_steps is None else max_steps - int(steps.max())
+                executed = 0
+                while pc < n and pc != stop_pc and (budget is None or executed < budget):
+                    following = self._execute(code[pc], pc, everyone)
+                    executed += 1
+                    if following is None:
+                        break
+                    pc = following
+                else:
+                    pcs[:] = pc
+                steps += executed
+                continue
+            lanes = np.flatnonzero(live & (pcs == pc))
+            following = self._execute(code[pc], pc, lanes)
+            if following is not None:
+                pcs[lanes] = following
+            steps[lanes] += 1
+        self.steps += steps
+        return steps
+
+    def _value(self, source, lanes):
+        reg, value = source
+        if reg == NO_REG:
+            return value
+        return self._regs[reg, lanes]
+
+    #Ejecuta la instruccion del PC pc en las instancias lanes (slice(None) = todas)
+    #Retorna el PC siguiente si es el mismo para todas las instancias (el que llama lo escribe) o None
+    #si ya se escribio el PC de cada una
+    def _execute(self, instruction, pc, lanes):
+        regs = self._regs
+        op = instruction.op
+        sources = self._sources[pc]
+        if op in ALU_OPS:
+            a = self._value(sources[0], lanes)
+            b = self._value(sources[1], lanes)
+            if op == OP_ADD:
+                result = a + b
+            elif op == OP_SUB:
+                result = a - b
+            elif op == OP_MUL:
+                result = a * b
+            elif op == OP_SHL:
+                result = a << b
+            else:
+                result = a & b
+            regs[instruction.dest, lanes] = result
+            # SHL y AND no modifican Z
+            if op != OP_SHL and op != OP_AND:
+                regs[Z, lanes] = result == 0
+        elif op == OP_LOAD:
+            address = self._value(sources[0], lanes)
+            regs[instruction.dest, lanes] = self.data_memory[self._memory_rows(lanes, address), address]
+        elif op == OP_STORE:
+            value = self._value(sources[0], lanes)
+            address = self._value(sources[1], lanes)
+            self.data_memory[self._memory_rows(lanes, address), address] = value
+        elif op == OP_MOV:
+            regs[instruction.dest, lanes] = self._value(sources[0], lanes) if sources else 0
+        elif op == OP_CMP:
+            regs[Z, lanes] = self._value(sources[0], lanes) == self._value(sources[1], lanes)
+        elif op != OP_NOP:
+            return self._branch(instruction, pc, lanes)
+        if instruction.dest == PC:
+            # Igual que isa.CPU: si el PC quedó igual se avanza a la siguiente instrucción
+            written = regs[PC, lanes]
+            regs[PC, lanes] = np.where(written == pc, pc + 1, written)
+            return None
+        return pc + 1
+
+    # Filas de la memoria para indexar junto con address: con una dirección por instancia y todas
+    # las instancias hace falta el arreglo de filas, no el slice
+    def _memory_rows(self, lanes, address):
+        if isinstance(lanes, slice) and np.ndim(address):
+            return self._rows
+        return lanes
+
+    def _branch(self, instruction, pc, lanes):
+        target = instruction.target
+        # isa.CPU avanza el PC si quedó igual, así que un salto a sí mismo sigue de largo
+        if target == pc or instruction.op == OP_JMP:
+            return target if target != pc else pc + 1
+        flags = self._regs[Z, lanes]
+        taken = flags == 1 if instruction.op == OP_JZ else flags == 0
+        if taken.all():
+            return target
+        if not taken.any():
+            return pc + 1
+        self._regs[PC, lanes] = np.where(taken, target, pc + 1)
+        return None
+
+
+#Registro de cada operando fuente, en el orden de args (NO_REG para los inmediatos)
+def _slot_registers(instruction):
+    registers = [NO_REG] * len(instruction.args)
+    for position, reg in instruction.slots:
+        registers[position] = reg
+    return registers
+
+
+#Funcion verify que compara instancias del lote con isa.CPU corrida sobre la memoria inicial de cada una
+#memories: memorias iniciales de las instancias a comparar (en el orden del lote)
+#Retorna la lista de indices que no coinciden (registros, memoria o instrucciones ejecutadas)
+def verify(batch, memories, indices, max_steps=None, stop_pc=None, steps=None):
+    from cpu.isa import CPU
+
+    mismatches = []
+    for index in indices:
+        cpu = CPU(batch.program, memory_size=batch.data_memory.shape[1])
+        cpu.data_memory.load(memories[index])
+        executed = cpu.run(max_steps, stop_pc)
+        same = (list(cpu.registers.cells) == batch._regs[:, index].tolist()
+                and cpu.data_memory[:] == batch.data_memory[index].tolist()
+                and (steps is None or executed == steps[index]))
+        if not same:
+            mismatches.append(index)
+    return mismatches
+
+
+def main(argv=None):
+    import argparse
+    from cpu import ensamblador
+    from cpu.isa import CPU
+
+    parser = argparse.ArgumentParser(description="Corre un programa en lote sobre memorias aleatorias")
+    parser.add_argument('source', help="programa en texto (.asm) o imagen ensamblada")
+    parser.add_argument('--instances', type=int, default=1000)
+    parser.add_argument('--memory-size', type=int, default=64)
+    parser.add_argument('--max-value', type=int, default=100, help="valores aleatorios de 0 a este número")
+    parser.add_argument('--max-steps', type=int, help="corta cada instancia después de esta cantidad de pasos")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--check', type=int, default=20, help="instancias a comparar con isa.CPU")
+    args = parser.parse_args(argv)
+
+    program, _ = ensamblador.load(args.source)
+    rng = random.Random(args.seed)
+    memories = [[rng.randint(0, args.max_value) for _ in range(args.memory_size)]
+                for _ in range(args.instances)]
+    batch = BatchCPU.from_memories(program, memories, args.memory_size)
+    start = time.perf_counter()
+    steps = batch.run(args.max_steps)
+    elapsed = time.perf_counter() - start
+    print(f"Lote: {args.instances} instancias, {int(steps.sum())} instrucciones en {elapsed:.3f} s "
+          f"({steps.sum() / max(elapsed, 1e-9):.0f} instr/s)")
+
+    sample = sorted(rng.sample(range(args.instances), min(args.check, args.instances)))
+    start = time.perf_counter()
+    for index in sample:
+        cpu = CPU(program, memory_size=args.memory_size)
+        cpu.data_memory.load(memories[index])
+        cpu.run(args.max_steps)
+    serial = (time.perf_counter() - start) / max(len(sample), 1) * args.instances
+    print(f"isa.CPU una por una (estimado): {serial:.3f} s")
+    mismatches = verify(batch, memories, sample, args.max_steps, steps=steps)
+    print(f"Comparadas con isa.CPU: {len(sample)}, distintas: {mismatches or 'ninguna'}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
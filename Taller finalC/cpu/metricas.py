@@ -0,0 +1,282 @@
+import json
+import os
+import sys
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.instrucciones import OP_JMP
+
+#Registro de metricas de PipelinedCPU: contadores e histogramas con nombre que se acumulan entre
+#corridas (run() pone en cero los contadores de la CPU, el registro no) y se pueden leer en cualquier ciclo
+#Se activa con PipelinedCPU(program, registry=MetricsRegistry()) o cpu.set_registry(...)
+#
+#Los contadores son los mismos de las metricas de run() (cycles, stalls, cache_hits, l2_misses, ...):
+#el registro no cuenta nada en el bucle de la CPU, suma lo que cambio desde la ultima lectura
+#(collect) al final de cada corrida y en cada muestra, asi que no hace mas lento a run()
+#Histogramas:
+#  cache_set_evictions: bloques reemplazados por conjunto de la cache de datos (L1D con jerarquia)
+#  stage_occupancy, opcodes: ciclos con cada etapa ocupada e instrucciones terminadas por opcode;
+#  hay que mirar cada ciclo, solo se llenan con MetricsRegistry(detailed=True) (bucle instrumentado)
+#Observadores: subscribe(callback, every) llama callback(snapshot) cada every ciclos de la corrida;
+#run() corre el bucle normal en tramos de every ciclos y toma la muestra entre tramo y tramo
+
+STAGES = ('IF', 'ID', 'EX', 'MEM', 'WB')
+
+#Descripcion de los contadores conocidos (la linea HELP del formato de Prometheus)
+HELP = {
+    'cycles': "Ciclos simulados",
+    'stalls': "Ciclos de stall",
+    'cache_hits': "Lecturas de datos que acertaron en la cache",
+    'cache_misses': "Lecturas de datos que fallaron en la cache",
+    'interrupts': "Interrupciones atendidas",
+    'instructions': "Instrucciones terminadas",
+    'memory_stalls': "Ciclos esperando a la memoria",
+    'skipped_cycles': "Ciclos saltados por el bucle dirigido por eventos",
+    'branches': "Saltos resueltos",
+    'mispredictions': "Saltos mal predichos",
+    'cache_set_evictions': "Bloques reemplazados por conjunto de la cache de datos",
+    'stage_occupancy': "Ciclos con cada etapa del pipeline ocupada",
+    'opcodes': "Instrucciones terminadas por opcode",
+}
+
+
+#Clase Counter: contador que solo crece
+class Counter:
+    def __init__(self, name, help=''):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+#Clase Histogram: cuentas por valor de una etiqueta (opcode, etapa, conjunto...)
+class Histogram:
+    def __init__(self, name, label, help=''):
+        self.name = name
+        self.label = label
+        self.help = help
+        self.counts = {}
+
+    def observe(self, key, amount=1):
+        self.counts[key] = self.counts.get(key, 0) + amount
+
+
+#Clase MetricsRegistry que guarda las metricas y los observadores
+#detailed: llena tambien stage_occupancy y opcodes (run() usa el bucle instrumentado)
+class MetricsRegistry:
+    def __init__(self, detailed=False):
+        self.detailed = detailed
+        self.counters = {}
+        self.histograms = {}
+        #Observadores como [cada cuantos ciclos, ciclo de la proxima muestra, callback]
+        self.observers = []
+        #Ultimos valores leidos de la CPU _cpu, para sumar solo la diferencia
+        self._cpu = None
+        self._last = {}
+        self._last_sets = []
+
+    #Metodo counter que devuelve el contador name (lo crea si no existe)
+    def counter(self, name, help=None):
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = Counter(name, HELP.get(name, '') if help is None else help)
+        return counter
+
+    #Metodo histogram que devuelve el histograma name (lo crea si no existe)
+    def histogram(self, name, label, help=None):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(name, label, HELP.get(name, '') if help is None else help)
+        elif histogram.label != label:
+            raise ValueError(f"El histograma {name} usa la etiqueta {histogram.label}, no {label}")
+        return histogram
+
+    #Metodo reset que pone todo en cero (los observadores siguen suscritos)
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+        self._cpu = None
+        self._last = {}
+        self._last_sets = []
+
+    #Metodo subscribe que llama callback(snapshot) cada every ciclos de cada corrida
+    def subscribe(self, callback, every):
+        if every < 1:
+            raise ValueError(f"El periodo de muestreo debe ser de al menos 1 ciclo, no {every}")
+        self.observers.append([every, every, callback])
+        return callback
+
+    def unsubscribe(self, callback):
+        self.observers = [observer for observer in self.observers if observer[2] is not callback]
+
+    #Ciclo (de la corrida actual) de la proxima muestra
+    @property
+    def next_sample(self):
+        return min(observer[1] for observer in self.observers)
+
+    #Metodo start_run que llama PipelinedCPU.run antes de poner en cero sus contadores
+    #Lo pendiente solo se suma si los ultimos valores leidos son de esta misma CPU: los contadores
+    #de otra CPU no se pueden restar de los de la anterior
+    def start_run(self, cpu):
+        if cpu is self._cpu:
+            self.collect(cpu)
+        self._cpu = cpu
+        self._last = {}
+        self._last_sets = []
+        for observer in self.observers:
+            observer[1] = observer[0]
+
+    #Metodo collect que suma al registro lo que cambio en la CPU desde la ultima lectura
+    #metrics: las metricas de run() si ya estan armadas (por defecto cpu.current_metrics())
+    def collect(self, cpu, metrics=None):
+        if metrics is None:
+            metrics = cpu.current_metrics()
+        if cpu is not self._cpu:
+            #Una CPU que el registro no habia leido: todo lo que conto desde su run() es nuevo
+            self._cpu = cpu
+            self._last = {}
+            self._last_sets = []
+        last = self._last
+        current = {}
+        for name, value in metrics.items():
+            # Solo los contadores enteros; las proporciones (prediction_accuracy) no se suman
+            if type(value) is not int:
+                continue
+            current[name] = value
+            self.counter(name).inc(value - last.get(name, 0))
+        self._last = current
+
+        evictions = cpu.cache.set_evictions
+        last_sets = self._last_sets
+        if len(last_sets) != len(evictions):
+            last_sets = [0] * len(evictions)
+        histogram = None
+        for index, value in enumerate(evictions):
+            if value != last_sets[index]:
+                if histogram is None:
+                    histogram = self.histogram('cache_set_evictions', 'set')
+                histogram.observe(index, value - last_sets[index])
+        self._last_sets = list(evictions)
+
+    #Metodo sample que llama run() cada vez que llega el ciclo de una muestra
+    def sample(self, cpu):
+        cycle = cpu.cycle_count
+        snapshot = None
+        for observer in self.observers:
+            every, due, callback = observer
+            if cycle >= due:
+                if snapshot is None:
+                    snapshot = self.snapshot(cpu)
+                observer[1] = (cycle // every + 1) * every
+                callback(snapshot)
+
+    #Metodo snapshot que devuelve las metricas acumuladas como diccionario
+    #Con cpu primero se suma lo que cambio en la CPU y se agrega su ciclo actual ('cycle')
+    def snapshot(self, cpu=None):
+        snapshot = {}
+        if cpu is not None:
+            self.collect(cpu)
+            snapshot['cycle'] = cpu.cycle_count
+        snapshot['counters'] = {name: counter.value for name, counter in self.counters.items()}
+        snapshot['histograms'] = {name: dict(histogram.counts) for name, histogram in self.histograms.items()}
+        return snapshot
+
+    #Metodo totals que devuelve los contadores acumulados como las metricas de run()
+    def totals(self, cpu=None):
+        if cpu is not None:
+            self.collect(cpu)
+        return {name: counter.value for name, counter in self.counters.items()}
+
+    def to_json(self, cpu=None, snapshot=None):
+        return json.dumps(snapshot if snapshot is not None else self.snapshot(cpu), sort_keys=True)
+
+    #Metodo to_prometheus que escribe las metricas en el formato de texto de Prometheus
+    #Los contadores quedan como <prefix><nombre>_total y los histogramas como un contador con etiqueta
+    def to_prometheus(self, cpu=None, snapshot=None, prefix='sim_'):
+        if snapshot is None:
+            snapshot = self.snapshot(cpu)
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = f"{prefix}{name}_total"
+            help = self.counters[name].help if name in self.counters else HELP.get(name, '')
+            if help:
+                lines.append(f"# HELP {metric} {_escape_help(help)}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, counts in sorted(snapshot['histograms'].items()):
+            metric = f"{prefix}{name}_total"
+            histogram = self.histograms.get(name)
+            label = histogram.label if histogram is not None else 'key'
+            help = histogram.help if histogram is not None else HELP.get(name, '')
+            if help:
+                lines.append(f"# HELP {metric} {_escape_help(help)}")
+            lines.append(f"# TYPE {metric} counter")
+            for key, value in sorted(counts.items(), key=lambda item: str(item[0])):
+                lines.append(f'{metric}{{{label}="{_escape_label(key)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    #Metodo before del bucle instrumentado (solo con detailed), como Profiler.before
+    def before(self, cpu):
+        branch = None
+        instruction = cpu.IF_stage
+        # Sin predictor los saltos terminan en decode: no llegan a WB
+        if (cpu.predictor is None and instruction is not None and instruction.op >= OP_JMP
+                and cpu.stall is not True):
+            branch = instruction
+        return cpu.interrupt_count, cpu.mem_wait, branch
+
+    #Metodo after que cuenta la ocupacion de las etapas y la instruccion que termino en el ciclo
+    def after(self, cpu, state):
+        interrupts, mem_wait, branch = state
+        occupancy = self.histogram('stage_occupancy', 'stage').counts
+        stages = (cpu.IF_stage, cpu.ID_stage, cpu.EX_stage, cpu.MEM_stage, cpu.WB_stage)
+        for name, stage in zip(STAGES, stages):
+            if stage is not None:
+                occupancy[name] = occupancy.get(name, 0) + 1
+        # En un ciclo de la rutina de interrupcion o de espera a la memoria no termina nada
+        if cpu.interrupt_count != interrupts or mem_wait:
+            return
+        opcodes = self.histogram('opcodes', 'opcode').counts
+        if cpu.WB_stage is not None:
+            opcode = cpu.WB_stage[0].opcode
+            opcodes[opcode] = opcodes.get(opcode, 0) + 1
+        if branch is not None:
+            opcodes[branch.opcode] = opcodes.get(branch.opcode, 0) + 1
+
+
+def _escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+#Observador que agrega cada muestra como una linea JSON a un archivo (se puede seguir con tail -f)
+class JsonLinesObserver:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, snapshot):
+        self.file.write(json.dumps(snapshot, sort_keys=True) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+#Observador que reescribe un archivo .prom con la ultima muestra (textfile collector de node_exporter)
+#El archivo se escribe aparte y se reemplaza, asi nunca se lee a medio escribir
+class PrometheusFileObserver:
+    def __init__(self, registry, path, prefix='sim_'):
+        self.registry = registry
+        self.path = path
+        self.prefix = prefix
+
+    def __call__(self, snapshot):
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(self.registry.to_prometheus(snapshot=snapshot, prefix=self.prefix))
+        os.replace(temporary, self.path)
@@ -0,0 +1,123 @@
+import os
+import sys
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.isa import CPU
+from cpu.pipeline import PipelinedCPU
+
+#Simulacion muestreada: avance rapido con el modelo funcional (isa.CPU) y regiones de interes
+#con el modelo detallado (PipelinedCPU), al estilo de SimPoint / SMARTS
+#Los dos modelos comparten la memoria de datos y la cache, asi el traspaso de estado solo copia
+#los registros (incluidos PC y Z)
+
+#Metricas del modelo detallado que se guardan en cada muestra
+SAMPLE_METRICS = ('cycles', 'instructions', 'stalls', 'cache_hits', 'cache_misses')
+
+
+#Funcion transfer_state que copia el estado arquitectonico de una CPU a otra
+#Los registros se copian en bloque; la memoria de datos se comparte (no se copia)
+#Si el destino es un PipelinedCPU, su pipeline queda vacio listo para empezar en el PC copiado
+def transfer_state(source, target):
+    if isinstance(target, PipelinedCPU):
+        target.load_state(source.registers)
+    else:
+        target.registers.cells[:] = source.registers.cells
+    target.data_memory = source.data_memory
+
+
+#Clase Sampler que alterna los dos modelos sobre un mismo programa
+class Sampler:
+    #Constructor que recibe como parametros
+    #program: programa en el formato de siempre (lista de diccionarios)
+    #memory_size: palabras de la memoria de datos
+    #cache: Cache o CacheHierarchy compartida (por defecto la cache de PipelinedCPU)
+    #data: valores iniciales de la memoria de datos (opcional)
+    #warm_cache: si es True el avance rapido tambien accede a la cache y la deja caliente;
+    #si es False la cache se vacia antes de cada avance y cada region empieza con la cache fria
+    def __init__(self, program, memory_size=256, cache=None, data=None, warm_cache=True):
+        self.detailed = PipelinedCPU(program, memory_size=memory_size, cache=cache)
+        self.cache = self.detailed.cache
+        self.functional = CPU(program, memory_size, cache=self.cache if warm_cache else None)
+        if data is not None:
+            self.functional.data_memory.load(data)
+        self.detailed.data_memory = self.functional.data_memory
+        self.warm_cache = warm_cache
+        #Instrucciones ejecutadas hasta ahora por los dos modelos
+        self.instructions = 0
+        self.fast_forwarded = 0
+        #Una entrada por region detallada: {'start', 'weight', 'cpi', y las SAMPLE_METRICS}
+        self.samples = []
+
+    @property
+    def finished(self):
+        return self.functional.registers['PC'] >= len(self.functional.program)
+
+    #Metodo fast_forward que avanza con el modelo funcional
+    #instructions: cuantas instrucciones ejecutar (None = sin limite)
+    #stop_pc: se detiene al llegar a esa instruccion (por ejemplo el inicio de un bucle marcado)
+    #Retorna el numero de instrucciones ejecutadas
+    def fast_forward(self, instructions=None, stop_pc=None):
+        if not self.warm_cache:
+            self.cache.clear(self.functional.data_memory)
+        steps = self.functional.run(max_steps=instructions, stop_pc=stop_pc)
+        self.instructions += steps
+        self.fast_forwarded += steps
+        return steps
+
+    #Metodo detail que simula con el pipeline una region de unas instructions instrucciones
+    #El pipeline se llena desde vacio y al final se vacia, asi que la region puede pasarse por
+    #unas pocas instrucciones (las que estaban en vuelo) y su CPI incluye el llenado
+    #weight: peso de la muestra al estimar el CPI total (por defecto sus instrucciones)
+    #Retorna la muestra o None si el programa ya habia terminado
+    def detail(self, instructions, weight=None):
+        if self.finished:
+            return None
+        transfer_state(self.functional, self.detailed)
+        metrics = self.detailed.run(max_instructions=instructions)
+        transfer_state(self.detailed, self.functional)
+        sample = {'start': self.instructions}
+        for name in SAMPLE_METRICS:
+            sample[name] = metrics[name]
+        sample['cpi'] = metrics['cycles'] / max(metrics['instructions'], 1)
+        sample['weight'] = metrics['instructions'] if weight is None else weight
+        self.instructions += metrics['instructions']
+        self.samples.append(sample)
+        return sample
+
+    #Metodo run_periodic: muestreo sistematico, cada period instrucciones se simulan detail en detalle
+    #y el resto con el modelo funcional, hasta que termina el programa
+    def run_periodic(self, period, detail):
+        if detail > period:
+            raise ValueError(f"La región detallada ({detail}) no cabe en el periodo ({period})")
+        while not self.finished:
+            self.fast_forward(period - detail)
+            self.detail(detail)
+        return self.estimate()
+
+    #Metodo run_regions: simula solo las regiones indicadas, por ejemplo las que elige SimPoint
+    #regions: lista de (inicio, largo) o (inicio, largo, peso), con el inicio en instrucciones
+    #desde el comienzo del programa
+    def run_regions(self, regions):
+        for region in sorted(regions):
+            start, length = region[0], region[1]
+            weight = region[2] if len(region) > 2 else None
+            if start > self.instructions:
+                self.fast_forward(start - self.instructions)
+            self.detail(length, weight)
+        return self.estimate()
+
+    #Metodo estimate que extrapola el total a partir de las muestras
+    #El CPI estimado es el promedio de los CPI de las muestras ponderado por su peso
+    def estimate(self):
+        total_weight = sum(sample['weight'] for sample in self.samples)
+        if not total_weight:
+            return {'instructions': self.instructions, 'samples': 0,
+                    'detailed_instructions': 0, 'cpi': None, 'cycles': None}
+        cpi = sum(sample['cpi'] * sample['weight'] for sample in self.samples) / total_weight
+        return {
+            'instructions': self.instructions,
+            'samples': len(self.samples),
+            'detailed_instructions': self.instructions - self.fast_forwarded,
+            'cpi': cpi,
+            'cycles': round(cpi * self.instructions),
+        }
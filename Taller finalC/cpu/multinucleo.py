@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.pipeline import PipelinedCPU
+from memoria.coherencia import PROTOCOLS, CoherentCache, SnoopingBus
+from memoria.principal import DataMemory
+
+#Simulacion de varios nucleos: N PipelinedCPU, cada una con su L1 de datos privada (CoherentCache),
+#que comparten una memoria de datos a traves de un bus con snooping MSI o MESI (memoria/coherencia.py)
+#
+#Los nucleos avanzan juntos: en cada ciclo se llama step() de cada nucleo que sigue ocupado, en orden
+#de numero, asi los accesos a memoria se intercalan siempre igual y la corrida es reproducible
+#Con quantum > 1 cada nucleo corre quantum ciclos seguidos antes de pasar al siguiente (menos
+#intercalado pero mas rapido con muchos nucleos); la coherencia sigue siendo correcta
+
+
+def ins(opcode, *operands):
+    return {'opcode': opcode, 'operands': list(operands)}
+
+
+#Clase MultiCoreSystem
+#programs: un programa por nucleo (lista de instrucciones en formato diccionario)
+#protocol: 'msi' o 'mesi'
+#cache_options: parametros de cada CoherentCache (num_lines, block_size, associativity, latencias...)
+#cpu_options: se pasan a cada PipelinedCPU (predictor, btb...)
+class MultiCoreSystem:
+    def __init__(self, programs, memory_size=256, protocol='mesi', cache_options=None, **cpu_options):
+        if not programs:
+            raise ValueError("El sistema necesita al menos un núcleo")
+        self.memory = DataMemory(memory_size)
+        self.bus = SnoopingBus(self.memory, protocol)
+        self.cores = []
+        for program in programs:
+            cache = CoherentCache(self.bus, **(cache_options or {}))
+            core = PipelinedCPU(program, memory_size=1, cache=cache, **cpu_options)
+            core.data_memory = self.memory
+            self.cores.append(core)
+
+    #Metodo run que corre todos los nucleos hasta que terminan (o hasta stop_cycle)
+    #Retorna las metricas del sistema, las de cada nucleo ('cores') y el trafico del bus ('bus')
+    def run(self, quantum=1, stop_cycle=None):
+        if quantum < 1:
+            raise ValueError(f"El quantum debe ser de al menos 1 ciclo, no {quantum}")
+        self.bus.reset_stats()
+        for core in self.cores:
+            # Prepara la corrida (contadores en cero y primer fetch) sin simular ningún ciclo
+            core.run(stop_cycle=0)
+        if quantum == 1 and not self._instrumented():
+            self._run_lockstep(stop_cycle)
+        else:
+            self._run_quantum(quantum, stop_cycle)
+
+        cores = []
+        for core in self.cores:
+            metrics = core.run(stop_cycle=core.cycle_count, resume=True)
+            for key in ('invalidations', 'coherence_misses', 'upgrades', 'writebacks'):
+                metrics[key] = getattr(core.cache, key)
+            cores.append(metrics)
+        cycles = max(metrics['cycles'] for metrics in cores)
+        instructions = sum(metrics['instructions'] for metrics in cores)
+        metrics = {
+            'cycles': cycles,
+            'instructions': instructions,
+            'ipc': instructions / cycles if cycles else 0.0,
+            'cache_hits': sum(metrics['cache_hits'] for metrics in cores),
+            'cache_misses': sum(metrics['cache_misses'] for metrics in cores),
+        }
+        metrics.update(self.bus.stats())
+        metrics['cores'] = cores
+        return metrics
+
+    # Con traza, perfil o métricas detalladas hay que pasar por el bucle de run() de cada núcleo
+    def _instrumented(self):
+        return any(core._cycle_tracers() or core.profiler is not None
+                   or (core.registry is not None and core.registry.detailed) for core in self.cores)
+
+    # Un ciclo de cada núcleo por vuelta; la lista solo se rearma cuando termina algún núcleo
+    def _run_lockstep(self, stop_cycle=None):
+        active = [(core.step, core.pipeline_busy) for core in self.cores if core.pipeline_busy()]
+        cycle = 0
+        while active:
+            if stop_cycle is not None and cycle >= stop_cycle:
+                break
+            for step, _ in active:
+                step()
+            cycle += 1
+            for _, busy in active:
+                if not busy():
+                    active = [(step, busy) for step, busy in active if busy()]
+                    break
+
+    def _run_quantum(self, quantum, stop_cycle=None):
+        active = [core for core in self.cores if core.pipeline_busy()]
+        cycle = 0
+        while active:
+            if stop_cycle is not None and cycle >= stop_cycle:
+                break
+            cycle += quantum
+            if stop_cycle is not None:
+                cycle = min(cycle, stop_cycle)
+            for core in active:
+                core._run_loop(core._cycle_tracers(), None, cycle)
+            active = [core for core in active if core.pipeline_busy()]
+
+    #Metodo read que lee una palabra de la memoria compartida con su valor coherente
+    def read(self, address):
+        return self.bus.read_word(address)
+
+    #Metodo flush que copia a la memoria compartida los datos modificados que siguen en las caches
+    def flush(self):
+        self.bus.flush()
+
+
+#Cargas paralelas: cada una devuelve (un programa por nucleo, datos iniciales, tamaño de memoria)
+#Los saltos van precedidos de un NOP, como en Test/Rendimiento.py
+
+#Cada resultado ocupa su propio bloque (hasta bloques de 16 palabras) o comparte bloque con los demas
+RESULT_STRIDE = 16
+
+
+#Suma de un arreglo repartido entre los nucleos; cada nucleo acumula en memoria su suma parcial
+#padded: cada suma parcial en su propio bloque (sin compartir) o todas seguidas (falso compartido)
+def _partial_sums(cores, scale, padded):
+    chunk = max(1, int(64 * scale))
+    results = cores * chunk
+    data = [(index * 7) % 13 for index in range(cores * chunk)]
+    programs = []
+    for core in range(cores):
+        slot = results + (core * RESULT_STRIDE if padded else core)
+        programs.append([
+            ins('MOV', 'R1', core * chunk),
+            ins('MOV', 'R3', chunk),
+            # bucle (2)
+            ins('LOAD', 'R4', 'R1'),
+            ins('LOAD', 'R2', slot),
+            ins('ADD', 'R2', 'R2', 'R4'),
+            ins('STORE', 'R2', slot),
+            ins('ADD', 'R1', 'R1', 1),
+            ins('SUB', 'R3', 'R3', 1),
+            ins('NOP'),
+            ins('JNZ', 2),
+        ])
+    return programs, data, results + cores * RESULT_STRIDE
+
+
+def carga_privado(cores, scale=1.0):
+    return _partial_sums(cores, scale, True)
+
+
+def carga_falso_compartido(cores, scale=1.0):
+    return _partial_sums(cores, scale, False)
+
+
+#Todos los nucleos incrementan el mismo contador (sin candado: se pierden incrementos, es solo trafico)
+def carga_contador(cores, scale=1.0):
+    iterations = max(1, int(64 * scale))
+    program = [
+        ins('MOV', 'R3', iterations),
+        # bucle (1)
+        ins('LOAD', 'R1', 0),
+        ins('ADD', 'R1', 'R1', 1),
+        ins('STORE', 'R1', 0),
+        ins('SUB', 'R3', 'R3', 1),
+        ins('NOP'),
+        ins('JNZ', 1),
+    ]
+    return [program] * cores, None, RESULT_STRIDE
+
+
+PARALLEL_WORKLOADS = {
+    'privado': carga_privado,
+    'falso_compartido': carga_falso_compartido,
+    'contador': carga_contador,
+}
+
+
+#Crea el sistema con una carga paralela ya en memoria
+def build_system(workload, cores, scale=1.0, protocol='mesi', cache_options=None, **cpu_options):
+    try:
+        programs, data, memory_size = PARALLEL_WORKLOADS[workload](cores, scale)
+    except KeyError:
+        raise ValueError(f"Carga paralela desconocida: {workload}") from None
+    system = MultiCoreSystem(programs, memory_size, protocol, cache_options, **cpu_options)
+    if data is not None:
+        system.memory.load(data)
+    return system
+
+
+def print_metrics(metrics):
+    print(f"Ciclos: {metrics['cycles']}  Instrucciones: {metrics['instructions']}  IPC total: {metrics['ipc']:.2f}")
+    print(f"Bus: {metrics['bus_transactions']} transacciones (BusRd {metrics['bus_reads']}, "
+          f"BusRdX {metrics['bus_read_exclusive']}, BusUpgr {metrics['bus_upgrades']}), "
+          f"{metrics['invalidations']} invalidaciones, {metrics['flushes']} flushes")
+    print(f"{'núcleo':>6} {'ciclos':>8} {'instr':>8} {'stalls':>7} {'hits':>7} {'misses':>7} "
+          f"{'coher':>7} {'inval':>7} {'upgr':>7} {'wb':>7}")
+    for number, core in enumerate(metrics['cores']):
+        print(f"{number:>6} {core['cycles']:>8} {core['instructions']:>8} {core['stalls']:>7} "
+              f"{core['cache_hits']:>7} {core['cache_misses']:>7} {core['coherence_misses']:>7} "
+              f"{core['invalidations']:>7} {core['upgrades']:>7} {core['writebacks']:>7}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulación de varios núcleos con coherencia de caché")
+    parser.add_argument('--workload', choices=tuple(PARALLEL_WORKLOADS), default='falso_compartido')
+    parser.add_argument('--cores', type=int, nargs='+', default=[4],
+                        help="número de núcleos (con varios valores se mide la escalabilidad)")
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='mesi')
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplica el tamaño de la carga")
+    parser.add_argument('--quantum', type=int, default=1, help="ciclos seguidos de cada núcleo")
+    args = parser.parse_args(argv)
+
+    for cores in args.cores:
+        system = build_system(args.workload, cores, args.scale, args.protocol)
+        start = time.perf_counter()
+        metrics = system.run(args.quantum)
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        print(f"\n=== {args.workload}, {cores} núcleos, {args.protocol.upper()} ===")
+        print_metrics(metrics)
+        core_cycles = sum(core['cycles'] for core in metrics['cores'])
+        print(f"Host: {elapsed:.3f} s, {core_cycles / elapsed:.0f} ciclos de núcleo por segundo")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
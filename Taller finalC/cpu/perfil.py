@@ -0,0 +1,200 @@
+import os
+import sys
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.instrucciones import OP_JMP, OP_JZ
+from cpu.pipeline import HOLD, PipelinedCPU
+from cpu.registros import Z
+
+#Perfil por PC de PipelinedCPU: en que instrucciones se van los ciclos
+#Se activa con PipelinedCPU(program, profiler=Profiler()) o cpu.set_profiler(...); run() usa entonces
+#el bucle instrumentado (el mismo de la traza) y sin perfil el bucle de siempre no cambia
+#
+#Cada ciclo se le cobra a una sola instruccion: la que termina (WB) en ese ciclo o, si ninguna
+#termina, la mas antigua que esta en el pipeline; asi la suma de los ciclos por PC es el total
+#Los stalls se separan por causa:
+#  load_use: decode detenido por un LOAD que todavia esta en EX (se cobra a la instruccion detenida)
+#  data: decode detenido sin forwarding
+#  memory: esperas por latencia de cache (instruccion detenida o LOAD de una cache bloqueante)
+#  branch: instruccion descartada por un salto tomado en ID o por un salto mal predicho (al salto)
+#  interrupt: ciclo de la rutina de interrupcion (a la instruccion que se interrumpio)
+#cache_hits / cache_misses son las lecturas de datos de la instruccion, como las metricas de run()
+
+COLUMNS = ('cycles', 'instructions', 'load_use', 'data', 'memory', 'branch', 'interrupt',
+           'cache_hits', 'cache_misses')
+CYCLES, INSTRUCTIONS, LOAD_USE, DATA, MEMORY, BRANCH, INTERRUPT, CACHE_HITS, CACHE_MISSES = range(len(COLUMNS))
+CAUSES = COLUMNS[LOAD_USE:CACHE_HITS]
+
+#PC al que se cobran los ciclos con el pipeline vacio
+NO_PC = -1
+
+
+#Clase Profiler que acumula los contadores por PC (se suman entre corridas hasta reset())
+class Profiler:
+    def __init__(self, program=None):
+        self.program = program
+        self.counters = {}
+
+    def reset(self):
+        self.counters.clear()
+
+    def _row(self, pc):
+        row = self.counters.get(pc)
+        if row is None:
+            row = self.counters[pc] = [0] * len(COLUMNS)
+        return row
+
+    #Metodo before que guarda lo necesario del estado de la CPU antes de un ciclo
+    def before(self, cpu):
+        branch = None
+        instruction = cpu.IF_stage
+        # Sin predictor los saltos se resuelven en decode: hay que ver si este ciclo lo decodifica
+        if (cpu.predictor is None and instruction is not None and instruction.op >= OP_JMP
+                and cpu.stall is not True):
+            branch = instruction
+        return (cpu.stall_count, cpu.interrupt_count, cpu.mispredict_count, cpu.mem_wait,
+                cpu.cache.hits, cpu.cache.misses, branch)
+
+    #Metodo after que reparte el ciclo que acaba de simular la CPU
+    def after(self, cpu, state):
+        stalls, interrupts, mispredicts, mem_wait, hits, misses, branch = state
+        if cpu.interrupt_count != interrupts:
+            row = self._row(cpu.saved_PC)
+            row[CYCLES] += 1
+            row[INTERRUPT] += 1
+            return
+        if mem_wait:
+            # Cache bloqueante: todo el pipeline espera al LOAD que esta en MEM
+            row = self._row(cpu.MEM_stage[0].pc if cpu.MEM_stage is not None else NO_PC)
+            row[CYCLES] += 1
+            row[MEMORY] += 1
+            return
+
+        wb = cpu.WB_stage
+        if wb is not None:
+            self._row(wb[0].pc)[INSTRUCTIONS] += 1
+        if branch is not None:
+            row = self._row(branch.pc)
+            row[INSTRUCTIONS] += 1
+            if branch.op == OP_JMP:
+                taken = True
+            elif branch.op == OP_JZ:
+                taken = cpu._regs[Z] == 1
+            else:
+                taken = cpu._regs[Z] == 0
+            if taken:
+                row[BRANCH] += 1
+
+        for stage in (wb, cpu.MEM_stage, cpu.EX_stage, cpu.ID_stage):
+            if stage is not None:
+                owner = stage[0].pc
+                break
+        else:
+            if cpu.IF_stage is not None:
+                owner = cpu.IF_stage.pc
+            else:
+                owner = branch.pc if branch is not None else NO_PC
+        self._row(owner)[CYCLES] += 1
+
+        stalled = cpu.stall_count - stalls
+        if stalled:
+            row = self._row(cpu.IF_stage.pc if cpu.IF_stage is not None else owner)
+            if cpu.stall == HOLD:
+                row[MEMORY] += stalled
+            else:
+                row[LOAD_USE if cpu.forwarding else DATA] += stalled
+        if cpu.mispredict_count != mispredicts and cpu.EX_stage is not None:
+            self._row(cpu.EX_stage[0].pc)[BRANCH] += cpu.mispredict_count - mispredicts
+        if cpu.cache.hits != hits or cpu.cache.misses != misses:
+            row = self._row(cpu.MEM_stage[0].pc if cpu.MEM_stage is not None else owner)
+            row[CACHE_HITS] += cpu.cache.hits - hits
+            row[CACHE_MISSES] += cpu.cache.misses - misses
+
+    #Metodo rows que devuelve una fila por PC como diccionario, de la que mas ciclos costo a la que menos
+    def rows(self):
+        rows = []
+        for pc, counters in self.counters.items():
+            row = {'pc': pc}
+            row.update(zip(COLUMNS, counters))
+            rows.append(row)
+        rows.sort(key=lambda row: (-row['cycles'], row['pc']))
+        return rows
+
+    def totals(self):
+        totals = [0] * len(COLUMNS)
+        for counters in self.counters.values():
+            for index, value in enumerate(counters):
+                totals[index] += value
+        return dict(zip(COLUMNS, totals))
+
+    def _text(self, pc):
+        if self.program is None or not 0 <= pc < len(self.program):
+            return '(vacío)' if pc == NO_PC else ''
+        instruction = self.program[pc]
+        return f"{instruction['opcode']} {', '.join(str(o) for o in instruction['operands'])}".rstrip()
+
+    #Metodo report que arma el reporte de texto ordenado por ciclos
+    #top: cuantas filas mostrar (None = todas)
+    def report(self, top=None):
+        totals = self.totals()
+        total_cycles = max(totals['cycles'], 1)
+        lines = [f"{'pc':>6} {'instrucción':24} {'ciclos':>9} {'%':>6} {'instr':>8} {'CPI':>6} "
+                 f"{'ld-use':>7} {'datos':>7} {'mem':>7} {'salto':>7} {'interr':>7} {'hits':>7} {'misses':>7}"]
+        for row in self.rows()[:top]:
+            cpi = f"{row['cycles'] / row['instructions']:.2f}" if row['instructions'] else '-'
+            lines.append(f"{row['pc']:>6} {self._text(row['pc']):24.24} {row['cycles']:>9} "
+                         f"{row['cycles'] / total_cycles:>6.1%} {row['instructions']:>8} {cpi:>6} "
+                         + " ".join(f"{row[name]:>7}" for name in COLUMNS[LOAD_USE:]))
+        lines.append(f"{'total':>6} {'':24} {totals['cycles']:>9} {'':>6} {totals['instructions']:>8} {'':>6} "
+                     + " ".join(f"{totals[name]:>7}" for name in COLUMNS[LOAD_USE:]))
+        return "\n".join(lines) + "\n"
+
+    #Metodo write_callgrind que exporta el perfil en formato callgrind (KCachegrind, callgrind_annotate)
+    #Cada PC es una linea (pc + 1) del archivo source; con labels (nombre -> pc, como las del
+    #ensamblador) cada etiqueta es una funcion que va hasta la siguiente
+    def write_callgrind(self, path, labels=None, source='programa.asm'):
+        starts = sorted((pc, name) for name, pc in (labels or {}).items())
+        events = [name.capitalize() for name in COLUMNS]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("# callgrind format\nversion: 1\ncreator: taller-arquitectura\n")
+            f.write("positions: line\n")
+            f.write(f"events: {' '.join(events)}\n")
+            totals = self.totals()
+            f.write(f"summary: {' '.join(str(totals[name]) for name in COLUMNS)}\n\n")
+            f.write(f"fl={source}\n")
+            current = None
+            for pc in sorted(self.counters):
+                function = 'main'
+                for start, name in starts:
+                    if start > pc:
+                        break
+                    function = name
+                if function != current:
+                    f.write(f"fn={function}\n")
+                    current = function
+                f.write(f"{pc + 1} {' '.join(str(value) for value in self.counters[pc])}\n")
+
+
+def main(argv=None):
+    import argparse
+    from cpu import ensamblador
+
+    parser = argparse.ArgumentParser(description="Perfil por instrucción de un programa en el pipeline")
+    parser.add_argument('source', help="programa en texto (.asm) o imagen ensamblada")
+    parser.add_argument('--top', type=int, default=20, help="filas del reporte")
+    parser.add_argument('--callgrind', help="escribe también el perfil en formato callgrind")
+    parser.add_argument('--predictor', help="predictor de saltos (static, 1bit, 2bit, gshare, tournament)")
+    args = parser.parse_args(argv)
+
+    program, labels = ensamblador.load(args.source)
+    profiler = Profiler()
+    cpu = PipelinedCPU(program, predictor=args.predictor, profiler=profiler)
+    print(cpu.run())
+    print(profiler.report(args.top), end='')
+    if args.callgrind:
+        profiler.write_callgrind(args.callgrind, labels, os.path.basename(args.source))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,41 @@
 import sys
 import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from memoria import cache
+# Solo cuando se corre el archivo como script; importado como parte del paquete no toca sys.path
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from memoria import cache as memoria_cache
+from memoria.jerarquia import CacheHierarchy
+from memoria.principal import DataMemory
 from Device import moduloEntradaySalida
+from cpu import instrucciones, prediccion, registros
+from cpu.traza import (EVENTS, EV_CYCLE, EV_INTERRUPT, EV_ISR, EV_LOAD, EV_STORE,
+                       EV_SUMMARY, EV_WRITEBACK)
+from cpu.instrucciones import (NO_REG, OP_ADD, OP_AND, OP_CMP, OP_JMP, OP_JZ, OP_LOAD,
+                               OP_MOV, OP_MUL, OP_SHL, OP_STORE, OP_SUB)
+from cpu.registros import PC, WORD_MAX, WORD_MIN, Z, wrap
+
+# Ciclos perdidos por cada salto mal predicho: el salto se resuelve en EX y solo hay que
+# descartar la instrucción que se buscó en IF
+MISPREDICT_PENALTY = 1
+
+# Valor de stall mientras una instrucción espera en IF un dato que viene de memoria (caché no
+# bloqueante): a diferencia del stall normal no se vuelve a buscar la instrucción, se reintenta
+# decodificarla en cada ciclo
+HOLD = 2
 
 class PipelinedCPU:
-    def __init__(self, program):
-        self.registers = {
-            'R0': 0, 'R1': 0, 'R2': 0, 'R3': 0, 'R4': 0, 'R5': 0,
-            'PC': 0, 'Z': 0
-        }
-        self.data_memory = [0] * 256
-        self.program = program
+    def __init__(self, program, tracer=None, memory_size=256, cache=None, predictor=None, btb=None,
+                 profiler=None, registry=None):
+        self.registers = registros.RegisterFile()
+        self._regs = self.registers.cells
+        # Memoria de datos sobre un array; para imágenes grandes se puede reemplazar
+        # por DataMemory.from_file(ruta), que la mapea con mmap sin copiarla
+        self.data_memory = DataMemory(memory_size)
+        # El programa se compila una sola vez al cargarlo (opcodes y registros enteros)
+        self.program = instrucciones.compile_program(program)
+        # fetch solo busca instrucciones con PC < fetch_end; run(max_instructions=...) lo baja a 0
+        # para dejar de buscar y vaciar el pipeline al final de una región
+        self.fetch_end = len(self.program)
         self.IF_stage = None
         self.ID_stage = None
         self.EX_stage = None
@@ -19,303 +43,426 @@ class PipelinedCPU:
         self.WB_stage = None
         self.stall = False
         self.forwarding = True
-        self.cache = cache.Cache(num_lines=16, block_size=8)
+        # Se puede pasar una caché ya configurada (asociatividad, política de reemplazo...)
+        # o una CacheHierarchy con L1I/L1D, L2 y L3
+        if cache is None:
+            cache = memoria_cache.Cache(num_lines=16, block_size=8, tracer=tracer)
+        self.cache = cache
+        # Con jerarquía y L1I, fetch también accede a la caché de instrucciones
+        self._icache = cache.fetch if isinstance(cache, CacheHierarchy) and cache.l1i is not None else None
+        # Con prefetcher o buffer de escritura la caché usa el ciclo de esta CPU (para saber si un bloque
+        # prebuscado llegó tarde y cuándo termina de vaciarse el buffer)
+        if cache.prefetching or cache.write_buffer:
+            cache.set_clock(lambda: self.cycle_count)
+        # Con buffer de escritura un STORE que lo encuentra lleno detiene el pipeline
+        self._store_stalls = bool(cache.write_buffer)
+        # Controlador de interrupciones; device (el dispositivo de siempre) está en la línea 0
+        # y se pueden conectar más con interrupts.attach(...) o un DMAEngine
+        self.interrupts = moduloEntradaySalida.InterruptController()
         self.device = moduloEntradaySalida.Device()
+        self.interrupts.attach(self.device)
         self.handling_interrupt = False
         self.saved_PC = None
+        # Línea y dato de la interrupción que se está atendiendo
+        self.interrupt_line = None
+        self.interrupt_data = None
         self.stall_count = 0
         self.cycle_count = 0
         self.interrupt_count = 0
+        self.instruction_count = 0
+        self.branch_count = 0
+        self.mispredict_count = 0
+        # Latencia de memoria (caché con hit_latency / miss_latency, ver memoria/cache.py)
+        # mem_wait: ciclos que faltan con el pipeline detenido por un fallo en una caché bloqueante
+        # pending_regs: registro -> ciclo en que llega el dato de un LOAD pendiente (caché no bloqueante)
+        # hold_until: ciclo en que se libera la instrucción detenida en IF (stall == HOLD)
+        self.mem_wait = 0
+        self.pending_regs = {}
+        self.hold_until = 0
+        self.memory_stall_count = 0
+        # Ciclos que run() saltó de una vez porque el pipeline solo esperaba a la memoria
+        self.skipped_cycles = 0
+        # Siguiente PC predicho para la instrucción que está en IF (solo con predictor)
+        self.IF_predicted = None
+        self.IF_history = None
+        self.set_branch_predictor(predictor, btb)
+        self.set_tracer(tracer)
+        self.set_profiler(profiler)
+        self.set_registry(registry)
+
+    # Configura la predicción de saltos (cpu/prediccion.py)
+    # Sin predictor (None) los saltos se resuelven en ID leyendo Z, como siempre
+    # Con predictor (nombre como 'gshare' u objeto) fetch consulta el BTB y sigue por el camino
+    # predicho; los saltos llegan hasta EX, donde se resuelven y, si la predicción falló,
+    # se descarta la instrucción buscada por el camino equivocado
+    def set_branch_predictor(self, predictor, btb=None):
+        self.predictor = prediccion.make_predictor(predictor) if predictor is not None else None
+        if self.predictor is None:
+            self.btb = None
+        else:
+            self.btb = btb if btb is not None else prediccion.BranchTargetBuffer()
+        # Historia del predictor al buscar cada instrucción (gshare, tournament); None si no la usa
+        self._snapshot = getattr(self.predictor, 'snapshot', None)
+
+    # Configura la traza de la CPU (la caché tiene su propio set_tracer)
+    # Con tracer=None todos los ganchos quedan en None y run() usa el bucle sin traza
+    def set_tracer(self, tracer):
+        self.tracer = tracer
+        self._trace = tracer.on_event if tracer is not None else None
+        self._trace_cycle = tracer.on_cycle if tracer is not None else None
+
+    # Configura el perfil por PC (cpu/perfil.py); con profiler=None run() no paga nada extra
+    def set_profiler(self, profiler):
+        self.profiler = profiler
+        if profiler is not None and profiler.program is None:
+            profiler.program = self.program
+
+    # Configura el registro de métricas (cpu/metricas.py), que acumula los contadores entre corridas
+    def set_registry(self, registry):
+        self.registry = registry
 
     def get_operand_value(self, operand):
-        if isinstance(operand, str) and operand.startswith('R'):
+        if instrucciones.is_register(operand):
             return self.registers[operand]
         return operand
 
     def fetch(self):
         if self.stall:
             return  # no buscar nueva instrucción si hay stall
-        if self.registers['PC'] < len(self.program):
-            self.IF_stage = self.program[self.registers['PC']]
-            self.registers['PC'] += 1
+        regs = self._regs
+        pc = regs[PC]
+        if pc < self.fetch_end:
+            if self._icache is not None:
+                self._icache(pc)
+            self.IF_stage = self.program[pc]
+            if self.btb is None:
+                regs[PC] = pc + 1
+            else:
+                regs[PC] = self.IF_predicted = self._predict_next(pc)
+                if self._snapshot is not None:
+                    self.IF_history = self._snapshot()
         else:
             self.IF_stage = None
 
+    # Siguiente PC a buscar después de pc según el BTB y el predictor
+    def _predict_next(self, pc):
+        entry = self.btb.lookup(pc)
+        if entry is not None:
+            target, unconditional = entry
+            if unconditional or self.predictor.predict(pc, target):
+                return target
+        return pc + 1
+
     def decode(self):
         if self.stall:
-            self.stall_count += 1
+            if self.stall != HOLD:
+                self.stall_count += 1
+                self.stall = False
+                self.ID_stage = None
+                return
             self.stall = False
-            self.ID_stage = None
-            return
 
         instruction = self.IF_stage
-        if not instruction:
+        if instruction is None:
             self.ID_stage = None
             return
 
-        opcode = instruction['opcode']
-        operands = instruction['operands']
+        op = instruction.op
+        regs = self._regs
 
-        if opcode in ['JMP', 'JZ', 'JNZ', 'JE']:
-            take_branch = False
-            target = operands[0]
-            if opcode == 'JMP':
+        if op >= OP_JMP:
+            if self.predictor is not None:
+                # Con predicción el salto sigue hasta EX llevando el PC que se predijo y la
+                # historia con la que se predijo
+                self.ID_stage = (instruction, (self.IF_predicted, self.IF_history))
+                return
+            # Los saltos se resuelven (y terminan) en ID
+            self.instruction_count += 1
+            if op == OP_JMP:
                 take_branch = True
-            elif opcode == 'JZ' or opcode == 'JE':
-                take_branch = (self.registers['Z'] == 1)
-            elif opcode == 'JNZ':
-                take_branch = (self.registers['Z'] == 0)
+            elif op == OP_JZ:
+                take_branch = regs[Z] == 1
+            else:
+                take_branch = regs[Z] == 0
 
             if take_branch:
-                self.registers['PC'] = target
+                regs[PC] = instruction.target
                 self.IF_stage = None
                 self.ID_stage = None
                 self.EX_stage = None
-                return
             else:
                 self.ID_stage = None
-                return
+            return
 
-        decoded = {
-            'opcode': opcode,
-            'operands': operands,
-            'dest_reg': None,
-            'src_regs': [],
-            'resolved_operands': []
-        }
+        if self.pending_regs and self._wait_memory(instruction):
+            return
 
-        # Manejo de instrucciones según su tipo
-        if opcode in ['ADD', 'SUB', 'MUL', 'SHL', 'AND']:
-            decoded['dest_reg'] = operands[0]
-            decoded['resolved_operands'].append(operands[0])
-            for i in range(1, len(operands)):
-                op = operands[i]
-                if isinstance(op, str) and op.startswith('R'):
-                    decoded['src_regs'].append(op)
-                    val = None
-                    # Forwarding desde WB
-                    if self.WB_stage and self.WB_stage.get('dest_reg') == op:
-                        val = self.WB_stage.get('result')
-                    # Forwarding desde MEM
-                    elif self.MEM_stage and self.MEM_stage.get('dest_reg') == op:
-                        val = self.MEM_stage.get('result')
-                    # Forwarding desde EX (excepto para LOAD)
-                    elif self.EX_stage and self.EX_stage.get('dest_reg') == op and self.EX_stage['opcode'] != 'LOAD':
-                        val = self.EX_stage.get('result')
-                    # Si no hay forwarding, usar valor del registro
-                    if val is None:
-                        val = self.registers[op]
-                    decoded['resolved_operands'].append(val)
-                else:
-                    decoded['resolved_operands'].append(op)
-        elif opcode == 'LOAD':
-            decoded['dest_reg'] = operands[0]
-            decoded['resolved_operands'].append(operands[0])
-            if len(operands) > 1:
-                op = operands[1]
-                if isinstance(op, str) and op.startswith('R'):
-                    decoded['src_regs'].append(op)
-                    val = None
-                    if self.WB_stage and self.WB_stage.get('dest_reg') == op:
-                        val = self.WB_stage.get('result')
-                    elif self.MEM_stage and self.MEM_stage.get('dest_reg') == op:
-                        val = self.MEM_stage.get('result')
-                    elif self.EX_stage and self.EX_stage.get('dest_reg') == op and self.EX_stage['opcode'] != 'LOAD':
-                        val = self.EX_stage.get('result')
-                    if val is None:
-                        val = self.registers[op]
-                    decoded['resolved_operands'].append(val)
-                else:
-                    decoded['resolved_operands'].append(op)
-        elif opcode == 'MOV':
-            decoded['dest_reg'] = operands[0]
-            decoded['resolved_operands'].append(operands[0])
-            if len(operands) > 1:
-                op = operands[1]
-                if isinstance(op, str) and op.startswith('R'):
-                    decoded['src_regs'].append(op)
-                    val = None
-                    if self.WB_stage and self.WB_stage.get('dest_reg') == op:
-                        val = self.WB_stage.get('result')
-                    elif self.MEM_stage and self.MEM_stage.get('dest_reg') == op:
-                        val = self.MEM_stage.get('result')
-                    elif self.EX_stage and self.EX_stage.get('dest_reg') == op and self.EX_stage['opcode'] != 'LOAD':
-                        val = self.EX_stage.get('result')
-                    if val is None:
-                        val = self.registers[op]
-                    decoded['resolved_operands'].append(val)
-                else:
-                    decoded['resolved_operands'].append(op)
-
-        elif opcode == 'STORE':
-            for i in range(len(operands)):
-                op = operands[i]
-                if isinstance(op, str) and op.startswith('R'):
-                    decoded['src_regs'].append(op)
-                    val = None
-                    if self.WB_stage and self.WB_stage.get('dest_reg') == op:
-                        val = self.WB_stage.get('result')
-                    elif self.MEM_stage and self.MEM_stage.get('dest_reg') == op:
-                        val = self.MEM_stage.get('result')
-                    elif self.EX_stage and self.EX_stage.get('dest_reg') == op and self.EX_stage['opcode'] != 'LOAD':
-                        val = self.EX_stage.get('result')
-                    if val is None:
-                        val = self.registers[op]
-                    decoded['resolved_operands'].append(val)
-                else:
-                    decoded['resolved_operands'].append(op)
+        slots = instruction.slots
+        if not slots:
+            self.ID_stage = (instruction, instruction.args)
+            return
 
-        # Verificar load-use hazard
-        hazard = False
-        for src_reg in decoded['src_regs']:
-            if self.EX_stage and self.EX_stage.get('dest_reg') == src_reg and self.EX_stage['opcode'] == 'LOAD':
-                hazard = True
-                break
+        if not self.forwarding:
+            self._decode_without_forwarding(instruction)
+            return
 
-            if self.MEM_stage and self.MEM_stage.get('dest_reg') == src_reg and self.MEM_stage['opcode'] == 'LOAD':
-                # Forwarding desde MEM para LOAD
-                decoded['resolved_operands'] = [decoded['resolved_operands'][0]] + [self.MEM_stage.get('result') if reg == src_reg else val for reg, val in zip(decoded['src_regs'], decoded['resolved_operands'][1:])]
+        # Destinos de las etapas siguientes, se calculan una vez por ciclo
+        ex, mem, wb = self.EX_stage, self.MEM_stage, self.WB_stage
+        ex_dest = ex_load = mem_dest = mem_load = wb_dest = NO_REG
+        if ex is not None:
+            if ex[0].op == OP_LOAD:
+                ex_load = ex[0].dest
+            else:
+                ex_dest = ex[0].dest
+        if mem is not None:
+            mem_dest = mem[0].dest
+            if mem[0].op == OP_LOAD:
+                mem_load = mem_dest
+        if wb is not None:
+            wb_dest = wb[0].dest
+
+        # Verificar load-use hazard: un LOAD en EX todavía no tiene su dato
+        if ex_load != NO_REG and ex_load in instruction.srcs:
+            self.stall = True
+            self.stall_count += 1
+            regs[PC] -= 1
+            self.ID_stage = None
+            return
 
-        if hazard:
+        # Forwarding: el LOAD en MEM tiene prioridad, luego WB, MEM y EX (excepto LOAD)
+        values = list(instruction.args)
+        for position, reg in slots:
+            if reg == mem_load:
+                values[position] = mem[1]
+            elif reg == wb_dest:
+                values[position] = wb[1]
+            elif reg == mem_dest:
+                values[position] = mem[1]
+            elif reg == ex_dest:
+                values[position] = ex[1]
+            else:
+                values[position] = regs[reg]
+
+        self.ID_stage = (instruction, values)
+
+    # Detiene la instrucción en IF si lee o escribe un registro cuyo LOAD todavía no recibió el dato
+    # (la escritura se detiene también para que el dato viejo no pise al nuevo)
+    def _wait_memory(self, instruction):
+        pending = self.pending_regs
+        now = self.cycle_count
+        until = 0
+        for reg in (*instruction.srcs, instruction.dest):
+            ready = pending.get(reg)
+            if ready is None:
+                continue
+            if ready <= now:
+                del pending[reg]
+            elif ready > until:
+                until = ready
+        if not until:
+            return False
+        self.stall = HOLD
+        self.hold_until = until
+        self.stall_count += 1
+        self.memory_stall_count += 1
+        self.ID_stage = None
+        return True
+
+    # Decode con forwarding desactivado: los operandos solo se leen del banco de registros,
+    # así que se detiene mientras una instrucción en EX o MEM vaya a escribir un registro fuente
+    # (la de WB ya escribió en este mismo ciclo)
+    def _decode_without_forwarding(self, instruction):
+        regs = self._regs
+        pending = set()
+        if self.EX_stage is not None:
+            pending.add(self.EX_stage[0].dest)
+        if self.MEM_stage is not None:
+            pending.add(self.MEM_stage[0].dest)
+        if not pending.isdisjoint(instruction.srcs):
             self.stall = True
             self.stall_count += 1
-            self.registers['PC'] -= 1
+            regs[PC] -= 1
             self.ID_stage = None
             return
 
-        self.ID_stage = decoded
+        values = list(instruction.args)
+        for position, reg in instruction.slots:
+            values[position] = regs[reg]
+        self.ID_stage = (instruction, values)
 
     def execute(self):
-        if not self.ID_stage:
+        if self.ID_stage is None:
             self.EX_stage = None
             return
 
-        instruction = self.ID_stage
-        op = instruction['opcode']
+        instruction, values = self.ID_stage
+        op = instruction.op
         result = None
 
-        if op in ['ADD', 'SUB', 'MUL']:
-            op1 = instruction['resolved_operands'][1]
-            op2 = instruction['resolved_operands'][2]
-            if isinstance(op1, str) and op1.startswith('R'):
-                op1 = self.registers[op1]
-            if isinstance(op2, str) and op2.startswith('R'):
-                op2 = self.registers[op2]
-            if op == 'ADD':
-                result = op1 + op2
-            elif op == 'SUB':
-                result = op1 - op2
-            elif op == 'MUL':
-                result = op1 * op2
-            self.registers['Z'] = 1 if result == 0 else 0
-        elif op == 'LOAD':
-            address = instruction['resolved_operands'][1]
-            if isinstance(address, str) and address.startswith('R'):
-                address = self.registers[address]
-            result = address
-        elif op == 'STORE':
-            value = instruction['resolved_operands'][0]
-            address = instruction['resolved_operands'][1]
-            if isinstance(address, str) and address.startswith('R'):
-                address = self.registers[address]
-            result = address
-        elif op == 'MOV':
-            if len(instruction['resolved_operands']) > 1:
-                val = instruction['resolved_operands'][1]
-                if isinstance(val, str) and val.startswith('R'):
-                    val = self.registers[val]
-                result = val
+        if op == OP_ADD:
+            result = values[0] + values[1]
+            if not WORD_MIN <= result <= WORD_MAX:
+                result = wrap(result)
+            self._regs[Z] = 1 if result == 0 else 0
+        elif op == OP_SUB:
+            result = values[0] - values[1]
+            if not WORD_MIN <= result <= WORD_MAX:
+                result = wrap(result)
+            self._regs[Z] = 1 if result == 0 else 0
+        elif op == OP_MUL:
+            result = values[0] * values[1]
+            if not WORD_MIN <= result <= WORD_MAX:
+                result = wrap(result)
+            self._regs[Z] = 1 if result == 0 else 0
+        elif op == OP_LOAD:
+            result = values[0]
+        elif op == OP_STORE:
+            result = values[1]
+        elif op == OP_MOV:
+            result = values[0] if values else 0
+        elif op == OP_SHL:
+            result = values[0] << values[1]
+            if not WORD_MIN <= result <= WORD_MAX:
+                result = wrap(result)
+        elif op == OP_AND:
+            result = values[0] & values[1]
+        elif op == OP_CMP:
+            self._regs[Z] = 1 if values[0] == values[1] else 0
+        elif op >= OP_JMP:
+            self._resolve_branch(instruction, values)
+
+        self.EX_stage = (instruction, result)
+
+    # Resuelve en EX un salto buscado especulativamente: actualiza el predictor y el BTB y,
+    # si el PC predicho no era el correcto, descarta la instrucción de IF y redirige fetch
+    # prediction: (PC predicho, historia del predictor en fetch o None)
+    def _resolve_branch(self, instruction, prediction):
+        regs = self._regs
+        op = instruction.op
+        pc = instruction.pc
+        predicted, history = prediction
+        if op == OP_JMP:
+            taken = True
+        else:
+            taken = regs[Z] == 1 if op == OP_JZ else regs[Z] == 0
+            if history is None:
+                self.predictor.update(pc, taken)
             else:
-                result = 0
-        elif op == 'SHL':
-            val = instruction['resolved_operands'][1]
-            shift = instruction['resolved_operands'][2]
-            if isinstance(val, str) and val.startswith('R'):
-                val = self.registers[val]
-            if isinstance(shift, str) and shift.startswith('R'):
-                shift = self.registers[shift]
-            result = val << shift
-        elif op == 'AND':
-            val1 = instruction['resolved_operands'][1]
-            val2 = instruction['resolved_operands'][2]
-            if isinstance(val1, str) and val1.startswith('R'):
-                val1 = self.registers[val1]
-            if isinstance(val2, str) and val2.startswith('R'):
-                val2 = self.registers[val2]
-            result = val1 & val2
-        elif op == 'CMP':
-            val1 = instruction['resolved_operands'][0]
-            val2 = instruction['resolved_operands'][1]
-            if isinstance(val1, str) and val1.startswith('R'):
-                val1 = self.registers[val1]
-            if isinstance(val2, str) and val2.startswith('R'):
-                val2 = self.registers[val2]
-            self.registers['Z'] = 1 if val1 == val2 else 0
-            result = None
-
-        self.EX_stage = {
-            'opcode': op,
-            'dest_reg': instruction['dest_reg'],
-            'result': result,
-            'operands': instruction['operands']
-        }
+                self.predictor.update(pc, taken, history)
+        if taken:
+            actual = instruction.target
+            self.btb.update(pc, actual, op == OP_JMP)
+        else:
+            actual = pc + 1
+        self.branch_count += 1
+        if actual != predicted:
+            self.mispredict_count += 1
+            self.IF_stage = None
+            regs[PC] = actual
 
     def memory_access(self):
-        if not self.EX_stage:
+        if self.EX_stage is None:
             self.MEM_stage = None
             return
 
-        instruction = self.EX_stage
-        result = instruction['result']
+        instruction, result = self.EX_stage
+        op = instruction.op
 
-        if instruction['opcode'] == 'LOAD':
+        if op == OP_LOAD:
             address = result
-            result = self.cache.read(address, self.data_memory)
-            print(f"MemoryAccess: Cargando valor {result} desde memoria en dirección {address}")
-        elif instruction['opcode'] == 'STORE':
+            result = self.cache.read(address, self.data_memory, instruction.pc)
+            if self._trace is not None:
+                self._trace(EV_LOAD, address, result)
+            latency = self.cache.latency
+            if latency:
+                self._load_latency(instruction, address, latency)
+        elif op == OP_STORE:
             address = result
-            value = self.registers[instruction['operands'][0]]
-            print(f"MemoryAccess: Almacenando valor {value} en memoria en dirección {address}")
+            # El valor se lee del banco de registros en MEM, cuando WB ya escribió lo anterior
+            value = instruction.args[0]
+            if value is None:
+                value = self._regs[instruction.srcs[0]]
+            if self._trace is not None:
+                self._trace(EV_STORE, address, value)
             self.cache.write(address, value, self.data_memory)
-
-        self.MEM_stage = {
-            'opcode': instruction['opcode'],
-            'dest_reg': instruction['dest_reg'],
-            'result': result
-        }
+            if self._store_stalls and self.cache.write_stall:
+                self.mem_wait = self.cache.write_stall
+
+        self.MEM_stage = (instruction, result)
+
+    # Aplica la latencia de un LOAD: el dato ya se leyó (modelo funcional), solo se decide cuándo
+    # se puede usar. Con caché bloqueante se detiene todo el pipeline latency ciclos; con MSHRs
+    # el LOAD sigue y solo esperan en decode las instrucciones que usan su registro
+    def _load_latency(self, instruction, address, latency):
+        cache = self.cache
+        if cache.mshr is None:
+            self.mem_wait = latency
+            return
+        now = self.cycle_count
+        ready = cache.mshr.request(address, now, latency, latency > cache.hit_latency)
+        if ready > now:
+            self.pending_regs[instruction.dest] = ready
 
     def write_back(self):
-        if not self.MEM_stage:
+        if self.MEM_stage is None:
             self.WB_stage = None
             return
 
-        instruction = self.MEM_stage
-        if instruction['dest_reg'] and instruction['opcode'] != 'STORE':
-            valor = instruction['result']
-            reg = instruction['dest_reg']
-            print(f"WriteBack: Escribiendo {valor} en registro {reg}")
-            self.registers[reg] = valor
+        instruction, valor = self.MEM_stage
+        self.instruction_count += 1
+        reg = instruction.dest
+        if reg != NO_REG:
+            if self._trace is not None:
+                self._trace(EV_WRITEBACK, reg, valor)
+            self._regs[reg] = valor
 
-        self.WB_stage = instruction
+        self.WB_stage = self.MEM_stage
 
+    # Atiende la interrupción pendiente de mayor prioridad (si no hay una en curso)
     def check_interrupt(self):
-        if self.device.data_ready and not self.handling_interrupt:
-            print("Interrupción detectada!")
-            self.saved_PC = self.registers['PC']
-            self.registers['PC'] = 100
-            self.handling_interrupt = True
-            self.device.clear()
-            self.interrupt_count += 1
-
+        if self.handling_interrupt:
+            return
+        line = self.interrupts.acknowledge()
+        if line is None:
+            return
+        device = self.interrupts.devices[line]
+        self.saved_PC = self._regs[PC]
+        if self._trace is not None:
+            self._trace(EV_INTERRUPT, self.saved_PC)
+        self._regs[PC] = 100
+        self.handling_interrupt = True
+        self.interrupt_line = line
+        self.interrupt_data = device.data
+        device.clear()
+        self.interrupt_count += 1
+
+    # Rutina de servicio: la del dispositivo (handler(cpu, line, data) al conectarlo) o, si no
+    # tiene, la de siempre (R0 = 999); después se vuelve al PC guardado
     def interrupt_service_routine(self):
         if self.handling_interrupt:
-            print("Ejecutando rutina de interrupción...")
-            self.registers['R0'] = 999
-            self.registers['PC'] = self.saved_PC
+            if self._trace is not None:
+                self._trace(EV_ISR, self.saved_PC)
+            handler = self.interrupts.handlers[self.interrupt_line]
+            if handler is None:
+                self.registers['R0'] = 999
+            else:
+                handler(self, self.interrupt_line, self.interrupt_data)
+            self._regs[PC] = self.saved_PC
             self.handling_interrupt = False
 
     def step(self):
-        self.check_interrupt()
+        interrupts = self.interrupts
+        # Eventos de los dispositivos programados hasta este ciclo (heap ordenado por ciclo)
+        if interrupts.next_event <= self.cycle_count:
+            interrupts.advance(self.cycle_count)
+        if self.mem_wait:
+            # Caché bloqueante esperando un fallo: ninguna etapa avanza
+            self.mem_wait -= 1
+            self.memory_stall_count += 1
+            self.cycle_count += 1
+            return
+        if interrupts.active:
+            self.check_interrupt()
         if self.handling_interrupt:
             self.interrupt_service_routine()
         else:
@@ -326,38 +473,234 @@ class PipelinedCPU:
             self.fetch()
         self.cycle_count += 1
 
-    def run(self, max_cycles=100):
-        self.cycle_count = 0
-        self.stall_count = 0
-        self.interrupt_count = 0
-        self.cache.hits = 0
-        self.cache.misses = 0
-        self.fetch()
-        while any([self.IF_stage, self.ID_stage, self.EX_stage, self.MEM_stage, self.WB_stage]) or self.device.data_ready:
-            print(f"\nCiclo {self.cycle_count}:")
-            self.step()
-            self.print_pipeline_state()
+    # max_instructions: si se indica, deja de buscar instrucciones cuando ya terminaron esa cantidad
+    # y vacía el pipeline; las que estaban en vuelo también terminan, así el estado final es preciso
+    # (PC apunta a la siguiente instrucción a ejecutar) y se puede pasar a otro modelo (cpu/muestreo.py)
+    # stop_cycle: pausa la simulación al llegar a ese ciclo, con el pipeline tal como está
+    # resume: continúa una simulación pausada (o restaurada de un checkpoint, cpu/checkpoint.py)
+    # sin poner los contadores en cero ni volver a hacer el primer fetch
+    def run(self, max_cycles=100, max_instructions=None, stop_cycle=None, resume=False):
+        registry = self.registry
+        if not resume:
+            if registry is not None:
+                registry.start_run(self)
+            self.fetch_end = len(self.program)
+            # Los eventos que quedaron programados conservan su distancia al ciclo actual
+            self.interrupts.rebase(self.cycle_count)
+            self.cycle_count = 0
+            self.stall_count = 0
+            self.interrupt_count = 0
+            self.instruction_count = 0
+            self.branch_count = 0
+            self.mispredict_count = 0
+            self.memory_stall_count = 0
+            self.skipped_cycles = 0
+            self._reset_memory_timing()
+            if self.btb is not None:
+                self.btb.reset_stats()
+            self.cache.reset_stats()
+            self.fetch()
+        tracers = self._cycle_tracers()
+        if registry is not None and registry.observers:
+            # Con observadores se corre en tramos hasta cada muestra
+            while self.pipeline_busy() and (stop_cycle is None or self.cycle_count < stop_cycle):
+                due = registry.next_sample
+                self._run_loop(tracers, max_instructions, due if stop_cycle is None else min(due, stop_cycle))
+                if self.cycle_count >= due:
+                    registry.sample(self)
+        else:
+            self._run_loop(tracers, max_instructions, stop_cycle)
+        # Cuando el programa termina se vacía el buffer de escritura, así la memoria tiene todos los
+        # STORE y las métricas cuentan sus escrituras; una corrida pausada (stop_cycle) lo conserva
+        if not self.pipeline_busy():
+            self.cache.drain_writes(self.data_memory)
+
+        metrics = self.current_metrics()
+        if registry is not None:
+            registry.collect(self, metrics)
+        if self.tracer is not None:
+            if self.tracer.on_summary is not None:
+                # Sin bucle instrumentado (traza de solo resumen) el ciclo del tracer no avanzó
+                self.tracer.cycle = self.cycle_count
+                self.tracer.on_summary(EV_SUMMARY, *(metrics[name] for name in EVENTS[EV_SUMMARY][1]))
+            self.tracer.flush()
+        return metrics
 
+    # Trazas que necesitan el bucle instrumentado: las que registran eventos (se sellan con el ciclo)
+    # o el estado de cada ciclo. Una traza de solo resumen no, el resumen lo emite run() al final
+    def _cycle_tracers(self):
+        return [t for t in (self.tracer, self.cache.tracer)
+                if t is not None and (t.on_event is not None or t.on_cycle is not None)]
+
+    # Elige el bucle de run(): con traza por evento o por ciclo, perfil o métricas detalladas el
+    # instrumentado, con latencias de memoria el dirigido por eventos y si no el de siempre
+    def _run_loop(self, tracers, max_instructions=None, stop_cycle=None):
+        probes = [self.profiler] if self.profiler is not None else []
+        if self.registry is not None and self.registry.detailed:
+            probes.append(self.registry)
+        if tracers or probes:
+            self._run_traced(tracers, probes, max_instructions, stop_cycle)
+        elif self.cache.timed:
+            self._run_events(max_instructions, stop_cycle)
+        elif max_instructions is None and stop_cycle is None:
+            while self.pipeline_busy():
+                self.step()
+        else:
+            while self.pipeline_busy():
+                if stop_cycle is not None and self.cycle_count >= stop_cycle:
+                    break
+                self.step()
+                if max_instructions is not None and self.instruction_count >= max_instructions:
+                    self.fetch_end = 0
+
+    # Métricas de la corrida actual (las que devuelve run()); se pueden pedir en cualquier ciclo
+    def current_metrics(self):
         metrics = {
             'cycles': self.cycle_count,
             'stalls': self.stall_count,
             'cache_hits': self.cache.hits,
             'cache_misses': self.cache.misses,
-            'interrupts': self.interrupt_count
+            'interrupts': self.interrupt_count,
+            'instructions': self.instruction_count
         }
-        print(f"Total ciclos: {metrics['cycles']}")
-        print(f"Total stalls: {metrics['stalls']}")
-        print(f"Cache Hits: {metrics['cache_hits']}, Cache Misses: {metrics['cache_misses']}")
-        print(f"Interrupciones: {metrics['interrupts']}")
+        # Con latencias de memoria se agregan los ciclos perdidos esperando datos
+        if self.cache.timed:
+            metrics['memory_stalls'] = self.memory_stall_count
+            metrics['skipped_cycles'] = self.skipped_cycles
+        # Con predictor de saltos se agregan la precisión y el costo de los fallos de predicción
+        if self.predictor is not None:
+            metrics.update(self.branch_metrics())
+        # Con jerarquía se agregan los contadores de cada nivel (l1d_writebacks, l2_misses, ...)
+        if isinstance(self.cache, CacheHierarchy):
+            metrics.update(self.cache.level_metrics())
+        # Con prefetcher se agregan sus pedidos, utilidad, precisión y retraso
+        if self.cache.prefetching:
+            metrics.update(self.cache.prefetch_metrics())
+        # Con buffer de escritura o victim cache se agregan el tráfico de escrituras y los conflictos evitados
+        if self.cache.buffering:
+            metrics.update(self.cache.buffer_metrics())
         return metrics
 
+    # Bucle de run() con traza o sondas (perfil, métricas detalladas): sella cada evento con el ciclo,
+    # emite el estado del pipeline y le pasa a cada sonda el estado de antes y después de cada ciclo
+    def _run_traced(self, tracers, probes=(), max_instructions=None, stop_cycle=None):
+        trace_cycle = self._trace_cycle
+        while self.pipeline_busy():
+            if stop_cycle is not None and self.cycle_count >= stop_cycle:
+                break
+            for tracer in tracers:
+                tracer.cycle = self.cycle_count
+            if not probes:
+                self.step()
+            else:
+                states = [probe.before(self) for probe in probes]
+                self.step()
+                for probe, state in zip(probes, states):
+                    probe.after(self, state)
+            if trace_cycle is not None:
+                trace_cycle(EV_CYCLE, *self.pipeline_state())
+            if max_instructions is not None and self.instruction_count >= max_instructions:
+                self.fetch_end = 0
+
+    # Bucle de run() dirigido por eventos, para cachés con latencia: cuando el pipeline solo espera
+    # a la memoria (caché bloqueante con un fallo, o una instrucción detenida en IF con las demás
+    # etapas vacías) salta el contador de ciclos hasta que llega el dato en lugar de llamar a step()
+    # con ciclos vacíos. Los contadores quedan igual que si se hubieran simulado esos ciclos
+    def _run_events(self, max_instructions=None, stop_cycle=None):
+        while self.pipeline_busy():
+            now = self.cycle_count
+            if stop_cycle is not None and now >= stop_cycle:
+                break
+            if self.mem_wait:
+                skip = self.mem_wait
+            elif (self.stall == HOLD and self.ID_stage is None and self.EX_stage is None and
+                  self.MEM_stage is None and self.WB_stage is None and not self.interrupts.active):
+                skip = self.hold_until - now
+            else:
+                skip = 0
+            # No se salta más allá del próximo evento de un dispositivo ni de stop_cycle
+            skip = min(skip, self.interrupts.next_event - now)
+            if stop_cycle is not None:
+                skip = min(skip, stop_cycle - now)
+            if skip > 0:
+                if self.mem_wait:
+                    self.mem_wait -= skip
+                else:
+                    # Cada ciclo con la instrucción detenida en IF cuenta como stall
+                    self.stall_count += skip
+                self.cycle_count += skip
+                self.memory_stall_count += skip
+                self.skipped_cycles += skip
+                continue
+            self.step()
+            if max_instructions is not None and self.instruction_count >= max_instructions:
+                self.fetch_end = 0
+
+    # Vacía el estado de tiempo de la memoria (LOADs pendientes, MSHRs, bloques prebuscados en camino y
+    # buffer de escritura)
+    def _reset_memory_timing(self):
+        self.mem_wait = 0
+        self.pending_regs.clear()
+        if self.stall == HOLD:
+            self.stall = False
+        if self.cache.mshr is not None:
+            self.cache.mshr.clear()
+        self.cache.settle()
+
+    # Métricas de predicción de saltos de la última corrida
+    def branch_metrics(self):
+        branches = self.branch_count
+        return {
+            'branches': branches,
+            'mispredictions': self.mispredict_count,
+            'prediction_accuracy': 1 - self.mispredict_count / branches if branches else 1.0,
+            'mispredict_penalty': self.mispredict_count * MISPREDICT_PENALTY,
+            'btb_hits': self.btb.hits,
+            'btb_misses': self.btb.misses,
+        }
+
+    # Carga el estado arquitectónico (registros incluidos PC y Z) y deja el pipeline vacío
+    # registers: RegisterFile, diccionario nombre -> valor o secuencia en el orden de REGISTER_NAMES
+    def load_state(self, registers):
+        if isinstance(registers, dict):
+            for name, value in registers.items():
+                self.registers[name] = value
+        else:
+            if isinstance(registers, registros.RegisterFile):
+                registers = registers.cells
+            for index, value in enumerate(registers):
+                self._regs[index] = value
+        self.IF_stage = None
+        self.ID_stage = None
+        self.EX_stage = None
+        self.MEM_stage = None
+        self.WB_stage = None
+        self.stall = False
+        self._reset_memory_timing()
+
+    def pipeline_busy(self):
+        return (self.IF_stage is not None or self.ID_stage is not None or self.EX_stage is not None or
+                self.MEM_stage is not None or self.WB_stage is not None or self.interrupts.active)
+
+    # Estado del pipeline como enteros: PC de la instrucción en cada etapa (-1 si está vacía)
+    # seguido de los valores de los registros
+    def pipeline_state(self):
+        return (
+            self.IF_stage.pc if self.IF_stage else -1,
+            self.ID_stage[0].pc if self.ID_stage else -1,
+            self.EX_stage[0].pc if self.EX_stage else -1,
+            self.MEM_stage[0].pc if self.MEM_stage else -1,
+            self.WB_stage[0].pc if self.WB_stage else -1,
+            *self._regs
+        )
+
     def print_pipeline_state(self):
         stages = {
-            'IF': self.IF_stage['opcode'] if self.IF_stage else 'NOP',
-            'ID': self.ID_stage['opcode'] if self.ID_stage and isinstance(self.ID_stage, dict) else 'NOP',
-            'EX': self.EX_stage['opcode'] if self.EX_stage else 'NOP',
-            'MEM': self.MEM_stage['opcode'] if self.MEM_stage else 'NOP',
-            'WB': self.WB_stage['opcode'] if self.WB_stage else 'NOP'
+            'IF': self.IF_stage.opcode if self.IF_stage else 'NOP',
+            'ID': self.ID_stage[0].opcode if self.ID_stage else 'NOP',
+            'EX': self.EX_stage[0].opcode if self.EX_stage else 'NOP',
+            'MEM': self.MEM_stage[0].opcode if self.MEM_stage else 'NOP',
+            'WB': self.WB_stage[0].opcode if self.WB_stage else 'NOP'
         }
         print("Pipeline:", " | ".join(f"{stage}: {val}" for stage, val in stages.items()))
         print("Registros:", self.registers)
@@ -0,0 +1,211 @@
+#Predictores de saltos para PipelinedCPU
+#Todos tienen la misma interfaz:
+#predict(pc, target): True si predice que el salto de pc (con destino target) se toma
+#update(pc, taken): actualiza el predictor con el resultado real, cuando el salto se resuelve en EX
+#get_state() / set_state(state): estado interno como listas de enteros, para los checkpoints
+#La historia global (gshare, tournament) se actualiza al resolver el salto, no al predecirlo.
+#Como entre la prediccion y la resolucion pueden resolverse otros saltos, estos predictores tienen
+#ademas snapshot(): la historia al predecir, que la CPU lleva con el salto y devuelve en
+#update(pc, taken, history) para entrenar la misma entrada que se consulto
+
+
+#Clase StaticPredictor: siempre la misma prediccion
+#mode: 'not_taken', 'taken' o 'btfn' (hacia atras tomado, hacia adelante no tomado, como los bucles)
+class StaticPredictor:
+    MODES = ('not_taken', 'taken', 'btfn')
+
+    def __init__(self, mode='btfn'):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de predicción estática desconocido: {mode}")
+        self.mode = mode
+
+    def predict(self, pc, target):
+        if self.mode == 'btfn':
+            return target <= pc
+        return self.mode == 'taken'
+
+    def update(self, pc, taken):
+        pass
+
+    def get_state(self):
+        return [self.mode]
+
+    def set_state(self, state):
+        self.mode = state[0]
+
+
+#Clase OneBitPredictor: un bit por entrada con el ultimo resultado del salto
+class OneBitPredictor:
+    def __init__(self, entries=1024):
+        self.mask = entries - 1
+        if entries & self.mask:
+            raise ValueError(f"El número de entradas debe ser potencia de 2, no {entries}")
+        self.table = [0] * entries
+
+    def predict(self, pc, target):
+        return self.table[pc & self.mask] == 1
+
+    def update(self, pc, taken):
+        self.table[pc & self.mask] = 1 if taken else 0
+
+    def get_state(self):
+        return list(self.table)
+
+    def set_state(self, state):
+        self.table = list(state)
+
+
+#Clase TwoBitPredictor: contadores saturados de 2 bits (0-1 no tomado, 2-3 tomado)
+#Empiezan en 1 (debilmente no tomado)
+class TwoBitPredictor(OneBitPredictor):
+    def __init__(self, entries=1024):
+        super().__init__(entries)
+        self.table = [1] * entries
+
+    def predict(self, pc, target):
+        return self.table[pc & self.mask] >= 2
+
+    def update(self, pc, taken):
+        index = pc & self.mask
+        counter = self.table[index]
+        if taken:
+            if counter < 3:
+                self.table[index] = counter + 1
+        elif counter > 0:
+            self.table[index] = counter - 1
+
+
+#Clase GsharePredictor: contadores de 2 bits indexados por pc XOR historia global
+#history_bits: cantidad de saltos recientes (tomado / no tomado) que se recuerdan
+class GsharePredictor(TwoBitPredictor):
+    def __init__(self, entries=1024, history_bits=10):
+        super().__init__(entries)
+        self.history_mask = (1 << history_bits) - 1
+        self.history = 0
+
+    def predict(self, pc, target, history=None):
+        if history is None:
+            history = self.history
+        return self.table[(pc ^ history) & self.mask] >= 2
+
+    def snapshot(self):
+        return self.history
+
+    #history: la historia con la que se predijo el salto; sin ella se usa la actual
+    def update(self, pc, taken, history=None):
+        super().update(pc ^ (self.history if history is None else history), taken)
+        self.history = ((self.history << 1) | int(taken)) & self.history_mask
+
+    def get_state(self):
+        return [self.history, list(self.table)]
+
+    def set_state(self, state):
+        self.history, table = state
+        self.table = list(table)
+
+
+#Clase TournamentPredictor: un predictor local (2 bits por pc) y uno global (gshare)
+#con un selector de 2 bits por pc que aprende cual de los dos acierta mas (0-1 local, 2-3 global)
+class TournamentPredictor:
+    def __init__(self, entries=1024, history_bits=10):
+        self.local = TwoBitPredictor(entries)
+        self.global_ = GsharePredictor(entries, history_bits)
+        self.chooser = TwoBitPredictor(entries)
+
+    def predict(self, pc, target):
+        if self.chooser.predict(pc, target):
+            return self.global_.predict(pc, target)
+        return self.local.predict(pc, target)
+
+    def snapshot(self):
+        return self.global_.history
+
+    def update(self, pc, taken, history=None):
+        local_ok = self.local.predict(pc, 0) == taken
+        global_ok = self.global_.predict(pc, 0, history) == taken
+        # El selector solo se mueve cuando uno acierta y el otro no
+        if local_ok != global_ok:
+            self.chooser.update(pc, global_ok)
+        self.local.update(pc, taken)
+        self.global_.update(pc, taken, history)
+
+    def get_state(self):
+        return [self.local.get_state(), self.global_.get_state(), self.chooser.get_state()]
+
+    def set_state(self, state):
+        local, global_, chooser = state
+        self.local.set_state(local)
+        self.global_.set_state(global_)
+        self.chooser.set_state(chooser)
+
+
+#Clase BranchTargetBuffer: tabla de mapeo directo pc -> destino del salto
+#En fetch todavia no se sabe si la instruccion es un salto: solo un hit en el BTB permite
+#seguir por el destino predicho; con un miss se sigue en pc + 1
+#Solo se guardan los saltos tomados; los incondicionales (JMP) se marcan para no consultar al predictor
+#hits: busquedas que encontraron el pc; misses: saltos tomados que no estaban y hubo que agregar
+class BranchTargetBuffer:
+    def __init__(self, entries=64):
+        self.entries = entries
+        self.tags = [-1] * entries
+        self.targets = [0] * entries
+        self.unconditional = [False] * entries
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    #Retorna (destino, incondicional) para pc, o None si no esta
+    def lookup(self, pc):
+        index = pc % self.entries
+        if self.tags[index] == pc:
+            self.hits += 1
+            return self.targets[index], self.unconditional[index]
+        return None
+
+    def update(self, pc, target, unconditional=False):
+        index = pc % self.entries
+        if self.tags[index] != pc:
+            self.misses += 1
+            self.tags[index] = pc
+        self.targets[index] = target
+        self.unconditional[index] = unconditional
+
+    def get_state(self):
+        return [list(self.tags), list(self.targets), [int(u) for u in self.unconditional], self.hits, self.misses]
+
+    def set_state(self, state):
+        tags, targets, unconditional, self.hits, self.misses = state
+        self.tags = list(tags)
+        self.targets = list(targets)
+        self.unconditional = [bool(u) for u in unconditional]
+
+
+#Nombres de los predictores disponibles
+PREDICTORS = {
+    'static': StaticPredictor,
+    '1bit': OneBitPredictor,
+    '2bit': TwoBitPredictor,
+    'gshare': GsharePredictor,
+    'tournament': TournamentPredictor,
+}
+
+
+#Crea un predictor a partir de su nombre (con sus opciones) o devuelve el objeto recibido
+def make_predictor(predictor, **options):
+    if isinstance(predictor, str):
+        try:
+            predictor = PREDICTORS[predictor]
+        except KeyError:
+            raise ValueError(f"Predictor de saltos desconocido: {predictor}") from None
+        return predictor(**options)
+    return predictor
+
+
+#Devuelve el nombre (clave de PREDICTORS) de un predictor ya creado, o None si es una clase propia
+def predictor_name(predictor):
+    for name, cls in PREDICTORS.items():
+        if type(predictor) is cls:
+            return name
+    return None
@@ -0,0 +1,78 @@
+from array import array
+
+#Nombres de los registros de la CPU en el orden en que se guardan en el banco
+#Los registros de proposito general van primero, luego el contador de programa y el flag de cero
+REGISTER_NAMES = ('R0', 'R1', 'R2', 'R3', 'R4', 'R5', 'PC', 'Z')
+#Diccionario que traduce el nombre de un registro a su indice en el banco
+REGISTER_INDEX = {name: index for index, name in enumerate(REGISTER_NAMES)}
+#Indices fijos del contador de programa y del flag de cero
+PC = REGISTER_INDEX['PC']
+Z = REGISTER_INDEX['Z']
+
+#Los registros y la memoria de datos guardan palabras de 64 bits con signo: un resultado que no entra
+#(por ejemplo un MUL grande) se trunca en complemento a dos, como en una CPU real, en vez de cortar la corrida
+WORD_BITS = 64
+WORD_MIN = -(1 << (WORD_BITS - 1))
+WORD_MAX = (1 << (WORD_BITS - 1)) - 1
+
+
+#Funcion wrap que trunca un entero a una palabra de bits con signo (complemento a dos)
+def wrap(value, bits=WORD_BITS):
+    half = 1 << (bits - 1)
+    return ((value + half) & ((half << 1) - 1)) - half
+
+
+#Clase RegisterFile que simula el banco de registros indexado por enteros
+#Internamente los valores se guardan en un array de enteros de 64 bits (cells) que la CPU usa directamente,
+#pero sigue aceptando el acceso por nombre ('R0', 'PC', ...) como el diccionario anterior
+#Un valor que no entra en 64 bits se trunca con wrap
+class RegisterFile:
+    #Constructor que recibe como parametro names, la tupla de nombres de los registros
+    def __init__(self, names=REGISTER_NAMES):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.cells = array('q', [0]) * len(self.names)
+
+    #Convierte una clave (nombre o indice) en el indice del registro
+    def _key(self, key):
+        if isinstance(key, int):
+            return key
+        return self.index[key]
+
+    def __getitem__(self, key):
+        return self.cells[self._key(key)]
+
+    def __setitem__(self, key, value):
+        try:
+            self.cells[self._key(key)] = value
+        except OverflowError:
+            self.cells[self._key(key)] = wrap(value)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+    def items(self):
+        return list(zip(self.names, self.cells))
+
+    #Devuelve una copia del banco como diccionario {nombre: valor}
+    def as_dict(self):
+        return dict(zip(self.names, self.cells))
+
+    def __eq__(self, other):
+        if isinstance(other, RegisterFile):
+            return self.as_dict() == other.as_dict()
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.as_dict())
@@ -0,0 +1,398 @@
+import os
+import sys
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.instrucciones import (NO_REG, OP_ADD, OP_AND, OP_CMP, OP_JMP, OP_JZ, OP_LOAD, OP_MOV,
+                               OP_MUL, OP_SHL, OP_STORE, OP_SUB)
+from cpu.pipeline import PipelinedCPU
+from cpu.registros import PC, WORD_MAX, WORD_MIN, Z, wrap
+from cpu.traza import EV_LOAD, EV_STORE, EV_WRITEBACK
+
+#Pipeline superescalar en orden: las mismas cinco etapas de PipelinedCPU, pero cada una lleva un grupo
+#de hasta issue_width instrucciones (1, 2 o 4) en lugar de una sola
+#
+#IF busca hasta issue_width instrucciones seguidas; el grupo se corta despues de un salto (sin
+#predictor se resuelve en ID) o de un salto que el predictor da por tomado
+#ID emite en orden las instrucciones del grupo mientras se pueda; la primera que no puede salir
+#detiene a las que vienen atras (siguen en IF y se reintentan en el ciclo siguiente) cuando:
+#  - lee un registro que escribe una instruccion anterior del mismo grupo (no hay forwarding dentro
+#    del grupo) o un LOAD que esta en EX (load-use), o espera un dato pendiente de la memoria
+#  - no quedan puertos libres: alu_ports para MOV/ADD/SUB/MUL/SHL/AND/CMP y memory_ports para LOAD/STORE
+#  - es un salto resuelto en ID y una instruccion anterior del grupo todavia no escribio Z
+#Forwarding con varios escritores: si varias instrucciones en EX y MEM escriben el mismo registro
+#se toma el valor de la mas nueva en orden de programa
+#
+#A diferencia de PipelinedCPU, un salto tomado en ID no descarta la instruccion que esta en EX, asi
+#que el resultado es siempre el de isa.CPU (no hacen falta los NOP antes de los saltos)
+#Por eso issue_width=1 no da los mismos ciclos que PipelinedCPU y no sirve como su linea base ciclo
+#a ciclo: ademas de los saltos, la instruccion detenida por un load-use espera en IF y cuesta 1 ciclo,
+#mientras PipelinedCPU la vuelve a buscar y pierde 2. Los anchos se comparan contra issue_width=1
+#de este mismo modelo
+#Las metricas de run() agregan el IPC y el uso de los lugares de emision (issue_width por ciclo)
+
+ISSUE_WIDTHS = (1, 2, 4)
+
+#Operaciones que usan un puerto de ALU o de memoria (NOP y los saltos no usan ninguno)
+ALU_PORT_OPS = frozenset((OP_MOV, OP_ADD, OP_SUB, OP_MUL, OP_SHL, OP_AND, OP_CMP))
+MEMORY_PORT_OPS = frozenset((OP_LOAD, OP_STORE))
+#Operaciones que escriben Z en EX
+FLAG_OPS = frozenset((OP_ADD, OP_SUB, OP_MUL, OP_CMP))
+
+#Marca de forwarding para un registro que escribe un LOAD que todavia esta en EX
+_LOADING = object()
+
+
+#Clase SuperscalarCPU
+#issue_width: instrucciones que pasan por cada etapa por ciclo (1, 2 o 4)
+#alu_ports / memory_ports: unidades de ALU y puertos de memoria (por defecto issue_width y 1)
+#Los demas parametros son los de PipelinedCPU (caché, predictor, traza, registro de metricas...)
+#Cada etapa es una lista de entradas como las de PipelinedCPU (None si esta vacia); en IF cada
+#entrada es (instruccion, PC predicho) y en ID (instruccion, valores de los operandos)
+class SuperscalarCPU(PipelinedCPU):
+    def __init__(self, program, issue_width=2, alu_ports=None, memory_ports=1, **options):
+        if issue_width not in ISSUE_WIDTHS:
+            raise ValueError(f"El ancho de emisión debe ser 1, 2 o 4, no {issue_width}")
+        if alu_ports is None:
+            alu_ports = issue_width
+        if alu_ports < 1 or memory_ports < 1:
+            raise ValueError("Hace falta al menos un puerto de ALU y uno de memoria")
+        self.issue_width = issue_width
+        self.alu_ports = alu_ports
+        self.memory_ports = memory_ports
+        self.issued_count = 0
+        self.dependency_stops = 0
+        self.structural_stops = 0
+        super().__init__(program, **options)
+
+    # El perfil por PC y las métricas detalladas miran una instrucción por etapa
+    def set_profiler(self, profiler):
+        if profiler is not None:
+            raise ValueError("El perfil por PC solo está disponible para PipelinedCPU")
+        super().set_profiler(profiler)
+
+    def set_registry(self, registry):
+        if registry is not None and registry.detailed:
+            raise ValueError("Las métricas detalladas solo están disponibles para PipelinedCPU")
+        super().set_registry(registry)
+
+    def run(self, max_cycles=100, max_instructions=None, stop_cycle=None, resume=False):
+        if not resume:
+            self.issued_count = 0
+            self.dependency_stops = 0
+            self.structural_stops = 0
+        return super().run(max_cycles, max_instructions, stop_cycle, resume)
+
+    def fetch(self):
+        if self.IF_stage is not None:
+            return  # quedan instrucciones del grupo anterior sin emitir
+        regs = self._regs
+        pc = regs[PC]
+        end = self.fetch_end
+        snapshot = self._snapshot
+        group = []
+        while len(group) < self.issue_width and pc < end:
+            if self._icache is not None:
+                self._icache(pc)
+            instruction = self.program[pc]
+            if self.btb is None:
+                group.append((instruction, None))
+                pc += 1
+                if instruction.op >= OP_JMP:
+                    break
+            else:
+                following = self._predict_next(pc)
+                group.append((instruction, (following, snapshot() if snapshot is not None else None)))
+                pc, predicted_taken = following, following != pc + 1
+                if predicted_taken:
+                    break
+        regs[PC] = pc
+        self.IF_stage = group or None
+
+    def decode(self):
+        group = self.IF_stage
+        if group is None:
+            self.ID_stage = None
+            return
+
+        regs = self._regs
+        forwarding = self.forwarding
+        # Valor más nuevo de cada registro que escriben EX y MEM (MEM primero: EX es más nueva)
+        forward = {}
+        for stage in (self.MEM_stage, self.EX_stage):
+            if stage is not None:
+                for instruction, value in stage:
+                    if instruction.dest != NO_REG:
+                        forward[instruction.dest] = _LOADING if stage is self.EX_stage and \
+                            instruction.op == OP_LOAD else value
+
+        issued = []
+        written = set()
+        flags_pending = False
+        alu = memory = 0
+        count = 0
+        stop = None
+        for instruction, prediction in group:
+            op = instruction.op
+            if op >= OP_JMP:
+                if self.predictor is not None:
+                    # Con predicción el salto sigue hasta EX, donde el grupo se ejecuta en orden
+                    issued.append((instruction, prediction))
+                    count += 1
+                    continue
+                if flags_pending:
+                    stop = 'dependency'
+                    break
+                count += 1
+                self.instruction_count += 1
+                if op == OP_JMP:
+                    taken = True
+                else:
+                    taken = regs[Z] == 1 if op == OP_JZ else regs[Z] == 0
+                if taken:
+                    # Lo que seguía en el grupo era del camino equivocado
+                    regs[PC] = instruction.target
+                    group = group[:count]
+                break
+
+            if self.pending_regs and self._pending(instruction):
+                stop = 'memory'
+                break
+            srcs = instruction.srcs
+            if not written.isdisjoint(srcs):
+                stop = 'dependency'
+                break
+            if forwarding:
+                if any(forward.get(reg) is _LOADING for reg in srcs):
+                    stop = 'dependency'
+                    break
+            elif not forward.keys().isdisjoint(srcs):
+                stop = 'dependency'
+                break
+            if op in ALU_PORT_OPS:
+                if alu == self.alu_ports:
+                    stop = 'structural'
+                    break
+                alu += 1
+            elif op in MEMORY_PORT_OPS:
+                if memory == self.memory_ports:
+                    stop = 'structural'
+                    break
+                memory += 1
+
+            values = list(instruction.args)
+            for position, reg in instruction.slots:
+                values[position] = forward[reg] if reg in forward else regs[reg]
+            issued.append((instruction, values))
+            count += 1
+            if instruction.dest != NO_REG:
+                written.add(instruction.dest)
+            if op in FLAG_OPS:
+                flags_pending = True
+
+        self.IF_stage = group[count:] or None
+        self.ID_stage = issued or None
+        self.issued_count += count
+        if not count:
+            self.stall_count += 1
+            if stop == 'memory':
+                self.memory_stall_count += 1
+        elif stop == 'structural':
+            self.structural_stops += 1
+        elif stop is not None:
+            self.dependency_stops += 1
+
+    # True si la instrucción lee o escribe un registro cuyo LOAD todavía no recibió el dato
+    def _pending(self, instruction):
+        pending = self.pending_regs
+        now = self.cycle_count
+        waiting = False
+        for reg in (*instruction.srcs, instruction.dest):
+            ready = pending.get(reg)
+            if ready is None:
+                continue
+            if ready <= now:
+                del pending[reg]
+            else:
+                waiting = True
+        return waiting
+
+    def execute(self):
+        group = self.ID_stage
+        if group is None:
+            self.EX_stage = None
+            return
+
+        regs = self._regs
+        results = []
+        for instruction, values in group:
+            op = instruction.op
+            result = None
+            if op == OP_ADD:
+                result = values[0] + values[1]
+                if not WORD_MIN <= result <= WORD_MAX:
+                    result = wrap(result)
+                regs[Z] = 1 if result == 0 else 0
+            elif op == OP_SUB:
+                result = values[0] - values[1]
+                if not WORD_MIN <= result <= WORD_MAX:
+                    result = wrap(result)
+                regs[Z] = 1 if result == 0 else 0
+            elif op == OP_MUL:
+                result = values[0] * values[1]
+                if not WORD_MIN <= result <= WORD_MAX:
+                    result = wrap(result)
+                regs[Z] = 1 if result == 0 else 0
+            elif op == OP_LOAD:
+                result = values[0]
+            elif op == OP_STORE:
+                result = (values[1], values[0])
+            elif op == OP_MOV:
+                result = values[0] if values else 0
+            elif op == OP_SHL:
+                result = values[0] << values[1]
+                if not WORD_MIN <= result <= WORD_MAX:
+                    result = wrap(result)
+            elif op == OP_AND:
+                result = values[0] & values[1]
+            elif op == OP_CMP:
+                regs[Z] = 1 if values[0] == values[1] else 0
+            elif op >= OP_JMP:
+                mispredictions = self.mispredict_count
+                self._resolve_branch(instruction, values)
+                if self.mispredict_count != mispredictions:
+                    # Las instrucciones que siguen en el grupo eran del camino equivocado
+                    results.append((instruction, None))
+                    break
+            results.append((instruction, result))
+
+        self.EX_stage = results
+
+    def memory_access(self):
+        group = self.EX_stage
+        if group is None:
+            self.MEM_stage = None
+            return
+
+        cache = self.cache
+        trace = self._trace
+        results = []
+        wait = 0
+        for instruction, result in group:
+            op = instruction.op
+            if op == OP_LOAD:
+                address = result
+                result = cache.read(address, self.data_memory, instruction.pc)
+                if trace is not None:
+                    trace(EV_LOAD, address, result)
+                latency = cache.latency
+                if latency:
+                    if cache.mshr is None:
+                        # Caché bloqueante: los fallos del grupo se atienden uno detrás de otro
+                        wait += latency
+                    else:
+                        self._load_latency(instruction, address, latency)
+            elif op == OP_STORE:
+                address, value = result
+                result = address
+                if trace is not None:
+                    trace(EV_STORE, address, value)
+                cache.write(address, value, self.data_memory)
+                if self._store_stalls:
+                    wait += cache.write_stall
+            results.append((instruction, result))
+        if wait:
+            self.mem_wait = wait
+
+        self.MEM_stage = results
+
+    def write_back(self):
+        group = self.MEM_stage
+        if group is None:
+            self.WB_stage = None
+            return
+
+        regs = self._regs
+        for instruction, value in group:
+            self.instruction_count += 1
+            reg = instruction.dest
+            if reg != NO_REG:
+                if self._trace is not None:
+                    self._trace(EV_WRITEBACK, reg, value)
+                regs[reg] = value
+
+        self.WB_stage = group
+
+    # Además de las métricas de PipelinedCPU:
+    # ipc: instrucciones terminadas por ciclo
+    # issued / issue_slots / slot_utilization: instrucciones emitidas, lugares de emisión
+    # (issue_width por ciclo) y la fracción de esos lugares que se usó
+    # dependency_stops / structural_stops: ciclos en que el grupo se cortó antes de terminar por una
+    # dependencia o por falta de puertos (los ciclos sin emitir nada se cuentan en stalls)
+    def current_metrics(self):
+        metrics = super().current_metrics()
+        cycles = self.cycle_count
+        slots = cycles * self.issue_width
+        metrics['ipc'] = self.instruction_count / cycles if cycles else 0.0
+        metrics['issued'] = self.issued_count
+        metrics['issue_slots'] = slots
+        metrics['slot_utilization'] = self.issued_count / slots if slots else 0.0
+        metrics['dependency_stops'] = self.dependency_stops
+        metrics['structural_stops'] = self.structural_stops
+        return metrics
+
+    # Estado como el de PipelinedCPU, con el PC de la primera instrucción de cada grupo
+    def pipeline_state(self):
+        return (
+            self.IF_stage[0][0].pc if self.IF_stage else -1,
+            self.ID_stage[0][0].pc if self.ID_stage else -1,
+            self.EX_stage[0][0].pc if self.EX_stage else -1,
+            self.MEM_stage[0][0].pc if self.MEM_stage else -1,
+            self.WB_stage[0][0].pc if self.WB_stage else -1,
+            *self._regs
+        )
+
+    def print_pipeline_state(self):
+        stages = {
+            'IF': self.IF_stage,
+            'ID': self.ID_stage,
+            'EX': self.EX_stage,
+            'MEM': self.MEM_stage,
+            'WB': self.WB_stage
+        }
+        print("Pipeline:", " | ".join(
+            f"{stage}: {' '.join(entry[0].opcode for entry in group) if group else 'NOP'}"
+            for stage, group in stages.items()))
+        print("Registros:", self.registers)
+
+
+def main(argv=None):
+    import argparse
+    from Test.Rendimiento import WORKLOADS
+
+    parser = argparse.ArgumentParser(description="Compara anchos de emisión del pipeline superescalar")
+    parser.add_argument('--widths', type=int, nargs='+', default=list(ISSUE_WIDTHS), choices=ISSUE_WIDTHS)
+    parser.add_argument('--alu-ports', type=int, help="unidades de ALU (por defecto el ancho de emisión)")
+    parser.add_argument('--memory-ports', type=int, default=1)
+    parser.add_argument('--predictor', help="predictor de saltos (cpu/prediccion.py)")
+    parser.add_argument('--scale', type=float, default=0.2, help="multiplica el tamaño de las cargas")
+    parser.add_argument('--only', nargs='+', choices=tuple(WORKLOADS), help="cargas a correr")
+    args = parser.parse_args(argv)
+
+    print(f"{'carga':<15} {'ancho':>5} {'ciclos':>9} {'instr':>9} {'IPC':>6} {'uso':>6} "
+          f"{'stalls':>8} {'dep':>8} {'puertos':>8}")
+    for workload in args.only or [name for name in WORKLOADS if name != 'interrupciones']:
+        program, data, memory_size = WORKLOADS[workload](args.scale)
+        for width in args.widths:
+            cpu = SuperscalarCPU(program, width, args.alu_ports, args.memory_ports,
+                                 memory_size=max(memory_size, 16), predictor=args.predictor)
+            if data is not None:
+                cpu.data_memory.load(data)
+            metrics = cpu.run()
+            print(f"{workload:<15} {width:>5} {metrics['cycles']:>9} {metrics['instructions']:>9} "
+                  f"{metrics['ipc']:>6.2f} {metrics['slot_utilization']:>6.1%} {metrics['stalls']:>8} "
+                  f"{metrics['dependency_stops']:>8} {metrics['structural_stops']:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
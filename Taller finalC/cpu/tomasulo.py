@@ -0,0 +1,571 @@
+import os
+import sys
+from collections import deque
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cpu.instrucciones import (NO_REG, OP_ADD, OP_AND, OP_CMP, OP_JMP, OP_JZ, OP_LOAD, OP_MOV,
+                               OP_MUL, OP_NOP, OP_SHL, OP_STORE, OP_SUB)
+from cpu.pipeline import PipelinedCPU
+from cpu.registros import PC, REGISTER_NAMES, WORD_MAX, WORD_MIN, Z, wrap
+from cpu.traza import EV_LOAD, EV_STORE, EV_WRITEBACK
+
+#Nucleo fuera de orden al estilo Tomasulo, como alternativa a PipelinedCPU para los mismos programas
+#
+#Cada ciclo, en este orden:
+#  commit: retira en orden las instrucciones terminadas de la cabeza del ROB (reorder buffer); recien
+#  ahi escriben el banco de registros y los STORE escriben en la cache
+#  resultado: las instrucciones que terminan de ejecutar publican su valor (bus comun de datos) y
+#  despiertan a las que lo esperaban en las estaciones de reserva
+#  ejecucion: cada unidad (ALU o puerto de memoria) toma la instruccion mas vieja con todos sus operandos
+#  emision: las instrucciones buscadas entran al ROB y a una estacion de reserva; los registros fuente se
+#  renombran con la tabla rat (registro -> entrada del ROB que lo va a escribir, None = banco de registros)
+#  fetch: busca issue_width instrucciones por ciclo siguiendo el predictor de saltos
+#Z se renombra como un registro mas (lo escriben ADD/SUB/MUL/CMP), asi los saltos esperan al ultimo CMP
+#
+#Los saltos se predicen siempre: con predictor como en PipelinedCPU (BTB + predictor) y sin predictor
+#hacia atras tomados y hacia adelante no tomados; cuando un salto termina de ejecutar y la prediccion
+#fallo se descartan las entradas mas nuevas del ROB y fetch sigue por el camino correcto
+#Un LOAD no se adelanta a un STORE anterior cuya direccion todavia no se conoce; si la direccion es la
+#misma toma el dato del STORE sin ir a la cache. Un LOAD con una direccion fuera de la memoria (por ejemplo
+#en el camino equivocado de un salto) espera a ser el mas viejo del ROB, asi el error es preciso
+#Interrupciones precisas: al atender una se descarta todo lo que no hizo commit y se guarda el PC de la
+#instruccion mas vieja; la rutina del dispositivo ve el estado exacto y despues se vuelve a buscar desde ahi
+#
+#El resultado es el de isa.CPU (no hacen falta los NOP antes de los saltos de PipelinedCPU), incluido que
+#un salto a si mismo sigue de largo
+
+#Ciclos de ejecucion: las operaciones de la ALU tardan 1 y un LOAD 2 (direccion y acceso a la cache)
+#mas la latencia de la cache
+ALU_LATENCY = 1
+LOAD_LATENCY = 2
+
+FLAG_OPS = frozenset((OP_ADD, OP_SUB, OP_MUL, OP_CMP))
+#Operaciones cuyo resultado puede no entrar en 64 bits (se trunca con wrap)
+WIDE_OPS = frozenset((OP_ADD, OP_SUB, OP_MUL, OP_SHL))
+MEMORY_OPS = frozenset((OP_LOAD, OP_STORE))
+
+
+#Entrada del ROB, que es tambien la de su estacion de reserva mientras espera operandos
+#values: operandos (los que faltan quedan en None hasta que los publica el productor)
+#pending: operandos que faltan; consumers: (entrada, posicion, registro) que esperan este resultado
+#value / flag: resultado y valor de Z; address: direccion de un LOAD o STORE
+#predicted / actual: siguiente PC predicho y real de un salto
+#history: historia del predictor al buscar el salto (None si el predictor no usa historia)
+class _Entry:
+    __slots__ = ('instruction', 'seq', 'values', 'pending', 'consumers', 'value', 'flag', 'address',
+                 'predicted', 'history', 'actual', 'ready', 'done', 'squashed', 'memory_wait')
+
+    def __init__(self, instruction, seq, predicted, history):
+        self.instruction = instruction
+        self.seq = seq
+        self.values = None
+        self.pending = 0
+        self.consumers = []
+        self.value = None
+        self.flag = None
+        self.address = None
+        self.predicted = predicted
+        self.history = history
+        self.actual = None
+        self.ready = 0
+        self.done = False
+        self.squashed = False
+        self.memory_wait = False
+
+
+#Clase TomasuloCPU
+#issue_width: instrucciones buscadas, emitidas y retiradas por ciclo
+#rob_size: entradas del ROB; alu_stations / memory_stations: estaciones de reserva de cada tipo
+#alu_units / memory_ports: instrucciones que empiezan a ejecutar por ciclo en la ALU y en memoria
+#Los demas parametros son los de PipelinedCPU (cache, predictor, traza, registro de metricas...)
+class TomasuloCPU(PipelinedCPU):
+    def __init__(self, program, issue_width=2, rob_size=16, alu_stations=4, memory_stations=4,
+                 alu_units=2, memory_ports=1, **options):
+        if min(issue_width, rob_size, alu_stations, memory_stations, alu_units, memory_ports) < 1:
+            raise ValueError("El ancho, el ROB, las estaciones y las unidades deben ser de al menos 1")
+        self.issue_width = issue_width
+        self.rob_size = rob_size
+        self.alu_stations = alu_stations
+        self.memory_stations = memory_stations
+        self.alu_units = alu_units
+        self.memory_ports = memory_ports
+        self.fetch_queue = deque()
+        self.rob = deque()
+        self.alu_queue = []
+        self.memory_queue = []
+        self.executing = []
+        self.rat = [None] * len(REGISTER_NAMES)
+        self._seq = 0
+        self.memory_busy_until = 0
+        # Ciclo hasta el que no se retira nada porque un STORE encontró lleno el buffer de escritura
+        self.store_wait_until = 0
+        self.rob_stalls = 0
+        self.station_stalls = 0
+        self.squashed_count = 0
+        self.recoveries = 0
+        super().__init__(program, **options)
+        for instruction in self.program:
+            if PC == instruction.dest or PC in instruction.srcs:
+                raise ValueError(f"TomasuloCPU no acepta PC como operando (instrucción {instruction.pc})")
+
+    # El perfil por PC y las métricas detalladas miran las etapas de PipelinedCPU
+    def set_profiler(self, profiler):
+        if profiler is not None:
+            raise ValueError("El perfil por PC solo está disponible para PipelinedCPU")
+        super().set_profiler(profiler)
+
+    def set_registry(self, registry):
+        if registry is not None and registry.detailed:
+            raise ValueError("Las métricas detalladas solo están disponibles para PipelinedCPU")
+        super().set_registry(registry)
+
+    def run(self, max_cycles=100, max_instructions=None, stop_cycle=None, resume=False):
+        if not resume:
+            self.rob_stalls = 0
+            self.station_stalls = 0
+            self.squashed_count = 0
+            self.recoveries = 0
+            self.memory_busy_until = 0
+            self.store_wait_until = 0
+        return super().run(max_cycles, max_instructions, stop_cycle, resume)
+
+    def step(self):
+        interrupts = self.interrupts
+        if interrupts.next_event <= self.cycle_count:
+            interrupts.advance(self.cycle_count)
+        if interrupts.active and not self.handling_interrupt:
+            self._take_interrupt()
+        if self.handling_interrupt:
+            self.interrupt_service_routine()
+        else:
+            self.commit()
+            self.write_result()
+            self.execute()
+            self.issue()
+            self.fetch()
+        self.cycle_count += 1
+
+    # Descarta todo lo que no hizo commit para que la interrupción vea el estado preciso; si el
+    # controlador no entrega ninguna línea (todas enmascaradas) no se descarta nada
+    def _take_interrupt(self):
+        regs = self._regs
+        fetch_pc = regs[PC]
+        if self.rob:
+            regs[PC] = self.rob[0].instruction.pc
+        elif self.fetch_queue:
+            regs[PC] = self.fetch_queue[0][0].pc
+        self.check_interrupt()
+        if self.handling_interrupt:
+            self._flush()
+        else:
+            regs[PC] = fetch_pc
+
+    def fetch(self):
+        queue = self.fetch_queue
+        regs = self._regs
+        pc = regs[PC]
+        end = self.fetch_end
+        limit = 2 * self.issue_width
+        snapshot = self._snapshot
+        fetched = 0
+        while fetched < self.issue_width and pc < end and len(queue) < limit:
+            if self._icache is not None:
+                self._icache(pc)
+            instruction = self.program[pc]
+            if instruction.op >= OP_JMP:
+                following = self._predict(instruction)
+                history = snapshot() if snapshot is not None else None
+            else:
+                following, history = pc + 1, None
+            queue.append((instruction, following, history))
+            fetched += 1
+            taken = following != pc + 1
+            pc = following
+            if taken:
+                break
+        regs[PC] = pc
+
+    # Siguiente PC predicho para un salto: con predictor el del BTB, si no hacia atrás tomado
+    def _predict(self, instruction):
+        pc = instruction.pc
+        if instruction.target == pc:
+            return pc + 1
+        if self.btb is not None:
+            return self._predict_next(pc)
+        if instruction.op == OP_JMP or instruction.target < pc:
+            return instruction.target
+        return pc + 1
+
+    def issue(self):
+        queue = self.fetch_queue
+        if not queue:
+            return
+        regs = self._regs
+        rat = self.rat
+        rob = self.rob
+        issued = 0
+        full = None
+        while queue and issued < self.issue_width:
+            instruction, predicted, history = queue[0]
+            op = instruction.op
+            if len(rob) >= self.rob_size:
+                full = 'rob'
+                break
+            if op in MEMORY_OPS:
+                stations, capacity = self.memory_queue, self.memory_stations
+            elif op != OP_NOP:
+                stations, capacity = self.alu_queue, self.alu_stations
+            else:
+                stations = None
+            if stations is not None and len(stations) >= capacity:
+                full = 'station'
+                break
+            queue.popleft()
+            self._seq += 1
+            entry = _Entry(instruction, self._seq, predicted, history)
+            if op >= OP_JMP:
+                slots = ((0, Z),) if op != OP_JMP else ()
+                values = [None] * len(slots)
+            else:
+                slots = instruction.slots
+                values = list(instruction.args)
+            pending = 0
+            for position, reg in slots:
+                producer = rat[reg]
+                if producer is None:
+                    values[position] = regs[reg]
+                elif producer.done:
+                    values[position] = producer.flag if reg == Z else producer.value
+                else:
+                    producer.consumers.append((entry, position, reg))
+                    pending += 1
+            entry.values = values
+            entry.pending = pending
+            if stations is None:
+                entry.done = True
+            else:
+                stations.append(entry)
+            if instruction.dest != NO_REG:
+                rat[instruction.dest] = entry
+            if op in FLAG_OPS:
+                rat[Z] = entry
+            rob.append(entry)
+            issued += 1
+        if not issued:
+            self.stall_count += 1
+            if full == 'rob':
+                self.rob_stalls += 1
+            else:
+                self.station_stalls += 1
+
+    def execute(self):
+        now = self.cycle_count
+        alu_queue = self.alu_queue
+        if alu_queue:
+            started = 0
+            for entry in list(alu_queue):
+                if started == self.alu_units:
+                    break
+                if entry.pending:
+                    continue
+                alu_queue.remove(entry)
+                self._compute(entry)
+                entry.ready = now + ALU_LATENCY
+                self.executing.append(entry)
+                started += 1
+        memory_queue = self.memory_queue
+        if memory_queue and now >= self.memory_busy_until:
+            started = 0
+            for entry in list(memory_queue):
+                if started == self.memory_ports or now < self.memory_busy_until:
+                    break
+                if entry.pending:
+                    continue
+                if entry.instruction.op == OP_STORE:
+                    entry.value, entry.address = entry.values
+                    entry.ready = now + ALU_LATENCY
+                elif not self._load(entry, now):
+                    continue
+                memory_queue.remove(entry)
+                self.executing.append(entry)
+                started += 1
+
+    # Calcula el resultado de una operación de la ALU o de un salto
+    def _compute(self, entry):
+        instruction = entry.instruction
+        op = instruction.op
+        values = entry.values
+        if op >= OP_JMP:
+            pc = instruction.pc
+            if op == OP_JMP:
+                taken = True
+            else:
+                taken = values[0] == 1 if op == OP_JZ else values[0] == 0
+            # Como en isa.CPU, un salto a sí mismo sigue con la instrucción siguiente
+            entry.actual = instruction.target if taken and instruction.target != pc else pc + 1
+            entry.value = taken
+            return
+        if op == OP_ADD:
+            result = values[0] + values[1]
+        elif op == OP_SUB:
+            result = values[0] - values[1]
+        elif op == OP_MUL:
+            result = values[0] * values[1]
+        elif op == OP_SHL:
+            result = values[0] << values[1]
+        elif op == OP_AND:
+            result = values[0] & values[1]
+        elif op == OP_MOV:
+            result = values[0] if values else 0
+        else:
+            result = None
+        if op in WIDE_OPS and not WORD_MIN <= result <= WORD_MAX:
+            result = wrap(result)
+        entry.value = result
+        if op == OP_CMP:
+            entry.flag = 1 if values[0] == values[1] else 0
+        elif op in FLAG_OPS:
+            entry.flag = 1 if result == 0 else 0
+        elif instruction.dest == Z:
+            entry.flag = result
+
+    # Empieza un LOAD si ningún STORE anterior lo impide; retorna False si tiene que esperar
+    def _load(self, entry, now):
+        address = entry.values[0]
+        forwarded = None
+        for older in self.rob:
+            if older is entry:
+                break
+            if older.instruction.op == OP_STORE:
+                if older.address is None:
+                    return False
+                if older.address == address:
+                    forwarded = older
+        if forwarded is not None:
+            entry.value = forwarded.value
+            entry.ready = now + LOAD_LATENCY
+        else:
+            if not 0 <= address < len(self.data_memory) and self.rob[0] is not entry:
+                return False
+            self._read(entry, address, now)
+        if entry.instruction.dest == Z:
+            entry.flag = entry.value
+        return True
+
+    # Lee el dato de un LOAD de la caché y calcula cuándo está listo
+    def _read(self, entry, address, now):
+        cache = self.cache
+        entry.value = cache.read(address, self.data_memory, entry.instruction.pc)
+        entry.address = address
+        if self._trace is not None:
+            self._trace(EV_LOAD, address, entry.value)
+        latency = cache.latency
+        if latency and cache.mshr is None:
+            # Caché bloqueante: el puerto queda ocupado hasta que llega el dato
+            self.memory_busy_until = now + latency
+        elif latency:
+            latency = cache.mshr.request(address, now, latency, latency > cache.hit_latency) - now
+        entry.ready = now + LOAD_LATENCY + latency
+        entry.memory_wait = latency > 0
+
+    # Publica los resultados que terminan en este ciclo (en orden de programa) y resuelve los saltos
+    def write_result(self):
+        executing = self.executing
+        if not executing:
+            return
+        now = self.cycle_count
+        finished = [entry for entry in executing if entry.ready <= now]
+        if not finished:
+            return
+        self.executing = [entry for entry in executing if entry.ready > now]
+        finished.sort(key=lambda entry: entry.seq)
+        for entry in finished:
+            if entry.squashed:
+                continue
+            entry.done = True
+            for consumer, position, reg in entry.consumers:
+                if not consumer.squashed:
+                    consumer.values[position] = entry.flag if reg == Z else entry.value
+                    consumer.pending -= 1
+            entry.consumers = None
+            if entry.actual is not None and entry.actual != entry.predicted:
+                self._recover(entry)
+
+    # Salto mal predicho: descarta las entradas más nuevas y sigue buscando por el camino correcto
+    def _recover(self, branch):
+        rob = self.rob
+        while rob[-1] is not branch:
+            rob.pop().squashed = True
+            self.squashed_count += 1
+        self.alu_queue = [entry for entry in self.alu_queue if not entry.squashed]
+        self.memory_queue = [entry for entry in self.memory_queue if not entry.squashed]
+        self.executing = [entry for entry in self.executing if not entry.squashed]
+        self.fetch_queue.clear()
+        rat = self.rat
+        rat[:] = [None] * len(rat)
+        for entry in rob:
+            if entry.instruction.dest != NO_REG:
+                rat[entry.instruction.dest] = entry
+            if entry.instruction.op in FLAG_OPS:
+                rat[Z] = entry
+        self.recoveries += 1
+        self._regs[PC] = branch.actual
+
+    def commit(self):
+        rob = self.rob
+        if not rob:
+            return
+        if self.cycle_count < self.store_wait_until:
+            self.memory_stall_count += 1
+            return
+        regs = self._regs
+        rat = self.rat
+        trace = self._trace
+        committed = 0
+        while rob and committed < self.issue_width:
+            entry = rob[0]
+            if not entry.done:
+                if not committed and entry.memory_wait:
+                    self.memory_stall_count += 1
+                break
+            rob.popleft()
+            committed += 1
+            self.instruction_count += 1
+            instruction = entry.instruction
+            op = instruction.op
+            if op == OP_STORE:
+                if trace is not None:
+                    trace(EV_STORE, entry.address, entry.value)
+                self.cache.write(entry.address, entry.value, self.data_memory)
+                if self._store_stalls and self.cache.write_stall:
+                    self.store_wait_until = self.cycle_count + self.cache.write_stall
+                    break
+                continue
+            if op >= OP_JMP:
+                self._retire_branch(entry)
+                continue
+            dest = instruction.dest
+            if dest != NO_REG:
+                if trace is not None:
+                    trace(EV_WRITEBACK, dest, entry.value)
+                if dest != Z:
+                    regs[dest] = entry.value
+                if rat[dest] is entry:
+                    rat[dest] = None
+            if entry.flag is not None:
+                regs[Z] = entry.flag
+                if rat[Z] is entry:
+                    rat[Z] = None
+
+    # El predictor y el BTB se actualizan al hacer commit, solo con saltos del camino correcto
+    def _retire_branch(self, entry):
+        instruction = entry.instruction
+        self.branch_count += 1
+        if entry.actual != entry.predicted:
+            self.mispredict_count += 1
+        if self.predictor is None:
+            return
+        pc = instruction.pc
+        if instruction.op != OP_JMP:
+            if entry.history is None:
+                self.predictor.update(pc, entry.value)
+            else:
+                self.predictor.update(pc, entry.value, entry.history)
+        if entry.value and instruction.target != pc:
+            self.btb.update(pc, instruction.target, instruction.op == OP_JMP)
+
+    # Descarta todas las instrucciones que no hicieron commit
+    def _flush(self):
+        for entry in self.rob:
+            entry.squashed = True
+        self.squashed_count += len(self.rob)
+        self.rob.clear()
+        self.fetch_queue.clear()
+        self.alu_queue = []
+        self.memory_queue = []
+        self.executing = []
+        self.rat[:] = [None] * len(self.rat)
+
+    def load_state(self, registers):
+        super().load_state(registers)
+        self._flush()
+
+    def pipeline_busy(self):
+        return (bool(self.rob) or bool(self.fetch_queue) or self._regs[PC] < self.fetch_end or
+                self.interrupts.active)
+
+    # Además de las métricas de PipelinedCPU:
+    # ipc: instrucciones retiradas por ciclo
+    # rob_stalls / station_stalls: ciclos sin emitir por el ROB lleno o sin estación de reserva libre
+    # (los dos suman stalls); squashed: instrucciones descartadas (saltos mal predichos e interrupciones)
+    # recoveries: veces que se corrigió el camino por un salto mal predicho
+    def current_metrics(self):
+        metrics = super().current_metrics()
+        cycles = self.cycle_count
+        metrics['ipc'] = self.instruction_count / cycles if cycles else 0.0
+        metrics['rob_stalls'] = self.rob_stalls
+        metrics['station_stalls'] = self.station_stalls
+        metrics['squashed'] = self.squashed_count
+        metrics['recoveries'] = self.recoveries
+        return metrics
+
+    # Estado como el de PipelinedCPU: PC de la instrucción buscada más vieja, de la más vieja que
+    # espera en una estación, de la más vieja ejecutando (en la ALU y en memoria) y de la cabeza del ROB
+    def pipeline_state(self):
+        executing = [entry for entry in self.executing if entry.instruction.op not in MEMORY_OPS]
+        loads = [entry for entry in self.executing if entry.instruction.op in MEMORY_OPS]
+        waiting = self.alu_queue + self.memory_queue
+        return (
+            self.fetch_queue[0][0].pc if self.fetch_queue else -1,
+            min(waiting, key=_age).instruction.pc if waiting else -1,
+            min(executing, key=_age).instruction.pc if executing else -1,
+            min(loads, key=_age).instruction.pc if loads else -1,
+            self.rob[0].instruction.pc if self.rob else -1,
+            *self._regs
+        )
+
+    def print_pipeline_state(self):
+        print("ROB:", " | ".join(
+            f"{entry.instruction.opcode}@{entry.instruction.pc}{'*' if entry.done else ''}"
+            for entry in self.rob) or "vacío")
+        print("Registros:", self.registers)
+
+
+def _age(entry):
+    return entry.seq
+
+
+def main(argv=None):
+    import argparse
+    from Test.Rendimiento import WORKLOADS
+    from cpu.superescalar import SuperscalarCPU
+
+    parser = argparse.ArgumentParser(description="Compara el núcleo fuera de orden con los pipelines en orden")
+    parser.add_argument('--width', type=int, default=2, help="ancho de emisión")
+    parser.add_argument('--rob', type=int, default=16, help="entradas del ROB")
+    parser.add_argument('--predictor', help="predictor de saltos (cpu/prediccion.py)")
+    parser.add_argument('--scale', type=float, default=0.2, help="multiplica el tamaño de las cargas")
+    parser.add_argument('--only', nargs='+', choices=tuple(WORKLOADS), help="cargas a correr")
+    args = parser.parse_args(argv)
+
+    models = {
+        'pipeline': lambda program, **options: PipelinedCPU(program, **options),
+        'superescalar': lambda program, **options: SuperscalarCPU(program, args.width, **options),
+        'tomasulo': lambda program, **options: TomasuloCPU(program, args.width, args.rob, **options),
+    }
+    print(f"{'carga':<15} {'modelo':<13} {'ciclos':>9} {'instr':>9} {'IPC':>6} {'stalls':>8}")
+    for workload in args.only or [name for name in WORKLOADS if name != 'interrupciones']:
+        program, data, memory_size = WORKLOADS[workload](args.scale)
+        for model, build in models.items():
+            cpu = build(program, memory_size=max(memory_size, 16), predictor=args.predictor)
+            if data is not None:
+                cpu.data_memory.load(data)
+            metrics = cpu.run()
+            cycles = metrics['cycles']
+            print(f"{workload:<15} {model:<13} {cycles:>9} {metrics['instructions']:>9} "
+                  f"{metrics['instructions'] / cycles:>6.2f} {metrics['stalls']:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
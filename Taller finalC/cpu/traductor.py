@@ -0,0 +1,270 @@
+import sys
+from cpu.registros import PC, REGISTER_INDEX, WORD_MAX, WORD_MIN, Z, wrap
+
+#Traduccion por bloques basicos para isa.CPU
+#Un bloque empieza en cualquier PC y sigue en linea recta hasta un salto (JMP/JZ/JE/JNZ, incluido),
+#hasta una instruccion que no se puede traducir o hasta MAX_BLOCK instrucciones
+#Cada bloque se traduce una sola vez a una funcion de Python (codigo generado con exec) que trabaja
+#con los registros en variables locales, y se guarda en un diccionario por PC de inicio
+#Si el salto final vuelve al inicio del mismo bloque, la funcion repite el bloque en un while
+#sin volver al despachador
+#El resultado es el mismo que ejecutar instruccion por instruccion con CPU.step(), salvo que si una
+#instruccion lanza una excepcion en medio de un bloque los registros quedan como al inicio del bloque
+
+#Maximo de instrucciones por bloque (acota el codigo generado y el presupuesto minimo de pasos)
+MAX_BLOCK = 256
+#Veces que se tiene que llegar a un PC desde el despachador (por un salto o al terminar un bloque)
+#para traducir su bloque; antes se interpreta, asi el codigo que se ejecuta una sola vez (por
+#ejemplo un bucle desenrollado) no paga el costo de compilarlo
+HOT_THRESHOLD = 2
+
+BRANCHES = ('JMP', 'JZ', 'JE', 'JNZ')
+ARITHMETIC = {'ADD': '+', 'SUB': '-', 'MUL': '*'}
+LOGIC = {'SHL': '<<', 'AND': '&'}
+#Registros de proposito general que puede usar un bloque (los demas se dejan al interprete)
+GENERAL_REGISTERS = {name: index for name, index in REGISTER_INDEX.items() if name.startswith('R')}
+
+#Marca de un PC que todavia no se intento traducir
+_MISSING = object()
+
+
+#Clase Block: una funcion traducida y el rango de PCs que cubre
+class Block:
+    __slots__ = ('start', 'end', 'length', 'function', 'source')
+
+    def __init__(self, start, end, function, source):
+        self.start = start
+        self.end = end
+        self.length = end - start + 1
+        self.function = function
+        self.source = source
+
+
+#Indica si un operando se puede usar en codigo traducido: entero inmediato o registro R0-R5
+def _valid_operand(operand):
+    if isinstance(operand, str):
+        return operand in GENERAL_REGISTERS
+    return isinstance(operand, int)
+
+
+#Indica si una instruccion se puede traducir (las demas, incluidos los errores, las ejecuta el interprete)
+def translatable(instruction):
+    opcode = instruction['opcode']
+    operands = instruction['operands']
+    if opcode in ARITHMETIC or opcode in LOGIC:
+        return len(operands) == 3 and isinstance(operands[0], str) and all(map(_valid_operand, operands))
+    if opcode == 'MOV':
+        return len(operands) in (1, 2) and isinstance(operands[0], str) and all(map(_valid_operand, operands))
+    if opcode == 'LOAD':
+        return len(operands) == 2 and isinstance(operands[0], str) and all(map(_valid_operand, operands))
+    if opcode in ('STORE', 'CMP'):
+        return len(operands) == 2 and all(map(_valid_operand, operands))
+    if opcode in BRANCHES:
+        return len(operands) >= 1 and type(operands[0]) is int
+    return opcode == 'NOP'
+
+
+#Clase Translator que traduce y ejecuta los bloques de una isa.CPU
+class Translator:
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.cache = cpu.cache
+        #PC de inicio -> Block, o None si la instruccion de ese PC no se puede traducir
+        self.blocks = {}
+        #PC de inicio -> veces que se llego a ese PC sin traduccion
+        self.heat = {}
+        #Estadisticas: bloques traducidos, ejecuciones de bloques e instrucciones interpretadas
+        self.translated = 0
+        self.block_runs = 0
+        self.interpreted = 0
+
+    #Metodo invalidate que descarta las traducciones que contienen pc (o todas si pc es None)
+    #Se usa si se modifica el programa; los bloques se vuelven a traducir la proxima vez
+    def invalidate(self, pc=None):
+        if pc is None:
+            self.blocks.clear()
+            self.heat.clear()
+            return
+        for start, block in list(self.blocks.items()):
+            if start == pc or (block is not None and block.start <= pc <= block.end):
+                del self.blocks[start]
+
+    #Metodo translate que traduce el bloque que empieza en start
+    #Retorna el Block o None si la primera instruccion no se puede traducir
+    def translate(self, start):
+        program = self.cpu.program
+        last = start - 1
+        pc = start
+        while pc < len(program) and pc - start < MAX_BLOCK and translatable(program[pc]):
+            last = pc
+            if program[pc]['opcode'] in BRANCHES:
+                break
+            pc += 1
+        if last < start:
+            self.blocks[start] = None
+            return None
+        source = self.generate(start, last)
+        namespace = {'wrap': wrap}
+        if self.cache is not None:
+            namespace['read'] = self.cache.read
+            namespace['write'] = self.cache.write
+            namespace['fetch'] = self.cpu._icache
+        exec(compile(source, f'<bloque {start}-{last}>', 'exec'), namespace)
+        block = Block(start, last, namespace['block'], source)
+        self.blocks[start] = block
+        self.translated += 1
+        return block
+
+    #Metodo generate que genera el codigo de la funcion block(regs, mem, budget) para [start, last]
+    #regs: celdas del banco de registros; mem: memoria (las palabras, o DataMemory si hay cache)
+    #budget: maximo de instrucciones a ejecutar; retorna cuantas ejecuto
+    def generate(self, start, last):
+        program = self.cpu.program
+        cache = self.cache is not None
+        fetch = cache and self.cpu._icache is not None
+        used = set()
+        written = set()
+        z_used = False
+        body = []
+
+        def value(operand):
+            if isinstance(operand, str):
+                used.add(operand)
+                return f"r{GENERAL_REGISTERS[operand]}"
+            return repr(wrap(operand))
+
+        # Los resultados que pueden no entrar en 64 bits se truncan igual que en el interprete
+        def fit(dest):
+            body.append(f"if not {WORD_MIN} <= {dest} <= {WORD_MAX}: {dest} = wrap({dest})")
+
+        def target(operand):
+            used.add(operand)
+            written.add(operand)
+            return f"r{GENERAL_REGISTERS[operand]}"
+
+        next_pc = f"{last + 1}"
+        for pc in range(start, last + 1):
+            instruction = program[pc]
+            opcode = instruction['opcode']
+            operands = instruction['operands']
+            if fetch:
+                body.append(f"fetch({pc})")
+            if opcode in ARITHMETIC:
+                a, b = value(operands[1]), value(operands[2])
+                dest = target(operands[0])
+                body.append(f"{dest} = {a} {ARITHMETIC[opcode]} {b}")
+                fit(dest)
+                body.append(f"z = 1 if {dest} == 0 else 0")
+                z_used = True
+            elif opcode in LOGIC:
+                a, b = value(operands[1]), value(operands[2])
+                dest = target(operands[0])
+                body.append(f"{dest} = {a} {LOGIC[opcode]} {b}")
+                if opcode == 'SHL':
+                    fit(dest)
+            elif opcode == 'MOV':
+                source = value(operands[1]) if len(operands) > 1 else '0'
+                body.append(f"{target(operands[0])} = {source}")
+            elif opcode == 'CMP':
+                body.append(f"z = 1 if {value(operands[0])} == {value(operands[1])} else 0")
+                z_used = True
+            elif opcode == 'LOAD':
+                address = value(operands[1])
+                dest = target(operands[0])
+                body.append(f"{dest} = read({address}, mem)" if cache else f"{dest} = mem[{address}]")
+            elif opcode == 'STORE':
+                source, address = value(operands[0]), value(operands[1])
+                body.append(f"write({address}, {source}, mem)" if cache else f"mem[{address}] = {source}")
+            elif opcode in BRANCHES:
+                # Igual que step(): si el salto no cambia el PC (destino = su propio PC) se avanza uno
+                jump = operands[0] if operands[0] != pc else pc + 1
+                if opcode == 'JMP':
+                    next_pc = f"{jump}"
+                elif opcode == 'JNZ':
+                    next_pc = f"{jump} if z == 0 else {pc + 1}"
+                    z_used = True
+                else:
+                    next_pc = f"{jump} if z == 1 else {pc + 1}"
+                    z_used = True
+
+        length = last - start + 1
+        final = program[last]
+        loops = final['opcode'] in BRANCHES and final['operands'][0] == start and start != last
+        lines = ["def block(regs, mem, budget):"]
+        for name in sorted(used):
+            lines.append(f"    r{GENERAL_REGISTERS[name]} = regs[{GENERAL_REGISTERS[name]}]")
+        if z_used:
+            lines.append(f"    z = regs[{Z}]")
+        if loops:
+            lines.append("    steps = 0")
+            lines.append("    while True:")
+            lines.extend(f"        {line}" for line in body)
+            lines.append(f"        steps += {length}")
+            lines.append(f"        npc = {next_pc}")
+            lines.append(f"        if npc != {start} or steps + {length} > budget:")
+            lines.append("            break")
+        else:
+            lines.extend(f"    {line}" for line in body)
+            lines.append(f"    steps = {length}")
+            lines.append(f"    npc = {next_pc}")
+        for name in sorted(written):
+            lines.append(f"    regs[{GENERAL_REGISTERS[name]}] = r{GENERAL_REGISTERS[name]}")
+        lines.append(f"    regs[{PC}] = npc")
+        if z_used:
+            lines.append(f"    regs[{Z}] = z")
+        lines.append("    return steps")
+        return "\n".join(lines) + "\n"
+
+    #Metodo run con la misma interfaz que CPU.run: ejecuta bloques traducidos y usa el interprete
+    #(CPU.step) para lo que no se puede traducir, para bloques mas largos que los pasos que quedan
+    #y para bloques que contienen stop_pc despues de su inicio
+    def run(self, max_steps=None, stop_pc=None):
+        cpu = self.cpu
+        if cpu.cache is not self.cache:
+            self.cache = cpu.cache
+            self.invalidate()
+        regs = cpu.registers.cells
+        blocks = self.blocks
+        heat = self.heat
+        step = cpu.step
+        program_length = len(cpu.program)
+        limit = sys.maxsize if max_steps is None else max_steps
+        steps = 0
+        interpreted = 0
+        block_runs = 0
+        while steps < limit:
+            pc = regs[PC]
+            if pc == stop_pc or pc >= program_length:
+                break
+            block = blocks.get(pc, _MISSING) if pc >= 0 else None
+            if block is _MISSING:
+                count = heat.get(pc, 0) + 1
+                if count < HOT_THRESHOLD:
+                    heat[pc] = count
+                    #Codigo frio: se interpreta en linea recta sin volver al despachador ni contar
+                    #el calor de cada PC, hasta un salto tomado, un bloque ya conocido o stop_pc.
+                    #Los destinos de los saltos siguen contando, y lo que sigue a un salto no tomado
+                    #cuenta cuando se llega desde el bloque ya traducido, asi los bucles se traducen
+                    #igual y el codigo que corre una sola vez no pierde contra el interprete solo
+                    first = steps
+                    while True:
+                        step()
+                        steps += 1
+                        pc += 1
+                        if regs[PC] != pc or pc == stop_pc or pc >= program_length or pc in blocks or steps >= limit:
+                            break
+                    interpreted += steps - first
+                    continue
+                else:
+                    block = self.translate(pc)
+            if block is None or block.length > limit - steps or (stop_pc is not None and pc < stop_pc <= block.end):
+                step()
+                interpreted += 1
+                steps += 1
+                continue
+            mem = cpu.data_memory if self.cache is not None else cpu.data_memory.words
+            steps += block.function(regs, mem, limit - steps)
+            block_runs += 1
+        self.interpreted += interpreted
+        self.block_runs += block_runs
+        return steps
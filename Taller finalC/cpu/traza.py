@@ -0,0 +1,201 @@
+import collections
+import struct
+
+#Niveles de traza, cada nivel incluye a los anteriores
+TRACE_OFF = 0       # Sin traza (modo silencioso)
+TRACE_SUMMARY = 1   # Solo el resumen al final de run()
+TRACE_EVENTS = 2    # Accesos a memoria, write back, caché e interrupciones
+TRACE_CYCLES = 3    # Estado completo del pipeline en cada ciclo
+
+TRACE_LEVELS = {
+    'off': TRACE_OFF,
+    'summary': TRACE_SUMMARY,
+    'events': TRACE_EVENTS,
+    'cycles': TRACE_CYCLES,
+}
+
+#Tipos de evento, se guardan como enteros para que el formato binario sea compacto
+EV_SUMMARY = 0
+EV_CYCLE = 1
+EV_LOAD = 2
+EV_STORE = 3
+EV_WRITEBACK = 4
+EV_INTERRUPT = 5
+EV_ISR = 6
+EV_CACHE_READ_HIT = 7
+EV_CACHE_READ_MISS = 8
+EV_CACHE_WRITE_HIT = 9
+EV_CACHE_WRITE_MISS = 10
+EV_CACHE_WRITEBACK = 11
+
+#Nombre y campos de cada evento, se usan para el formato JSONL y para mostrar la traza
+EVENTS = {
+    EV_SUMMARY: ('summary', ('cycles', 'stalls', 'cache_hits', 'cache_misses', 'interrupts', 'instructions')),
+    EV_CYCLE: ('cycle', ('IF', 'ID', 'EX', 'MEM', 'WB', 'R0', 'R1', 'R2', 'R3', 'R4', 'R5', 'PC', 'Z')),
+    EV_LOAD: ('load', ('address', 'value')),
+    EV_STORE: ('store', ('address', 'value')),
+    EV_WRITEBACK: ('writeback', ('reg', 'value')),
+    EV_INTERRUPT: ('interrupt', ('saved_pc',)),
+    EV_ISR: ('isr', ('return_pc',)),
+    EV_CACHE_READ_HIT: ('cache_read_hit', ('address',)),
+    EV_CACHE_READ_MISS: ('cache_read_miss', ('address',)),
+    EV_CACHE_WRITE_HIT: ('cache_write_hit', ('address',)),
+    EV_CACHE_WRITE_MISS: ('cache_write_miss', ('address',)),
+    EV_CACHE_WRITEBACK: ('cache_writeback', ('address',)),
+}
+EVENT_KINDS = {name: kind for kind, (name, _) in EVENTS.items()}
+
+
+#Convierte un registro de traza (kind, cycle, args) en un diccionario legible
+def event_to_dict(record):
+    kind, cycle, args = record
+    name, fields = EVENTS[kind]
+    event = {'event': name, 'cycle': cycle}
+    event.update(zip(fields, args))
+    return event
+
+
+#Sink que guarda los ultimos eventos en memoria (buffer circular)
+class RingBufferSink:
+    def __init__(self, capacity=4096):
+        self.events = collections.deque(maxlen=capacity)
+
+    def write(self, record):
+        self.events.append(record)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def as_dicts(self):
+        return [event_to_dict(record) for record in self.events]
+
+
+#Sink que escribe un evento JSON por linea
+#json se importa recien aca: importar la CPU no paga el modulo si no se usa este sink
+class JsonlSink:
+    def __init__(self, path):
+        import json
+
+        self._dumps = json.dumps
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        self.file.write(self._dumps(event_to_dict(record)))
+        self.file.write('\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+#Formato binario: cabecera MAGIC y luego por evento (kind, nargs, cycle) seguido de nargs enteros
+BINARY_MAGIC = b'TRZ\x01'
+_RECORD_HEADER = struct.Struct('<BBq')
+
+
+#Sink que escribe la traza en el formato binario compacto
+class BinarySink:
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(BINARY_MAGIC)
+
+    def write(self, record):
+        kind, cycle, args = record
+        self.file.write(_RECORD_HEADER.pack(kind, len(args), cycle))
+        if args:
+            self.file.write(struct.pack(f'<{len(args)}q', *args))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+#Sink que muestra cada evento por consola, equivalente a los print() de antes
+class ConsoleSink:
+    def write(self, record):
+        event = event_to_dict(record)
+        name = event.pop('event')
+        cycle = event.pop('cycle')
+        print(f"[{cycle}] {name}: " + ", ".join(f"{k}={v}" for k, v in event.items()))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+#Lee una traza guardada en JSONL o en binario y devuelve la lista de registros (kind, cycle, args)
+def read_trace(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith(BINARY_MAGIC):
+        records = []
+        offset = len(BINARY_MAGIC)
+        while offset < len(data):
+            kind, nargs, cycle = _RECORD_HEADER.unpack_from(data, offset)
+            offset += _RECORD_HEADER.size
+            args = struct.unpack_from(f'<{nargs}q', data, offset)
+            offset += 8 * nargs
+            records.append((kind, cycle, args))
+        return records
+    import json
+
+    records = []
+    for line in data.decode('utf-8').splitlines():
+        if line:
+            event = json.loads(line)
+            kind = EVENT_KINDS[event['event']]
+            args = tuple(event[field] for field in EVENTS[kind][1])
+            records.append((kind, event['cycle'], args))
+    return records
+
+
+#Clase Tracer que reparte los eventos al sink segun el nivel configurado
+#Los componentes no consultan el nivel en cada evento: leen on_summary, on_event u on_cycle,
+#que valen None cuando ese nivel esta apagado, asi el camino rapido solo compara con None
+class Tracer:
+    def __init__(self, level=TRACE_EVENTS, sink=None):
+        self.level = level
+        self.sink = sink if sink is not None else RingBufferSink()
+        #Ciclo actual, lo actualiza la CPU para sellar los eventos de la caché
+        self.cycle = 0
+        self.on_summary = self.emit if level >= TRACE_SUMMARY else None
+        self.on_event = self.emit if level >= TRACE_EVENTS else None
+        self.on_cycle = self.emit if level >= TRACE_CYCLES else None
+
+    def emit(self, kind, *args):
+        self.sink.write((kind, self.cycle, args))
+
+    def flush(self):
+        self.sink.flush()
+
+    def close(self):
+        self.sink.close()
+
+
+#Crea un Tracer a partir de opciones simples (por ejemplo desde la linea de comandos)
+#Devuelve None si la traza queda apagada, que es el modo silencioso sin costo
+def make_tracer(level='off', sink='ring', path=None, capacity=4096):
+    if isinstance(level, str):
+        level = TRACE_LEVELS[level]
+    if level == TRACE_OFF or sink == 'none':
+        return None
+    if sink == 'ring':
+        return Tracer(level, RingBufferSink(capacity))
+    if sink == 'console':
+        return Tracer(level, ConsoleSink())
+    if path is None:
+        raise ValueError(f"El sink {sink} necesita una ruta de archivo")
+    if sink == 'jsonl':
+        return Tracer(level, JsonlSink(path))
+    if sink == 'binary':
+        return Tracer(level, BinarySink(path))
+    raise ValueError(f"Sink de traza desconocido: {sink}")
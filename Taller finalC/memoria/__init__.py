@@ -0,0 +1,35 @@
+import importlib
+
+#Paquete memoria: caches, jerarquia, coherencia y memoria principal
+#Como en el paquete cpu, los nombres se importan la primera vez que se usan
+
+_EXPORTS = {
+    'Cache': 'cache',
+    'MSHRFile': 'cache',
+    'CacheHierarchy': 'jerarquia',
+    'build_hierarchy': 'jerarquia',
+    'CoherentCache': 'coherencia',
+    'SnoopingBus': 'coherencia',
+    'DataMemory': 'principal',
+    'make_policy': 'reemplazo',
+    'make_prefetcher': 'prebusqueda',
+}
+
+_SUBMODULES = ('cache', 'coherencia', 'distancias', 'jerarquia', 'prebusqueda', 'principal', 'reemplazo')
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f"{__name__}.{_EXPORTS[name]}"), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
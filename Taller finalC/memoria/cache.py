@@ -1,63 +1,765 @@
+from cpu.traza import (EV_CACHE_READ_HIT, EV_CACHE_READ_MISS, EV_CACHE_WRITE_HIT, EV_CACHE_WRITE_MISS,
+                       EV_CACHE_WRITEBACK)
+from collections import OrderedDict, deque
+
+from memoria import prebusqueda, reemplazo
+
+
+#Funcion read_block que copia un bloque de la memoria principal para guardarlo en una linea
+#Acepta una lista simple o una DataMemory (memoria/principal.py), que puede estar sobre un mmap;
+#en ese caso el bloque se copia para que la linea no quede enlazada con la memoria
+def read_block(main_memory, start, size):
+    if type(main_memory) is list:
+        return main_memory[start:start + size]
+    return main_memory.read_block(start, size)
+
+
+#Funcion write_block que escribe un bloque completo en el nivel siguiente (memoria u otra cache)
+#values es None en las caches de solo tags: los valores ya estan en la memoria y solo se avisa
+#de los size palabras escritas a la cache de abajo (si hay una)
+def write_block(main_memory, start, values, size=None):
+    if type(main_memory) is list:
+        if values is not None:
+            main_memory[start:start + len(values)] = values
+    elif values is not None:
+        main_memory.write_block(start, values)
+    elif isinstance(main_memory, Cache):
+        main_memory.write_block(start, None, size)
+
+
+#Funcion backing_memory que devuelve la memoria al final de la jerarquia (debajo de la ultima cache)
+def backing_memory(main_memory):
+    while isinstance(main_memory, Cache):
+        main_memory = main_memory.next_level
+    return main_memory
+
+
+#Funcion memory_size que devuelve el tamaño de la memoria al final de la jerarquia
+#(el prefetcher no pide bloques que empiezan fuera de ella)
+def memory_size(main_memory):
+    return len(backing_memory(main_memory))
+
 #Clase CacheLine simula el comportamiento de una linea de cache
 class CacheLine:
     #Constructor de la clase cache que pasa por composicion
     #Valid: Indicador de datos validos en la linea de cache
     #tag: etiqueta para identificar a que bloque de memoria principal corresponde
-    #data: los datos que se guardan en cada linea 
+    #data: los datos que se guardan en cada linea (None en una cache de solo tags)
+    #dirty: la linea fue modificada y todavia no se copio al nivel siguiente (solo write-back)
     def __init__(self):
         self.valid = False
         self.tag = None
         self.data = None
+        self.dirty = False
         
 
-#Clase Cache que simula el funcionamiento de una memoria cache
+#Clase MSHRFile: registros de fallos pendientes (Miss Status Holding Registers) de una cache no bloqueante
+#Cada entrada es un bloque que se esta trayendo y el ciclo en que llega; un fallo al mismo bloque se
+#une a la entrada que ya existe y si todas estan ocupadas el pedido espera a que se libere la primera
+class MSHRFile:
+    def __init__(self, entries, block_size):
+        self.entries = entries
+        self.block_size = block_size
+        #bloque -> ciclo en que llega el dato
+        self.pending = {}
+        self.merged = 0
+        self.full_waits = 0
+
+    #Metodo request que registra un acceso de lectura hecho en el ciclo now con la latencia dada
+    #miss indica si fue un fallo (solo los fallos ocupan una entrada)
+    #Retorna el ciclo en que el dato esta disponible
+    def request(self, address, now, latency, miss):
+        pending = self.pending
+        block = address // self.block_size
+        ready = pending.get(block)
+        if ready is not None and ready > now:
+            # Fallo secundario: el bloque ya viene en camino
+            self.merged += 1
+            return max(ready, now + latency)
+        if not miss:
+            return now + latency
+        for old in [b for b, r in pending.items() if r <= now]:
+            del pending[old]
+        start = now
+        if len(pending) >= self.entries:
+            # Todas las entradas ocupadas: el pedido sale cuando se libera la primera
+            self.full_waits += 1
+            first = min(pending, key=pending.get)
+            start = pending.pop(first)
+        ready = start + latency
+        pending[block] = ready
+        return ready
+
+    def clear(self):
+        self.pending.clear()
+
+    def get_state(self):
+        return [[block, ready] for block, ready in self.pending.items()]
+
+    def set_state(self, state):
+        self.pending = {block: ready for block, ready in state}
+
+
+#Clase Cache que simula el funcionamiento de una memoria cache asociativa por conjuntos
+#Con associativity=1 es de mapeo directo (el comportamiento original) y con
+#associativity=num_lines es totalmente asociativa
 class Cache:
     #Constructor que recibe como parametros
     #num_lines: el numero de lineas de cache a simular
     #block_size: ek tamaño de cada bloque de cache
-    def __init__(self, num_lines, block_size):
+    #associativity: numero de vias (lineas) por conjunto
+    #replacement: politica de reemplazo ('lru', 'plru', 'fifo', 'random') o una clase de memoria/reemplazo.py
+    #tracer: Tracer opcional para registrar hits y misses (None = modo silencioso)
+    #seed: semilla de la politica aleatoria
+    #write_back: si es True los STORE quedan en la linea (dirty) y se copian al expulsarla;
+    #si es False la escritura es write-through, como la cache original
+    #write_allocate: si es True un STORE que falla trae el bloque a la cache antes de escribir
+    #name: nombre del nivel (L1D, L2...) usado en las metricas de la jerarquia
+    #hit_latency: ciclos extra de una lectura que acierta en este nivel (0 = se resuelve en la etapa MEM)
+    #miss_latency: ciclos extra de un fallo en este nivel, ademas de la latencia del nivel siguiente
+    #si es otra cache (en el ultimo nivel es la latencia de la memoria principal)
+    #mshrs: numero de fallos pendientes que puede tener la cache; 0 = cache bloqueante
+    #(un fallo detiene todo el pipeline), > 0 = no bloqueante (solo esperan las instrucciones
+    #que usan el dato); las escrituras no esperan (van por un buffer de escritura)
+    #prefetcher: 'next_line', 'stride', 'stream' o una clase de memoria/prebusqueda.py (None = sin prefetch)
+    #prefetch_degree / prefetch_distance: bloques pedidos por vez y a cuantos bloques (o pasos) por delante;
+    #prefetch_degree None usa el del prefetcher (1, y 4 para el stream buffer)
+    #write_buffer: entradas (bloques) del buffer de escritura con coalescencia, solo write-through (0 = sin buffer)
+    #victim_entries: bloques de la victim cache totalmente asociativa (0 = sin victim cache)
+    #victim_latency: ciclos extra de una lectura que encuentra su bloque en la victim cache
+    #tag_only: si es True las lineas solo llevan valid, tag, dirty y el reemplazo, sin copiar datos;
+    #los valores se leen y escriben en la memoria del final de la jerarquia (estudios de tiempo)
+    def __init__(self, num_lines, block_size, associativity=1, replacement='lru', tracer=None, seed=0,
+                 write_back=False, write_allocate=False, name='cache', hit_latency=0, miss_latency=0, mshrs=0,
+                 prefetcher=None, prefetch_degree=None, prefetch_distance=1, write_buffer=0, victim_entries=0,
+                 victim_latency=1, tag_only=False):
+        if associativity < 1 or num_lines % associativity:
+            raise ValueError(f"La asociatividad {associativity} debe dividir el número de líneas {num_lines}")
+        if write_buffer and write_back:
+            raise ValueError("El buffer de escritura es para cachés write-through")
         self.num_lines = num_lines
         self.block_size = block_size
+        self.associativity = associativity
+        self.num_sets = num_lines // associativity
+        self.write_back = write_back
+        self.write_allocate = write_allocate
+        self.name = name
+        self.seed = seed
+        self.hit_latency = hit_latency
+        self.miss_latency = miss_latency
+        self.mshr = MSHRFile(mshrs, block_size) if mshrs else None
+        #Latencia de la ultima lectura (read / read_block)
+        self.latency = 0
+        #Nivel siguiente (otra Cache o la memoria); lo fija la jerarquia cuando esta cache es L2 o L3
+        self.next_level = None
         #El self.lines genera lineas de cache en un rango de 1 hasta las lineas determinadas por la funcion
+        #Las lineas del conjunto s son lines[s * associativity : (s + 1) * associativity]
         self.lines = [CacheLine() for _ in range(num_lines)]
+        #Por conjunto, diccionario tag -> via, asi buscar un bloque cuesta O(1) con cualquier asociatividad
+        self.tags = [{} for _ in range(self.num_sets)]
+        #Por conjunto, vias todavia invalidas; se llenan antes de reemplazar
+        self.free_ways = [list(range(associativity - 1, -1, -1)) for _ in range(self.num_sets)]
+        self.policy = reemplazo.make_policy(replacement, self.num_sets, associativity, seed)
+        #En mapeo directo no hay nada que elegir, se evita llamar a la politica en cada hit
+        self._touch = self.policy.touch if associativity > 1 else None
+        #Modo solo tags: hits y misses son los mismos que con datos, pero ningun fallo copia un bloque
+        self.tag_only = tag_only
+        #Memoria recibida en el ultimo acceso y donde estan sus palabras (la lista o el array de la DataMemory
+        #del final de la jerarquia), asi un hit de solo tags lee el valor sin recorrer los niveles
+        self._memory = None
+        self._words = None
+        if tag_only:
+            self.read = self._tag_read
+            self.write = self._tag_write
+        #read y write sin prefetch ni victim cache, los usan los metodos que los reemplazan
+        self._cache_read = self.read
+        self._cache_write = self.write
+        self.prefetch_degree = prefetch_degree
+        self.prefetch_distance = prefetch_distance
+        self.prefetcher = None
+        #Bloques prebuscados que todavia no se usaron -> ciclo en que llegan
+        self._prefetched = {}
+        #Funcion que devuelve el ciclo actual, la fija la CPU (set_clock); sin reloj nada llega tarde
+        self.clock = None
+        if prefetcher is not None:
+            self.prefetcher = prebusqueda.make_prefetcher(prefetcher, block_size, prefetch_degree, prefetch_distance)
+            #Las lecturas con prefetch pasan por otro metodo, asi la cache sin prefetcher no paga nada extra
+            self.read = self._prefetching_read
+            self.write = self._prefetching_write
+        #Buffer de escritura: entradas [bloque, {offset: valor}] de la mas vieja a la mas nueva
+        #Las escrituras al mismo bloque se juntan en una entrada, que llega al nivel siguiente como una sola
+        #escritura; la entrada mas vieja sale cuando hace falta lugar. Con miss_latency y reloj cada salida
+        #ocupa al nivel siguiente miss_latency ciclos y un STORE que necesita lugar antes espera (write_stall)
+        self.write_buffer = write_buffer
+        self._buffer = deque()
+        #Nivel siguiente al que se vacia el buffer y ciclo en que termina de recibir la ultima entrada
+        self._buffer_memory = None
+        self._drain_done = 0
+        #Ciclos que tuvo que esperar el ultimo STORE porque el buffer estaba lleno
+        self.write_stall = 0
+        #Victim cache: bloque -> (data, dirty) de las lineas expulsadas, de la usada hace mas tiempo a la mas nueva
+        self.victim_entries = victim_entries
+        self.victim_latency = victim_latency
+        self.victim = OrderedDict() if victim_entries else None
+        self._shadow = None
+        if victim_entries:
+            #Cache totalmente asociativa LRU del mismo tamaño (solo tags) para separar los fallos de conflicto:
+            #un fallo es de conflicto si el bloque seguiria en ella
+            self._shadow = OrderedDict()
+            self._base_read = self.read
+            self.read = self._classifying_read
+        self.reset_stats()
+        self.set_tracer(tracer)
+
+    #Metodo reset_stats que pone en cero los contadores de esta cache
+    #hits y misses cuentan las lecturas (como antes); las escrituras tienen sus propios contadores
+    #writebacks: lineas sucias copiadas al nivel siguiente
+    #next_reads / next_writes: bloques leidos y escrituras enviadas al nivel siguiente (trafico)
+    #set_evictions: por conjunto, bloques validos reemplazados (conflictos); no esta en stats()
+    #Con prefetcher (no cuentan como hits ni misses):
+    #prefetches: bloques pedidos por el prefetcher al nivel siguiente
+    #prefetch_useful: bloques prebuscados que despues uso una lectura o escritura
+    #prefetch_late: de los utiles, los que se pidieron antes de que llegaran
+    #prefetch_unused: bloques prebuscados que salieron de la cache (o del buffer) sin usarse
+    #Con buffer de escritura: buffered_writes (STORE que entraron al buffer), coalesced_writes (los que se
+    #juntaron con una entrada del mismo bloque), buffer_forwards (fallos de lectura que tomaron datos del
+    #buffer), buffer_full_stalls / buffer_stall_cycles (STORE que esperaron con el buffer lleno y ciclos)
+    #Con victim cache: victim_hits (fallos atendidos por la victim cache), conflict_misses (lecturas que
+    #fallaron en las lineas por conflicto) y conflict_misses_removed (de esos, los que atrapo la victim cache)
+    def reset_stats(self):
         self.hits = 0
         self.misses = 0
+        self.write_hits = 0
+        self.write_misses = 0
+        self.writebacks = 0
+        self.next_reads = 0
+        self.next_writes = 0
+        self.set_evictions = [0] * self.num_sets
+        self.prefetches = 0
+        self.prefetch_useful = 0
+        self.prefetch_late = 0
+        self.prefetch_unused = 0
+        self.buffered_writes = 0
+        self.coalesced_writes = 0
+        self.buffer_forwards = 0
+        self.buffer_full_stalls = 0
+        self.buffer_stall_cycles = 0
+        self.victim_hits = 0
+        self.conflict_misses = 0
+        self.conflict_misses_removed = 0
+
+    #Metodo stats que devuelve los contadores como diccionario
+    def stats(self):
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'write_hits': self.write_hits,
+            'write_misses': self.write_misses,
+            'writebacks': self.writebacks,
+            'next_reads': self.next_reads,
+            'next_writes': self.next_writes,
+        }
+        if self.prefetcher is not None:
+            stats['prefetches'] = self.prefetches
+            stats['prefetch_useful'] = self.prefetch_useful
+            stats['prefetch_late'] = self.prefetch_late
+            stats['prefetch_unused'] = self.prefetch_unused
+        if self.write_buffer:
+            stats['buffered_writes'] = self.buffered_writes
+            stats['coalesced_writes'] = self.coalesced_writes
+            stats['buffer_forwards'] = self.buffer_forwards
+            stats['buffer_full_stalls'] = self.buffer_full_stalls
+            stats['buffer_stall_cycles'] = self.buffer_stall_cycles
+        if self.victim is not None:
+            stats['victim_hits'] = self.victim_hits
+            stats['conflict_misses'] = self.conflict_misses
+            stats['conflict_misses_removed'] = self.conflict_misses_removed
+        return stats
+
+    #Metodo prefetch_metrics que devuelve los contadores del prefetcher y las proporciones para ajustarlo:
+    #prefetch_accuracy: utiles / pedidos; prefetch_coverage: fallos evitados / fallos que habria sin prefetch;
+    #prefetch_lateness: de los utiles, cuantos llegaron tarde
+    def prefetch_metrics(self):
+        useful = self.prefetch_useful
+        return {
+            'prefetches': self.prefetches,
+            'prefetch_useful': useful,
+            'prefetch_late': self.prefetch_late,
+            'prefetch_unused': self.prefetch_unused,
+            'prefetch_accuracy': useful / self.prefetches if self.prefetches else 0.0,
+            'prefetch_coverage': useful / (useful + self.misses) if useful + self.misses else 0.0,
+            'prefetch_lateness': self.prefetch_late / useful if useful else 0.0,
+        }
+
+    #Indica si la cache tiene prefetcher
+    @property
+    def prefetching(self):
+        return self.prefetcher is not None
+
+    #Metodo buffer_metrics que devuelve los contadores del buffer de escritura y de la victim cache:
+    #memory_writes: escrituras que llegaron al nivel siguiente (cada entrada del buffer es una sola)
+    #write_coalescing: fraccion de los STORE que se juntaron en el buffer
+    #conflict_reduction: fraccion de los fallos de conflicto que atrapo la victim cache
+    def buffer_metrics(self):
+        metrics = {'memory_writes': self.next_writes}
+        if self.write_buffer:
+            metrics['buffered_writes'] = self.buffered_writes
+            metrics['coalesced_writes'] = self.coalesced_writes
+            metrics['write_coalescing'] = self.coalesced_writes / self.buffered_writes if self.buffered_writes else 0.0
+            metrics['buffer_forwards'] = self.buffer_forwards
+            metrics['buffer_full_stalls'] = self.buffer_full_stalls
+            metrics['buffer_stall_cycles'] = self.buffer_stall_cycles
+        if self.victim is not None:
+            conflicts = self.conflict_misses
+            metrics['victim_hits'] = self.victim_hits
+            metrics['conflict_misses'] = conflicts
+            metrics['conflict_misses_removed'] = self.conflict_misses_removed
+            metrics['conflict_reduction'] = self.conflict_misses_removed / conflicts if conflicts else 0.0
+        return metrics
+
+    #Indica si la cache tiene buffer de escritura o victim cache
+    @property
+    def buffering(self):
+        return bool(self.write_buffer) or self.victim is not None
+
+    #Metodo set_clock que le da a la cache el reloj de la CPU (una funcion que devuelve el ciclo actual)
+    def set_clock(self, clock):
+        self.clock = clock
+
+    #Metodo settle que termina todo lo que la cache tiene en camino: da por llegados los bloques prebuscados
+    #y vacia el buffer de escritura (la CPU lo llama cuando vuelve su contador de ciclos a 0, como con los MSHRs)
+    def settle(self):
+        for block in self._prefetched:
+            self._prefetched[block] = 0
+        if self.prefetcher is not None and self.prefetcher.buffered:
+            self.prefetcher.settle()
+        self.drain_writes()
+
+    #Metodo config que devuelve los parametros del constructor, para volver a crear una cache igual
+    #(la politica se guarda por nombre; una clase propia queda como None)
+    def config(self):
+        return {
+            'num_lines': self.num_lines,
+            'block_size': self.block_size,
+            'associativity': self.associativity,
+            'replacement': reemplazo.policy_name(self.policy),
+            'seed': self.seed,
+            'write_back': self.write_back,
+            'write_allocate': self.write_allocate,
+            'name': self.name,
+            'hit_latency': self.hit_latency,
+            'miss_latency': self.miss_latency,
+            'mshrs': self.mshr.entries if self.mshr is not None else 0,
+            'prefetcher': prebusqueda.prefetcher_name(self.prefetcher) if self.prefetcher is not None else None,
+            'prefetch_degree': self.prefetch_degree,
+            'prefetch_distance': self.prefetch_distance,
+            'write_buffer': self.write_buffer,
+            'victim_entries': self.victim_entries,
+            'victim_latency': self.victim_latency,
+            'tag_only': self.tag_only,
+        }
+
+    #Metodo get_state que devuelve el estado completo de la cache para un checkpoint (cpu/checkpoint.py)
+    #Retorna (meta, data): meta es un diccionario serializable con cada linea como
+    #[valid, tag, dirty, largo de data (-1 si no tiene)], las vias libres, la politica, los contadores
+    #y los reemplazos por conjunto;
+    #data son las palabras de todas las lineas con datos, una detras de otra
+    #(y despues las de la victim cache, si hay)
+    def get_state(self):
+        lines = []
+        data = []
+        for line in self.lines:
+            if line.data is None:
+                lines.append([int(line.valid), line.tag, int(line.dirty), -1])
+            else:
+                lines.append([int(line.valid), line.tag, int(line.dirty), len(line.data)])
+                data.extend(line.data)
+        meta = {
+            'lines': lines,
+            'free_ways': [list(free) for free in self.free_ways],
+            'policy': self.policy.get_state(),
+            'stats': self.stats(),
+            'set_evictions': list(self.set_evictions),
+            'mshr': self.mshr.get_state() if self.mshr is not None else None,
+        }
+        if self.prefetcher is not None:
+            meta['prefetch'] = {
+                'pending': [[block, ready] for block, ready in self._prefetched.items()],
+                'prefetcher': self.prefetcher.get_state(),
+            }
+        if self.write_buffer:
+            meta['write_buffer'] = {
+                'entries': [[block, [[offset, value] for offset, value in words.items()]] for block, words in self._buffer],
+                'drain_done': self._drain_done,
+            }
+        if self.victim is not None:
+            meta['victim'] = []
+            for block, (values, dirty) in self.victim.items():
+                meta['victim'].append([block, int(dirty), -1 if values is None else len(values)])
+                if values is not None:
+                    data.extend(values)
+            meta['shadow'] = list(self._shadow)
+        return meta, data
+
+    #Metodo set_state que carga un estado de get_state; data puede ser cualquier secuencia
+    #y offset indica desde donde leer las palabras de esta cache
+    #Retorna la posicion de data siguiente a la ultima palabra usada
+    def set_state(self, meta, data, offset=0):
+        if len(meta['lines']) != self.num_lines:
+            raise ValueError(f"El estado tiene {len(meta['lines'])} líneas y la caché {self.num_lines}")
+        self.tags = [{} for _ in range(self.num_sets)]
+        for index, (valid, tag, dirty, size) in enumerate(meta['lines']):
+            line = self.lines[index]
+            line.valid = bool(valid)
+            line.tag = tag
+            line.dirty = bool(dirty)
+            if size < 0:
+                line.data = None
+            else:
+                line.data = list(data[offset:offset + size])
+                offset += size
+            if line.valid:
+                self.tags[index // self.associativity][tag] = index % self.associativity
+        self.free_ways = [list(free) for free in meta['free_ways']]
+        self.policy.set_state(meta['policy'])
+        if self.mshr is not None:
+            self.mshr.set_state(meta['mshr'])
+        if self.prefetcher is not None and meta.get('prefetch') is not None:
+            self._prefetched = {block: ready for block, ready in meta['prefetch']['pending']}
+            self.prefetcher.set_state(meta['prefetch']['prefetcher'])
+        if self.write_buffer and meta.get('write_buffer') is not None:
+            self._buffer = deque([block, {offset: value for offset, value in words}]
+                                 for block, words in meta['write_buffer']['entries'])
+            self._drain_done = meta['write_buffer']['drain_done']
+            #El nivel siguiente no forma parte del estado: lo fija el proximo STORE o drain_writes
+            self._buffer_memory = None
+        if self.victim is not None and meta.get('victim') is not None:
+            self.victim = OrderedDict()
+            for block, dirty, size in meta['victim']:
+                values = None
+                if size >= 0:
+                    values = list(data[offset:offset + size])
+                    offset += size
+                self.victim[block] = (values, bool(dirty))
+            if meta.get('shadow') is not None:
+                self._shadow = OrderedDict.fromkeys(meta['shadow'])
+        for key, value in meta['stats'].items():
+            setattr(self, key, value)
+        #Estados anteriores no guardaban los reemplazos por conjunto
+        self.set_evictions = list(meta.get('set_evictions', [0] * self.num_sets))
+        return offset
+
+    #Indica si esta cache tiene alguna latencia distinta de cero
+    @property
+    def timed(self):
+        return bool(self.hit_latency or self.miss_latency)
+
+    #Metodo set_tracer que configura la traza de esta cache
+    #Si el tracer no registra eventos, _trace queda en None y el acceso no paga nada extra
+    def set_tracer(self, tracer):
+        self.tracer = tracer
+        self._trace = tracer.on_event if tracer is not None else None
+
+    #Metodo lookup que busca el bloque de una direccion
+    #Retorna la linea si esta en la cache o None si no esta
+    def lookup(self, address):
+        block = address // self.block_size
+        set_index = block % self.num_sets
+        way = self.tags[set_index].get(block // self.num_sets)
+        if way is None:
+            return None
+        return self.lines[set_index * self.associativity + way]
+
+    #Metodo allocate que elige una via del conjunto para el bloque (tag) y la deja lista
+    #Primero usa una via invalida y si no hay le pide la victima a la politica de reemplazo
+    #Si la victima esta sucia se copia antes a main_memory (el nivel siguiente)
+    def allocate(self, set_index, tag, main_memory=None):
+        free = self.free_ways[set_index]
+        tags = self.tags[set_index]
+        if free:
+            way = free.pop()
+        else:
+            way = self.policy.victim(set_index)
+            self.set_evictions[set_index] += 1
+        line = self.lines[set_index * self.associativity + way]
+        if line.valid:
+            if self.victim is not None:
+                self._to_victim(line, set_index, main_memory)
+            elif line.dirty:
+                self.evict(line, set_index, main_memory)
+            if self._prefetched and self._prefetched.pop(line.tag * self.num_sets + set_index, None) is not None:
+                self.prefetch_unused += 1
+            del tags[line.tag]
+        tags[tag] = way
+        self.policy.insert(set_index, way)
+        line.valid = True
+        line.tag = tag
+        return line
+
+    #Metodo evict que copia una linea sucia al nivel siguiente (write-back)
+    def evict(self, line, set_index, main_memory):
+        self._write_back(line.tag * self.num_sets + set_index, line.data, main_memory)
+        line.dirty = False
+
+    def _write_back(self, block, values, main_memory):
+        start = block * self.block_size
+        self.writebacks += 1
+        self.next_writes += 1
+        if self._trace is not None:
+            self._trace(EV_CACHE_WRITEBACK, start)
+        write_block(main_memory, start, values, self.block_size)
+
+    #Metodo _to_victim que guarda en la victim cache la linea que se esta por reemplazar
+    #Si la victim cache esta llena sale su bloque mas viejo (y se copia al nivel siguiente si esta sucio)
+    def _to_victim(self, line, set_index, main_memory):
+        victim = self.victim
+        if len(victim) >= self.victim_entries:
+            block, (values, dirty) = victim.popitem(last=False)
+            if dirty:
+                self._write_back(block, values, main_memory)
+        victim[line.tag * self.num_sets + set_index] = (line.data, line.dirty)
+        line.dirty = False
+
+    #Metodo _from_victim que pasa un bloque de la victim cache a una linea (la linea reemplazada toma su lugar)
+    def _from_victim(self, block, main_memory):
+        values, dirty = self.victim.pop(block)
+        line = self.allocate(block % self.num_sets, block // self.num_sets, main_memory)
+        line.data = values
+        line.dirty = dirty
+        self.victim_hits += 1
+        return line
+
+    #Metodo fill que trae a la cache el bloque que contiene address y devuelve su linea
+    def fill(self, set_index, tag, address, main_memory):
+        line = self.allocate(set_index, tag, main_memory)
+        start = address - address % self.block_size
+        self.next_reads += 1
+        line.data = self._read_next(main_memory, start)
+        return line
+
+    #Lee un bloque del nivel siguiente con las escrituras que todavia estan en el buffer encima
+    #En modo solo tags no copia nada: el pedido pasa por la cache de abajo (si hay) y retorna None
+    #counted=False copia los datos sin que la cache de abajo lo cuente como otro acceso
+    def _read_next(self, main_memory, start, counted=True):
+        if self.tag_only:
+            if counted and isinstance(main_memory, Cache):
+                main_memory.read_block(start, self.block_size)
+            if self._buffer:
+                block = start // self.block_size
+                self.buffer_forwards += any(entry[0] == block for entry in self._buffer)
+            return None
+        if not counted and isinstance(main_memory, Cache):
+            values = main_memory.peek_block(start, self.block_size)
+        else:
+            values = read_block(main_memory, start, self.block_size)
+        if self._buffer:
+            block = start // self.block_size
+            forwarded = False
+            for entry in self._buffer:
+                if entry[0] == block:
+                    for offset, value in entry[1].items():
+                        values[offset] = value
+                    forwarded = True
+            self.buffer_forwards += forwarded
+        return values
+
+    #Metodo _buffer_write que manda una escritura al nivel siguiente a traves del buffer de escritura
+    #En modo solo tags el valor va directo a la memoria y el buffer solo lleva la cuenta de las escrituras
+    def _buffer_write(self, address, value, main_memory):
+        if self.tag_only:
+            if main_memory is not self._memory:
+                self.bind_memory(main_memory)
+            self._words[address] = value
+        buffer = self._buffer
+        self._buffer_memory = main_memory
+        self.buffered_writes += 1
+        self.write_stall = 0
+        block = address // self.block_size
+        offset = address % self.block_size
+        #Se junta con la entrada mas nueva del mismo bloque
+        for index in range(len(buffer) - 1, -1, -1):
+            entry = buffer[index]
+            if entry[0] == block:
+                entry[1][offset] = value
+                self.coalesced_writes += 1
+                return
+        if len(buffer) >= self.write_buffer:
+            if self.miss_latency and self.clock is not None:
+                # La entrada mas vieja sale cuando el nivel siguiente termino de recibir la anterior;
+                # hasta entonces el STORE espera
+                now = self.clock()
+                if self._drain_done > now:
+                    self.write_stall = self._drain_done - now
+                    self.buffer_full_stalls += 1
+                    self.buffer_stall_cycles += self.write_stall
+                    now = self._drain_done
+                self._drain_done = now + self.miss_latency
+            self._drain_entry()
+        buffer.append([block, {offset: value}])
+
+    #Saca la entrada mas vieja del buffer y la escribe en el nivel siguiente (una escritura por entrada,
+    #un write_block por cada tramo de palabras seguidas)
+    def _drain_entry(self):
+        block, words = self._buffer.popleft()
+        self.next_writes += 1
+        start = block * self.block_size
+        offsets = sorted(words)
+        first = 0
+        for index in range(1, len(offsets) + 1):
+            if index == len(offsets) or offsets[index] != offsets[index - 1] + 1:
+                values = None if self.tag_only else [words[offset] for offset in offsets[first:index]]
+                write_block(self._buffer_memory, start + offsets[first], values, index - first)
+                first = index
+
+    #Metodo drain_writes que vacia todo el buffer de escritura en el nivel siguiente
+    #main_memory: el nivel siguiente si el buffer todavia no lo conoce (restaurado de un checkpoint
+    #sin ningun STORE despues); si no se pasa se usa next_level
+    def drain_writes(self, main_memory=None):
+        if self._buffer_memory is None:
+            self._buffer_memory = main_memory if main_memory is not None else self.next_level
+        while self._buffer:
+            self._drain_entry()
+        self._drain_done = 0
+
+    #Metodo invalidate que saca de la cache el bloque de una direccion (si esta)
+    #Si la linea esta sucia y se pasa main_memory, primero se copia al nivel siguiente
+    def invalidate(self, address, main_memory=None):
+        block = address // self.block_size
+        set_index = block % self.num_sets
+        way = self.tags[set_index].pop(block // self.num_sets, None)
+        if way is None:
+            if self.victim is not None and block in self.victim:
+                values, dirty = self.victim.pop(block)
+                if dirty and main_memory is not None:
+                    self._write_back(block, values, main_memory)
+                return True
+            return False
+        line = self.lines[set_index * self.associativity + way]
+        if line.dirty and main_memory is not None:
+            self.evict(line, set_index, main_memory)
+        if self._prefetched and self._prefetched.pop(block, None) is not None:
+            self.prefetch_unused += 1
+        line.valid = False
+        line.tag = None
+        line.data = None
+        line.dirty = False
+        self.free_ways[set_index].append(way)
+        return True
+
+    #Metodo invalidate_range que saca de la cache todos los bloques de [start, start + size)
+    #Lo usa el DMA antes de escribir en memoria; retorna cuantas lineas invalido
+    #Antes se vacia el buffer de escritura, asi los STORE anteriores no pisan lo que escribe el DMA
+    def invalidate_range(self, start, size, main_memory=None):
+        if main_memory is None:
+            main_memory = self.next_level
+        self.drain_writes(main_memory)
+        count = 0
+        address = start - start % self.block_size
+        while address < start + size:
+            count += self.invalidate(address, main_memory)
+            address += self.block_size
+        return count
+
+    #Metodo flush que copia al nivel siguiente todas las lineas sucias (quedan validas y limpias),
+    #los bloques sucios de la victim cache y lo que quede en el buffer de escritura
+    def flush(self, main_memory=None):
+        if main_memory is None:
+            main_memory = self.next_level
+        for index, line in enumerate(self.lines):
+            if line.valid and line.dirty:
+                self.evict(line, index // self.associativity, main_memory)
+        if self.victim:
+            for block, (values, dirty) in self.victim.items():
+                if dirty:
+                    self._write_back(block, values, main_memory)
+                    self.victim[block] = (values, False)
+        self.drain_writes(main_memory)
+
+    #Metodo clear que vacia la cache: las lineas sucias se copian antes a main_memory
+    #(o al nivel siguiente) y todas quedan invalidas, como una cache recien encendida
+    def clear(self, main_memory=None):
+        if main_memory is None:
+            main_memory = self.next_level
+        for index, line in enumerate(self.lines):
+            if line.valid:
+                set_index = index // self.associativity
+                self.invalidate((line.tag * self.num_sets + set_index) * self.block_size, main_memory)
+        if self.victim:
+            for block in list(self.victim):
+                self.invalidate(block * self.block_size, main_memory)
+        self.drain_writes(main_memory)
+
+    #Metodo fetch que simula la busqueda de una instruccion (cache de instrucciones)
+    #Solo se llevan los tags: las instrucciones vienen del programa, no de la memoria de datos
+    #Retorna True si fue hit; en un miss el bloque se pide tambien al nivel siguiente si es una cache
+    def fetch(self, address):
+        block = address // self.block_size
+        set_index = block % self.num_sets
+        tag = block // self.num_sets
+        way = self.tags[set_index].get(tag)
+        if way is not None:
+            self.hits += 1
+            if self._touch is not None:
+                self._touch(set_index, way)
+            return True
+        if self.victim is not None and block in self.victim:
+            self.hits += 1
+            self._from_victim(block, self.next_level)
+            return True
+        self.misses += 1
+        line = self.allocate(set_index, tag, self.next_level)
+        line.data = None
+        if isinstance(self.next_level, Cache):
+            self.next_reads += 1
+            self.next_level.fetch(address)
+        return False
 
     #Metodo read que simula la lectura de datos desde la cache 
     #Recibe como parametros:
     #Adress es la direccion en memoria que se quiere leer
     #main_memory es la memoria principal como la lista o el arreglo a trabajar 
-    def read(self, address, main_memory):
-        #Por medio de esta operacion se calcula el indice donde esta el bloque de memoria solicitado 
-        line_index = (address // self.block_size) % self.num_lines
+    #(o el siguiente nivel de cache dentro de una jerarquia)
+    #pc: instruccion que hace la lectura, la usa el prefetcher por pasos (None si no se conoce)
+    def read(self, address, main_memory, pc=None):
+        #Por medio de esta operacion se calcula el bloque y el conjunto donde puede estar la direccion
+        block = address // self.block_size
+        set_index = block % self.num_sets
         #Calcula la etiqueta tag asociada a la direccion, ayuda a comprobar si el bloque corresponde a la direccion solicitada
-        tag = address // (self.block_size * self.num_lines)
-        #Accede a la linea por medio del indice que ya ha sido calculado 
-        line = self.lines[line_index]
-        #Por medio del selector se verigica si la linea de cache es valida y el tag coincide
-        if line.valid and line.tag == tag:
+        tag = block // self.num_sets
+        #Busca la via del conjunto que tiene ese tag
+        way = self.tags[set_index].get(tag)
+        #Offset es la posicion exacta del dato dentro de un bloque 
+        offset = address % self.block_size
+        if way is not None:
             self.hits += 1
+            self.latency = self.hit_latency
             # Cache hit (Acierto) si hace este hit eso significa que el dato ya esta en la cache 
-            print("Cache hit!")
-            #Offset es la posicion exacta del dato dentro de un bloque 
-            offset = address % self.block_size
+            if self._touch is not None:
+                self._touch(set_index, way)
+            if self._trace is not None:
+                self._trace(EV_CACHE_READ_HIT, address)
             #Retorna el dato de la posicion obetnida en el offset
-            return line.data[offset]
+            return self.lines[set_index * self.associativity + way].data[offset]
+        elif self.victim is not None and block in self.victim:
+            # El bloque estaba en la victim cache: vuelve a una linea y cuenta como hit
+            self.hits += 1
+            self.latency = self.hit_latency + self.victim_latency
+            if self._trace is not None:
+                self._trace(EV_CACHE_READ_HIT, address)
+            return self._from_victim(block, main_memory).data[offset]
         else:
             self.misses += 1
             #Si hay un fallo en cargar el dato de la memoria cache, carga el bloque completo 
             # Cache miss: cargar bloque desde memoria principal
-            print("Cache miss, cargando bloque...")
-            # Se marca la linea como valida
-            line.valid = True
-            # se actualiza la etiqueta tag
-            line.tag = tag
-            # Se calcula el inicio del bloque en la memoria principal
-            start = address - (address % self.block_size)
-            # Se carga el bloque desde la memoria principal
-            line.data = main_memory[start:start + self.block_size]
-            # Se calcula el offset y se retorna el dato
-            offset = address % self.block_size
+            if self._trace is not None:
+                self._trace(EV_CACHE_READ_MISS, address)
+            # Se elige la linea (via) donde va el bloque y se carga desde el nivel siguiente
+            line = self.fill(set_index, tag, address, main_memory)
+            # Latencia del fallo: la de este nivel mas la del nivel siguiente si es otra cache
+            self.latency = self.hit_latency + self.miss_latency
+            if isinstance(main_memory, Cache):
+                self.latency += main_memory.latency
+            # Se retorna el dato
             return line.data[offset]
     #Metodo write que simula la escritura de los datos en la memoria cache 
     #Recibe como parametros:
@@ -65,26 +767,344 @@ class Cache:
     #Value: que es el valor o cantidad de dato con el que se va a llenar esa posicion
     #main_memory: Este es lo que simula la memoria principal o donde se guarda todo lo de la cache
     def write(self, address, value, main_memory):
-        #Determina en que linea de cache esta el bloque a modificar
-        line_index = (address // self.block_size) % self.num_lines
-        #Calcula la etiqueta asosidad a ese bloque de memoria
-        tag = address // (self.block_size * self.num_lines)
-        #Accede a la linea correspondiente
-        line = self.lines[line_index]
-        #Comprueba si la linea de cache es valida y si la etiqueta conincide
-        if line.valid and line.tag == tag:
-            # Cache hit: escribir en caché y memoria principal (write-through)
-            #El offset permite saber la posicion dentro del bloque
-            offset = address % self.block_size
-            #Escribe un dato en la linea de cache 
-            line.data[offset] = value
-            #Escribe el dato en la memoria principal
-            main_memory[address] = value
-            #Mensajes de debug
-            print("Cache hit: escribiendo dato.")
+        #Determina en que conjunto puede estar el bloque a modificar
+        block = address // self.block_size
+        set_index = block % self.num_sets
+        tag = block // self.num_sets
+        #Busca la via con la etiqueta asociada a ese bloque de memoria
+        way = self.tags[set_index].get(tag)
+        #El offset permite saber la posicion dentro del bloque
+        offset = address % self.block_size
+        #Comprueba si el bloque esta en la cache
+        if way is not None:
+            self.write_hits += 1
+            if self._touch is not None:
+                self._touch(set_index, way)
+            line = self.lines[set_index * self.associativity + way]
+            #Evento de traza
+            if self._trace is not None:
+                self._trace(EV_CACHE_WRITE_HIT, address)
+        elif self.victim is not None and block in self.victim:
+            self.write_hits += 1
+            line = self._from_victim(block, main_memory)
+            if self._trace is not None:
+                self._trace(EV_CACHE_WRITE_HIT, address)
+        elif self.write_allocate:
+            # Cache miss con write-allocate: se trae el bloque y se escribe en la linea
+            self.write_misses += 1
+            if self._trace is not None:
+                self._trace(EV_CACHE_WRITE_MISS, address)
+            line = self.fill(set_index, tag, address, main_memory)
         else:
             # Cache miss: escribir directamente en memoria principal
             #Si ni hubo acceso a la memoria solo se esribe el valor en la memoria principal 
+            self.write_misses += 1
+            if self.write_buffer:
+                self._buffer_write(address, value, main_memory)
+            else:
+                self.next_writes += 1
+                main_memory[address] = value
+            #Evento de traza
+            if self._trace is not None:
+                self._trace(EV_CACHE_WRITE_MISS, address)
+            return
+        #Escribe un dato en la linea de cache 
+        line.data[offset] = value
+        if self.write_back:
+            # Write-back: el dato queda solo en la cache hasta que se expulse la linea
+            line.dirty = True
+        else:
+            # Write-through: escribir tambien en el nivel siguiente (o en el buffer de escritura)
+            if self.write_buffer:
+                self._buffer_write(address, value, main_memory)
+            else:
+                self.next_writes += 1
+                main_memory[address] = value
+
+    #Metodo _tag_read: read de una cache de solo tags (reemplaza a read en el constructor)
+    #Actualiza tags, reemplazo, contadores y latencia igual que read, pero el valor sale de la memoria
+    #del final de la jerarquia, que en este modo siempre esta al dia
+    def _tag_read(self, address, main_memory, pc=None):
+        block = address // self.block_size
+        set_index = block % self.num_sets
+        tag = block // self.num_sets
+        way = self.tags[set_index].get(tag)
+        if way is not None:
+            self.hits += 1
+            self.latency = self.hit_latency
+            if self._touch is not None:
+                self._touch(set_index, way)
+            if self._trace is not None:
+                self._trace(EV_CACHE_READ_HIT, address)
+        elif self.victim is not None and block in self.victim:
+            self.hits += 1
+            self.latency = self.hit_latency + self.victim_latency
+            if self._trace is not None:
+                self._trace(EV_CACHE_READ_HIT, address)
+            self._from_victim(block, main_memory)
+        else:
+            self.misses += 1
+            if self._trace is not None:
+                self._trace(EV_CACHE_READ_MISS, address)
+            # Como fill, pero sin datos solo hace falta avisar a la cache de abajo y al buffer
+            self.allocate(set_index, tag, main_memory)
+            self.next_reads += 1
+            if self._buffer or isinstance(main_memory, Cache):
+                self._read_next(main_memory, block * self.block_size)
+            self.latency = self.hit_latency + self.miss_latency
+            if isinstance(main_memory, Cache):
+                self.latency += main_memory.latency
+        if main_memory is not self._memory:
+            self.bind_memory(main_memory)
+        return self._words[address]
+
+    #Metodo _tag_write: write de una cache de solo tags (reemplaza a write en el constructor)
+    #Con write-back el valor va directo a la memoria y la linea queda sucia solo para contar el writeback;
+    #con write-through baja por el nivel siguiente como en write
+    def _tag_write(self, address, value, main_memory):
+        block = address // self.block_size
+        set_index = block % self.num_sets
+        tag = block // self.num_sets
+        way = self.tags[set_index].get(tag)
+        if way is not None:
+            self.write_hits += 1
+            if self._touch is not None:
+                self._touch(set_index, way)
+            line = self.lines[set_index * self.associativity + way]
+            if self._trace is not None:
+                self._trace(EV_CACHE_WRITE_HIT, address)
+        elif self.victim is not None and block in self.victim:
+            self.write_hits += 1
+            line = self._from_victim(block, main_memory)
+            if self._trace is not None:
+                self._trace(EV_CACHE_WRITE_HIT, address)
+        elif self.write_allocate:
+            self.write_misses += 1
+            if self._trace is not None:
+                self._trace(EV_CACHE_WRITE_MISS, address)
+            line = self.fill(set_index, tag, address, main_memory)
+        else:
+            self.write_misses += 1
+            if self.write_buffer:
+                self._buffer_write(address, value, main_memory)
+            else:
+                self.next_writes += 1
+                main_memory[address] = value
+            if self._trace is not None:
+                self._trace(EV_CACHE_WRITE_MISS, address)
+            return
+        if self.write_back:
+            line.dirty = True
+            if main_memory is not self._memory:
+                self.bind_memory(main_memory)
+            self._words[address] = value
+        elif self.write_buffer:
+            self._buffer_write(address, value, main_memory)
+        else:
+            self.next_writes += 1
             main_memory[address] = value
-            #Mensajes de debug
-            print("Cache miss: escribiendo solo en memoria principal.")
+
+    #Metodo bind_memory que recuerda la memoria main_memory y las palabras de la memoria del final de la
+    #jerarquia (modo solo tags); con None se olvida, la jerarquia lo hace al volver a conectar los niveles
+    def bind_memory(self, main_memory):
+        self._memory = main_memory
+        if main_memory is None:
+            self._words = None
+        else:
+            memory = backing_memory(main_memory)
+            self._words = getattr(memory, 'words', memory)
+
+    #Metodo _prefetching_read: read de una cache con prefetcher (reemplaza a read en el constructor)
+    #Una lectura que acierta en un bloque prebuscado es un hit y el prefetch cuenta como util; si el
+    #bloque todavia no llego, la latencia es la del hit mas lo que le falta. Con stream buffer, un fallo
+    #cuyo bloque esta en el buffer lo pasa a la cache y tambien es un hit
+    def _prefetching_read(self, address, main_memory, pc=None):
+        prefetcher = self.prefetcher
+        block = address // self.block_size
+        set_index = block % self.num_sets
+        tag = block // self.num_sets
+        now = self.clock() if self.clock is not None else 0
+        present = tag in self.tags[set_index]
+        ready = None
+        if present:
+            ready = self._prefetched.pop(block, None)
+        elif prefetcher.buffered and (self.victim is None or block not in self.victim):
+            ready = prefetcher.take(block)
+            if ready is not None:
+                #El bloque ya se pidio (y se conto) al prebuscarlo: aca solo se copian sus datos
+                line = self.allocate(set_index, tag, main_memory)
+                line.data = self._read_next(main_memory, block * self.block_size, counted=False)
+        value = self._cache_read(address, main_memory)
+        if ready is not None:
+            self.prefetch_useful += 1
+            if ready > now:
+                self.prefetch_late += 1
+                self.latency = self.hit_latency + ready - now
+        blocks = prefetcher.access(address, pc, not present or ready is not None)
+        if blocks:
+            self._prefetch(blocks, main_memory, now)
+        if prefetcher.buffered and prefetcher.dropped:
+            self.prefetch_unused += prefetcher.dropped
+            prefetcher.dropped = 0
+        return value
+
+    #Metodo _prefetching_write: write de una cache con prefetcher; escribir en un bloque prebuscado
+    #tambien cuenta como uso
+    def _prefetching_write(self, address, value, main_memory):
+        if self._prefetched and self._prefetched.pop(address // self.block_size, None) is not None:
+            self.prefetch_useful += 1
+        self._cache_write(address, value, main_memory)
+
+    #Metodo _prefetch que trae los bloques que pidio el prefetcher y que no estan en la cache
+    #Cada uno es una lectura al nivel siguiente y llega despues de la latencia de un fallo;
+    #no cuentan como hits ni misses de esta cache
+    def _prefetch(self, blocks, main_memory, now):
+        buffered = self.prefetcher.buffered
+        size = memory_size(main_memory)
+        for block in blocks:
+            start = block * self.block_size
+            set_index = block % self.num_sets
+            tag = block // self.num_sets
+            if block < 0 or start >= size or tag in self.tags[set_index]:
+                continue
+            if self.victim is not None and block in self.victim:
+                continue
+            self.prefetches += 1
+            self.next_reads += 1
+            if not buffered:
+                line = self.allocate(set_index, tag, main_memory)
+                line.data = self._read_next(main_memory, start)
+            elif isinstance(main_memory, Cache):
+                # El buffer no guarda datos (se leen al pasar el bloque a la cache), pero el pedido
+                # igual pasa por el nivel siguiente
+                main_memory.read_block(start, self.block_size)
+            ready = 0
+            if self.clock is not None:
+                ready = now + self.miss_latency
+                if isinstance(main_memory, Cache):
+                    ready += main_memory.latency
+            if buffered:
+                self.prefetcher.insert(block, ready)
+            else:
+                self._prefetched[block] = ready
+
+    #Metodo _classifying_read: read de una cache con victim cache (reemplaza a read en el constructor)
+    #Ademas de leer, cuenta los fallos de conflicto de las lineas: los de bloques que todavia estarian
+    #en una cache totalmente asociativa LRU del mismo tamaño
+    def _classifying_read(self, address, main_memory, pc=None):
+        block = address // self.block_size
+        shadow = self._shadow
+        conflict = block in shadow
+        if conflict:
+            shadow.move_to_end(block)
+        else:
+            shadow[block] = None
+            if len(shadow) > self.num_lines:
+                shadow.popitem(last=False)
+        misses = self.misses
+        victim_hits = self.victim_hits
+        value = self._base_read(address, main_memory, pc)
+        if conflict:
+            if self.victim_hits != victim_hits:
+                self.conflict_misses += 1
+                self.conflict_misses_removed += 1
+            elif self.misses != misses:
+                self.conflict_misses += 1
+        return value
+
+    #Los siguientes metodos permiten usar esta cache como "memoria" del nivel de arriba (L1 -> L2 -> L3)
+    #Cada acceso pasa por read/write de este nivel usando next_level como su memoria
+
+    #Metodo read_block que entrega un bloque al nivel superior (un acceso de lectura por bloque propio)
+    #En modo solo tags solo hace los accesos y retorna None
+    def read_block(self, start, size):
+        values = None if self.tag_only else []
+        end = start + size
+        address = start
+        latency = 0
+        while address < end:
+            block_start = address - address % self.block_size
+            block_end = min(end, block_start + self.block_size)
+            self.read(address, self.next_level)
+            latency = max(latency, self.latency)
+            if values is not None:
+                line = self.lookup(address)
+                values.extend(line.data[address - block_start:block_end - block_start])
+            address = block_end
+        self.latency = latency
+        return values
+
+    #Metodo peek_block que devuelve las palabras actuales de size direcciones desde start sin
+    #contar un acceso ni cambiar el estado: de la linea si esta, si no de la victim cache, y si no
+    #del nivel siguiente con las escrituras del buffer encima. Retorna None en modo solo tags
+    def peek_block(self, start, size):
+        if self.tag_only:
+            return None
+        values = []
+        end = start + size
+        address = start
+        while address < end:
+            block = address // self.block_size
+            block_start = block * self.block_size
+            block_end = min(end, block_start + self.block_size)
+            line = self.lookup(address)
+            if line is not None:
+                words = line.data[address - block_start:block_end - block_start]
+            elif self.victim is not None and block in self.victim:
+                words = self.victim[block][0][address - block_start:block_end - block_start]
+            else:
+                if isinstance(self.next_level, Cache):
+                    words = self.next_level.peek_block(address, block_end - address)
+                else:
+                    words = read_block(self.next_level, address, block_end - address)
+                for entry in self._buffer:
+                    if entry[0] == block:
+                        for offset, value in entry[1].items():
+                            if address <= block_start + offset < block_end:
+                                words[block_start + offset - address] = value
+            values.extend(words)
+            address = block_end
+        return values
+
+    #Metodo write_block que recibe una linea sucia expulsada del nivel superior
+    #Va directo al nivel siguiente, asi que antes se vacia el buffer de escritura para no pisarla despues
+    #values es None si el nivel superior es de solo tags; entonces size dice cuantas palabras son
+    def write_block(self, start, values, size=None):
+        if self._buffer:
+            self.drain_writes()
+        end = start + (len(values) if values is not None else size)
+        address = start
+        while address < end:
+            block_start = address - address % self.block_size
+            block_end = min(end, block_start + self.block_size)
+            chunk = values[address - start:block_end - start] if values is not None else None
+            line = self.lookup(address)
+            block = address // self.block_size
+            if line is None and self.victim is not None and block in self.victim:
+                self.write_hits += 1
+                line = self._from_victim(block, self.next_level)
+            elif line is None and self.write_allocate:
+                self.write_misses += 1
+                line = self.fill(block % self.num_sets, block // self.num_sets, address, self.next_level)
+            elif line is not None:
+                self.write_hits += 1
+            else:
+                self.write_misses += 1
+            if line is None:
+                self.next_writes += 1
+                write_block(self.next_level, address, chunk, block_end - address)
+            else:
+                if chunk is not None:
+                    line.data[address - block_start:block_end - block_start] = chunk
+                if self.write_back:
+                    line.dirty = True
+                else:
+                    self.next_writes += 1
+                    write_block(self.next_level, address, chunk, block_end - address)
+            address = block_end
+
+    def __getitem__(self, address):
+        return self.read(address, self.next_level)
+
+    def __setitem__(self, address, value):
+        self.write(address, value, self.next_level)
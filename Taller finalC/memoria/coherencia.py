@@ -0,0 +1,203 @@
+from memoria.cache import Cache
+
+#Coherencia de caches para varios nucleos (cpu/multinucleo.py): cada nucleo tiene su L1 privada
+#(CoherentCache) y todas comparten la memoria de datos a traves de un bus con snooping (SnoopingBus)
+#
+#Estados de una linea (se derivan de los bits de la linea, no se guardan aparte):
+#  M (modificada): valid y dirty, es la unica copia y la memoria esta vieja
+#  E (exclusiva, solo MESI): valid, limpia y ninguna otra cache tiene el bloque
+#  S (compartida): valid y limpia, puede haber otras copias
+#  I (invalida): no esta en la cache
+#Transacciones del bus:
+#  BusRd: fallo de lectura; la que tiene el bloque en M lo copia a memoria (flush) y todas pasan a S
+#  BusRdX: fallo de escritura; las demas copias se invalidan (M hace flush antes)
+#  BusUpgr: escritura sobre una linea en S; se invalidan las demas copias sin traer el bloque
+#Con MESI un fallo de lectura sin otras copias deja la linea en E y la primera escritura no usa el bus
+#Los accesos son atomicos: el bus atiende una transaccion por vez, en el orden en que los nucleos la piden
+
+PROTOCOLS = ('msi', 'mesi')
+
+
+#Clase SnoopingBus: bus compartido que lleva las transacciones de coherencia entre las caches
+#memory: la memoria de datos compartida
+#El bus guarda, por bloque, que caches pueden tenerlo (filtro de snoop) y solo le pregunta a esas;
+#el filtro puede quedar con caches que ya expulsaron el bloque y se corrige al hacer snoop
+class SnoopingBus:
+    def __init__(self, memory, protocol='mesi'):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Protocolo de coherencia desconocido: {protocol}")
+        self.memory = memory
+        self.protocol = protocol
+        self.mesi = protocol == 'mesi'
+        self.caches = []
+        #bloque -> mascara de bits de las caches que pueden tenerlo
+        self.holders = {}
+        self.reset_stats()
+
+    #Metodo reset_stats que pone en cero los contadores de trafico
+    #reads / read_exclusive / upgrades: transacciones BusRd, BusRdX y BusUpgr
+    #invalidations: copias invalidadas en otras caches; flushes: bloques en M copiados a memoria por un snoop
+    #snoops: caches consultadas (con el filtro son muchas menos que transacciones por nucleos)
+    def reset_stats(self):
+        self.reads = 0
+        self.read_exclusive = 0
+        self.upgrades = 0
+        self.invalidations = 0
+        self.flushes = 0
+        self.snoops = 0
+
+    def stats(self):
+        return {
+            'bus_transactions': self.reads + self.read_exclusive + self.upgrades,
+            'bus_reads': self.reads,
+            'bus_read_exclusive': self.read_exclusive,
+            'bus_upgrades': self.upgrades,
+            'invalidations': self.invalidations,
+            'flushes': self.flushes,
+            'snoops': self.snoops,
+        }
+
+    #Metodo attach que conecta una cache y devuelve su numero
+    def attach(self, cache):
+        self.caches.append(cache)
+        return len(self.caches) - 1
+
+    #Manda la transaccion del bloque a las demas caches que lo pueden tener
+    #Retorna True si alguna tenia el bloque
+    def _snoop(self, requester, block, exclusive):
+        holders = self.holders.get(block, 0) & ~(1 << requester.core)
+        shared = False
+        remaining = 0
+        index = 0
+        while holders:
+            if holders & 1:
+                self.snoops += 1
+                if self.caches[index].snoop(block, exclusive):
+                    shared = True
+                    if not exclusive:
+                        remaining |= 1 << index
+            holders >>= 1
+            index += 1
+        self.holders[block] = remaining | 1 << requester.core
+        return shared
+
+    #Metodo read_miss que hace un BusRd; retorna True si otra cache queda con una copia
+    def read_miss(self, cache, block):
+        self.reads += 1
+        return self._snoop(cache, block, False)
+
+    #Metodo write_miss que hace un BusRdX (fallo de escritura)
+    def write_miss(self, cache, block):
+        self.read_exclusive += 1
+        self._snoop(cache, block, True)
+
+    #Metodo upgrade que hace un BusUpgr (escritura sobre una copia compartida)
+    def upgrade(self, cache, block):
+        self.upgrades += 1
+        self._snoop(cache, block, True)
+
+    #Metodo read_word que lee una palabra con el valor coherente (la copia en M si hay una)
+    def read_word(self, address):
+        for cache in self.caches:
+            line = cache.lookup(address)
+            if line is not None and line.dirty:
+                return line.data[address % cache.block_size]
+        return self.memory[address]
+
+    #Metodo flush que copia a memoria todas las lineas en M de todas las caches (quedan en S o E)
+    def flush(self):
+        for cache in self.caches:
+            cache.flush(self.memory)
+
+
+#Clase CoherentCache: cache privada de un nucleo que mantiene la coherencia a traves del bus
+#Es siempre write-back con write-allocate (las escrituras tienen que tener la linea en M)
+#Recibe los mismos parametros que Cache (asociatividad, reemplazo, latencias, MSHRs...) salvo el
+#prefetcher y la victim cache (sus bloques entrarian o saldrian de la cache sin pasar por el bus) y el
+#modo solo tags (read_word lee la copia en M de la linea)
+class CoherentCache(Cache):
+    def __init__(self, bus, num_lines=16, block_size=8, associativity=1, replacement='lru', name=None, **options):
+        if options.get('prefetcher') is not None:
+            raise ValueError("La caché coherente no admite prefetcher")
+        if options.get('victim_entries'):
+            raise ValueError("La caché coherente no admite victim cache")
+        if options.get('tag_only'):
+            raise ValueError("La caché coherente necesita los datos en las líneas")
+        super().__init__(num_lines, block_size, associativity, replacement, write_back=True,
+                         write_allocate=True, **options)
+        self.bus = bus
+        self.core = bus.attach(self)
+        self.name = name or f"L1D{self.core}"
+        #Bit E de cada linea (solo MESI)
+        for line in self.lines:
+            line.exclusive = False
+        #Bloques que invalido otro nucleo, para separar los fallos de coherencia de los demas
+        self._invalidated = set()
+
+    #Ademas de los contadores de Cache:
+    #invalidations: lineas de esta cache invalidadas por escrituras de otros nucleos
+    #coherence_misses: fallos en bloques que estaban en esta cache hasta que otro nucleo los invalido
+    #upgrades: escrituras que pidieron un BusUpgr
+    def reset_stats(self):
+        super().reset_stats()
+        self.invalidations = 0
+        self.coherence_misses = 0
+        self.upgrades = 0
+
+    def stats(self):
+        stats = super().stats()
+        stats['invalidations'] = self.invalidations
+        stats['coherence_misses'] = self.coherence_misses
+        stats['upgrades'] = self.upgrades
+        return stats
+
+    def _miss(self, block):
+        if block in self._invalidated:
+            self._invalidated.discard(block)
+            self.coherence_misses += 1
+
+    def read(self, address, main_memory, pc=None):
+        block = address // self.block_size
+        if self.tags[block % self.num_sets].get(block // self.num_sets) is not None:
+            return super().read(address, main_memory)
+        self._miss(block)
+        shared = self.bus.read_miss(self, block)
+        value = super().read(address, main_memory)
+        self.lookup(address).exclusive = self.bus.mesi and not shared
+        return value
+
+    def write(self, address, value, main_memory):
+        block = address // self.block_size
+        line = self.lookup(address)
+        if line is None:
+            self._miss(block)
+            self.bus.write_miss(self, block)
+        elif not line.dirty:
+            if line.exclusive:
+                # E -> M sin usar el bus
+                line.exclusive = False
+            else:
+                self.upgrades += 1
+                self.bus.upgrade(self, block)
+        super().write(address, value, main_memory)
+
+    #Metodo snoop que atiende una transaccion de otro nucleo sobre el bloque
+    #exclusive: True para BusRdX / BusUpgr (invalidar), False para BusRd (pasar a S)
+    #Retorna True si la cache tenia el bloque
+    def snoop(self, block, exclusive):
+        address = block * self.block_size
+        line = self.lookup(address)
+        if line is None:
+            return False
+        if line.dirty:
+            self.bus.flushes += 1
+            self.evict(line, block % self.num_sets, self.bus.memory)
+        if exclusive:
+            self.invalidate(address)
+            line.exclusive = False
+            self.invalidations += 1
+            self.bus.invalidations += 1
+            self._invalidated.add(block)
+        else:
+            line.exclusive = False
+        return True
@@ -0,0 +1,200 @@
+#Analisis de caches por distancias de pila (stack distances / reuse distances) de Mattson
+#En una cache LRU con S conjuntos y A vias, un acceso es hit si y solo si entre ese acceso y el
+#anterior al mismo bloque se usaron menos de A bloques distintos del mismo conjunto.
+#Calculando esa distancia una vez por acceso se obtienen los hits de todas las asociatividades
+#con ese numero de conjuntos, y con S=1 los de todos los tamaños totalmente asociativos.
+#Cada numero de conjuntos distinto necesita su propia pasada vectorizada: con asociatividad fija
+#cada tamaño tiene otro numero de conjuntos, asi que ahi el costo crece con la cantidad de tamaños.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cpu.traza import EV_LOAD, EV_STORE, RingBufferSink, Tracer, TRACE_EVENTS
+
+#Distancia de un acceso que nunca habia visto su bloque (fallo obligatorio)
+COLD = -1
+
+
+#Funcion addresses_from_trace que extrae las direcciones de datos de una traza de la CPU
+#loads / stores indican que accesos se incluyen
+def addresses_from_trace(records, loads=True, stores=False):
+    kinds = set()
+    if loads:
+        kinds.add(EV_LOAD)
+    if stores:
+        kinds.add(EV_STORE)
+    return [args[0] for kind, _, args in records if kind in kinds]
+
+
+#Funcion record_addresses que corre una PipelinedCPU una vez y devuelve su flujo de direcciones
+def record_addresses(cpu, loads=True, stores=False):
+    tracer = Tracer(TRACE_EVENTS, RingBufferSink(capacity=None))
+    cpu.set_tracer(tracer)
+    cpu.run()
+    cpu.set_tracer(None)
+    return addresses_from_trace(tracer.sink.events, loads, stores)
+
+
+#Funcion stack_distances que calcula la distancia de pila de cada acceso
+#blocks: numeros de bloque accedidos (direccion // block_size), en orden
+#num_sets: numero de conjuntos; la distancia solo cuenta bloques del mismo conjunto
+#Retorna las distancias en el orden de los accesos, COLD para el primer acceso a cada bloque
+def stack_distances(blocks, num_sets=1):
+    if np is not None:
+        return _stack_distances_numpy(np.asarray(blocks, dtype=np.int64), num_sets)
+    return _stack_distances_python(list(blocks), num_sets)
+
+
+#Si p es el acceso anterior al mismo bloque que i, los accesos j entre p e i que son el primero
+#de su bloque dentro de ese intervalo son los que cumplen prev[j] <= p, entonces:
+#distancia(i) = (i - p - 1) - #{j < i : prev[j] > p}
+#Agrupando los accesos por conjunto (orden estable) la formula sigue valiendo en el arreglo
+#reordenado, porque cada conjunto queda contiguo y conserva su orden
+
+def _stack_distances_numpy(blocks, num_sets):
+    n = len(blocks)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    if num_sets > 1:
+        order = np.argsort(blocks % num_sets, kind='stable')
+        grouped = blocks[order]
+    else:
+        order = None
+        grouped = blocks
+    #prev: posicion del acceso anterior al mismo bloque (-1 si no hay)
+    by_block = np.argsort(grouped, kind='stable')
+    same = grouped[by_block[1:]] == grouped[by_block[:-1]]
+    prev = np.full(n, -1, dtype=np.int64)
+    prev[by_block[1:][same]] = by_block[:-1][same]
+    greater = _count_previous_greater(prev)
+    distances = np.arange(n, dtype=np.int64) - prev - 1 - greater
+    distances[prev < 0] = COLD
+    if order is None:
+        return distances
+    result = np.empty(n, dtype=np.int64)
+    result[order] = distances
+    return result
+
+
+#Cuenta, para cada i, cuantos j < i tienen values[j] > values[i]
+#Es un merge sort por niveles: en cada nivel, para cada par de bloques (izquierdo, derecho) se
+#buscan los elementos del derecho en el izquierdo ya ordenado; todos los pares de un nivel se
+#resuelven con un solo sort y un solo searchsorted desplazando los valores por el numero de par
+def _count_previous_greater(values):
+    n = len(values)
+    counts = np.zeros(n, dtype=np.int64)
+    positions = np.arange(n, dtype=np.int64)
+    shifted = values - values.min()
+    span = int(shifted.max()) + 2
+    width = 1
+    while width < n:
+        pair = positions // (2 * width)
+        is_right = (positions // width) % 2 == 1
+        left = ~is_right
+        left_keys = np.sort(pair[left] * span + shifted[left])
+        right_pairs = pair[is_right] * span
+        #Elementos <= valor dentro del bloque izquierdo (completo, de tamaño width) del mismo par
+        upto = np.searchsorted(left_keys, right_pairs + shifted[is_right], side='right')
+        start = np.searchsorted(left_keys, right_pairs, side='left')
+        counts[is_right] += width - (upto - start)
+        width *= 2
+    return counts
+
+
+#Version sin NumPy: arbol de Fenwick sobre las posiciones que todavia son el ultimo acceso de su bloque
+def _stack_distances_python(blocks, num_sets):
+    n = len(blocks)
+    distances = [COLD] * n
+    groups = {}
+    for i, block in enumerate(blocks):
+        groups.setdefault(block % num_sets, []).append(i)
+    for indices in groups.values():
+        size = len(indices)
+        tree = [0] * (size + 1)
+        last = {}
+        for k, i in enumerate(indices):
+            block = blocks[i]
+            p = last.get(block)
+            if p is not None:
+                #Ultimos accesos vivos entre p y k (sin contar p)
+                total = 0
+                j = k
+                while j > 0:
+                    total += tree[j]
+                    j -= j & -j
+                j = p + 1
+                while j > 0:
+                    total -= tree[j]
+                    j -= j & -j
+                distances[i] = total
+                j = p + 1
+                while j <= size:
+                    tree[j] -= 1
+                    j += j & -j
+            last[block] = k
+            j = k + 1
+            while j <= size:
+                tree[j] += 1
+                j += j & -j
+    return distances
+
+
+#Funcion reuse_histogram que agrupa las distancias: histogram[d] = accesos con distancia d
+#Retorna (histogram, cold) con cold = numero de fallos obligatorios
+def reuse_histogram(addresses, block_size, num_sets=1):
+    if np is not None:
+        blocks = np.asarray(addresses, dtype=np.int64) // block_size
+        distances = stack_distances(blocks, num_sets)
+        cold = int(np.count_nonzero(distances == COLD))
+        histogram = np.bincount(distances[distances != COLD]).tolist()
+        return histogram, cold
+    distances = stack_distances([address // block_size for address in addresses], num_sets)
+    histogram = []
+    cold = 0
+    for distance in distances:
+        if distance == COLD:
+            cold += 1
+            continue
+        if distance >= len(histogram):
+            histogram.extend([0] * (distance + 1 - len(histogram)))
+        histogram[distance] += 1
+    return histogram, cold
+
+
+#Funcion sweep que calcula hits y misses de una cache LRU para muchos tamaños a la vez
+#addresses: flujo de direcciones (por ejemplo de record_addresses)
+#block_size: tamaño de bloque comun a todas las configuraciones
+#associativity: vias por conjunto, o None para caches totalmente asociativas
+#sizes: numeros de lineas (num_lines de Cache) a evaluar
+#Equivale a simular Cache(num_lines, block_size, associativity) leyendo esas direcciones.
+#Los tamaños se agrupan por numero de conjuntos y se hace una pasada por grupo: con
+#associativity=None todos los tamaños salen de una sola pasada, pero con asociatividad fija cada
+#tamaño es un grupo propio y el barrido cuesta aproximadamente una pasada (del orden de una
+#simulacion de la Cache) por tamaño
+def sweep(addresses, block_size, associativity, sizes):
+    configs = []
+    for num_lines in sizes:
+        if associativity is None:
+            configs.append((num_lines, 1, num_lines))
+            continue
+        if num_lines % associativity:
+            raise ValueError(f"La asociatividad {associativity} debe dividir el número de líneas {num_lines}")
+        configs.append((num_lines, num_lines // associativity, associativity))
+    histograms = {}
+    for _, num_sets, _ in configs:
+        if num_sets not in histograms:
+            histograms[num_sets] = reuse_histogram(addresses, block_size, num_sets)
+    results = []
+    total = len(addresses)
+    for num_lines, num_sets, ways in configs:
+        histogram, _ = histograms[num_sets]
+        hits = sum(histogram[:ways])
+        results.append({
+            'num_lines': num_lines,
+            'block_size': block_size,
+            'associativity': ways,
+            'hits': hits,
+            'misses': total - hits,
+        })
+    return results
@@ -0,0 +1,239 @@
+from memoria.cache import Cache
+
+#Direccion a partir de la cual se ubican las instrucciones en la L2/L3 unificada,
+#lejos de la memoria de datos para que los bloques de codigo y de datos no se mezclen
+CODE_BASE = 1 << 40
+
+
+#Clase CacheHierarchy que compone varios niveles de cache: L1I y L1D separadas,
+#L2 unificada y opcionalmente L3, sobre la memoria principal
+#Tiene la misma interfaz que Cache (read, write, hits, misses...) asi PipelinedCPU la usa igual
+class CacheHierarchy:
+    #Constructor que recibe como parametros las caches de cada nivel (Cache ya configuradas)
+    #l1d es obligatoria; l1i, l2 y l3 son opcionales
+    #code_base: direccion donde empieza el codigo dentro del espacio unificado
+    #Los niveles de datos tienen que ser todos de solo tags o todos con datos: entre niveles de solo
+    #tags los bloques no llevan valores
+    def __init__(self, l1d, l1i=None, l2=None, l3=None, code_base=CODE_BASE):
+        if len({level.tag_only for level in (l1d, l2, l3) if level is not None}) > 1:
+            raise ValueError("Los niveles de datos de la jerarquía deben ser todos de solo tags o todos con datos")
+        self.l1d = l1d
+        self.l1i = l1i
+        self.l2 = l2
+        self.l3 = l3
+        self.code_base = code_base
+        self.levels = [level for level in (l1i, l1d, l2, l3) if level is not None]
+        #Los niveles quedan enlazados desde ya, asi los fallos de la L1I bajan a la L2 aunque todavia
+        #no haya habido ningun acceso a datos; la memoria se conecta en el primer read/write
+        self.memory = None
+        self.bind(None)
+
+    #Metodo bind que conecta cada nivel con el siguiente, el ultimo con main_memory
+    def bind(self, main_memory):
+        lower = main_memory
+        if self.l3 is not None:
+            self.l3.next_level = lower
+            lower = self.l3
+        if self.l2 is not None:
+            self.l2.next_level = lower
+            lower = self.l2
+        self.l1d.next_level = lower
+        if self.l1i is not None:
+            self.l1i.next_level = lower
+        self.memory = main_memory
+        for level in self.levels:
+            level.bind_memory(None)
+
+    #Metodo read: lectura de datos por la L1D (los misses bajan por la jerarquia)
+    def read(self, address, main_memory, pc=None):
+        if main_memory is not self.memory:
+            self.bind(main_memory)
+        return self.l1d.read(address, self.l1d.next_level, pc)
+
+    #Metodo write: escritura de datos por la L1D
+    def write(self, address, value, main_memory):
+        if main_memory is not self.memory:
+            self.bind(main_memory)
+        self.l1d.write(address, value, self.l1d.next_level)
+
+    #Metodo fetch: busqueda de la instruccion pc por la L1I (si hay)
+    def fetch(self, pc):
+        if self.l1i is not None:
+            self.l1i.fetch(self.code_base + pc)
+
+    #Metodo flush que copia a memoria todas las lineas sucias, de arriba hacia abajo
+    def flush(self):
+        for level in self.levels:
+            level.flush()
+
+    #Metodo invalidate_range que saca los bloques de [start, start + size) de los niveles de datos,
+    #de arriba hacia abajo para que las lineas sucias bajen hasta la memoria
+    def invalidate_range(self, start, size, main_memory=None):
+        if main_memory is not None and main_memory is not self.memory:
+            self.bind(main_memory)
+        return sum(level.invalidate_range(start, size) for level in self.levels if level is not self.l1i)
+
+    #Metodo clear que vacia todos los niveles, de arriba hacia abajo para que las lineas sucias
+    #de la L1 lleguen a la L2 antes de vaciarla
+    def clear(self, main_memory=None):
+        if main_memory is not None and main_memory is not self.memory:
+            self.bind(main_memory)
+        for level in self.levels:
+            level.clear()
+
+    def set_tracer(self, tracer):
+        for level in self.levels:
+            level.set_tracer(tracer)
+
+    @property
+    def tracer(self):
+        return self.l1d.tracer
+
+    #Niveles presentes con su clave de configuracion ('l1i', 'l1d', 'l2', 'l3')
+    def named_levels(self):
+        return [(key, level) for key, level in (('l1i', self.l1i), ('l1d', self.l1d), ('l2', self.l2), ('l3', self.l3))
+                if level is not None]
+
+    #Metodo config con el mismo formato que recibe build_hierarchy
+    def config(self):
+        config = {key: level.config() for key, level in self.named_levels()}
+        config['code_base'] = self.code_base
+        return config
+
+    #Metodo get_state: estado de cada nivel (ver Cache.get_state), con los datos de todos seguidos
+    def get_state(self):
+        meta = {}
+        data = []
+        for key, level in self.named_levels():
+            meta[key], level_data = level.get_state()
+            data.extend(level_data)
+        return meta, data
+
+    def set_state(self, meta, data, offset=0):
+        for key, level in self.named_levels():
+            offset = level.set_state(meta[key], data, offset)
+        return offset
+
+    #hits y misses de la jerarquia son los de la L1D, igual que con una sola cache
+    @property
+    def hits(self):
+        return self.l1d.hits
+
+    @property
+    def misses(self):
+        return self.l1d.misses
+
+    @property
+    def set_evictions(self):
+        return self.l1d.set_evictions
+
+    #Latencia de la ultima lectura y parametros de tiempo de la L1D, igual que con una sola cache
+    @property
+    def latency(self):
+        return self.l1d.latency
+
+    @property
+    def hit_latency(self):
+        return self.l1d.hit_latency
+
+    @property
+    def mshr(self):
+        return self.l1d.mshr
+
+    @property
+    def timed(self):
+        return any(level.timed for level in self.levels)
+
+    @property
+    def prefetching(self):
+        return any(level.prefetching for level in self.levels)
+
+    def set_clock(self, clock):
+        for level in self.levels:
+            level.set_clock(clock)
+
+    def settle(self):
+        for level in self.levels:
+            level.settle()
+
+    #Metodo drain_writes que vacia los buffers de escritura de arriba hacia abajo (lo que sale de L1
+    #puede quedar en el buffer de L2)
+    def drain_writes(self, main_memory=None):
+        if main_memory is not None and main_memory is not self.memory:
+            self.bind(main_memory)
+        for level in self.levels:
+            level.drain_writes()
+
+    #Metodo prefetch_metrics con las metricas del prefetcher de cada nivel que tiene uno ('l2_prefetch_accuracy', ...)
+    def prefetch_metrics(self):
+        metrics = {}
+        for level in self.levels:
+            if level.prefetching:
+                for key, value in level.prefetch_metrics().items():
+                    metrics[f"{level.name.lower()}_{key}"] = value
+        return metrics
+
+    @property
+    def buffering(self):
+        return any(level.buffering for level in self.levels)
+
+    #Buffer de escritura de la L1D y espera del ultimo STORE, igual que con una sola cache
+    @property
+    def write_buffer(self):
+        return self.l1d.write_buffer
+
+    @property
+    def write_stall(self):
+        return self.l1d.write_stall
+
+    #Metodo buffer_metrics con las metricas del buffer de escritura y la victim cache de cada nivel
+    #que tiene alguno ('l1d_memory_writes', 'l2_conflict_reduction', ...)
+    def buffer_metrics(self):
+        metrics = {}
+        for level in self.levels:
+            if level.buffering:
+                for key, value in level.buffer_metrics().items():
+                    metrics[f"{level.name.lower()}_{key}"] = value
+        return metrics
+
+    def reset_stats(self):
+        for level in self.levels:
+            level.reset_stats()
+
+    #Metodo stats que devuelve los contadores de cada nivel: {'L1D': {...}, 'L2': {...}}
+    def stats(self):
+        return {level.name: level.stats() for level in self.levels}
+
+    #Metodo level_metrics que aplana stats() en claves como 'l2_writebacks' para las metricas de run()
+    def level_metrics(self):
+        metrics = {}
+        for level in self.levels:
+            for key, value in level.stats().items():
+                metrics[f"{level.name.lower()}_{key}"] = value
+        return metrics
+
+
+#Configuracion por defecto: L1I y L1D de 16 lineas, L2 unificada de 64 lineas 4-way,
+#las tres write-back con write-allocate
+DEFAULT_CONFIG = {
+    'l1i': {'num_lines': 16, 'block_size': 8},
+    'l1d': {'num_lines': 16, 'block_size': 8, 'write_back': True, 'write_allocate': True},
+    'l2': {'num_lines': 64, 'block_size': 8, 'associativity': 4, 'write_back': True, 'write_allocate': True},
+}
+
+
+#Funcion build_hierarchy que arma la jerarquia a partir de un diccionario
+#{'l1i': {...}, 'l1d': {...}, 'l2': {...}, 'l3': {...}} con los parametros de Cache de cada nivel
+def build_hierarchy(config=None, tracer=None):
+    if config is None:
+        config = DEFAULT_CONFIG
+    levels = {}
+    for key in ('l1i', 'l1d', 'l2', 'l3'):
+        options = config.get(key)
+        if options is not None:
+            options = dict(options)
+            options.setdefault('name', key.upper())
+            levels[key] = Cache(tracer=tracer, **options)
+    if 'l1d' not in levels:
+        raise ValueError("La jerarquía necesita al menos una L1D")
+    return CacheHierarchy(code_base=config.get('code_base', CODE_BASE), **levels)
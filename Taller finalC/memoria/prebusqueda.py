@@ -0,0 +1,185 @@
+from collections import deque
+
+#Prefetchers de la cache de datos: deciden que bloques traer antes de que una lectura los pida
+#La cache (memoria/cache.py) es la que los trae, lleva la cuenta de cuales se usaron y mide si
+#llegaron tarde; el prefetcher solo elige los bloques
+#Todos tienen la misma interfaz:
+#access(address, pc, trigger): se llama en cada lectura de la cache; pc es la instruccion que lee
+#(None si no se conoce) y trigger es True en un fallo o en el primer uso de un bloque prebuscado
+#Retorna los bloques a traer (la cache descarta los que ya tiene)
+#buffered: False si los bloques van a las lineas de la cache, True si quedan en un buffer propio
+#get_state() / set_state(state): estado interno como listas, para los checkpoints
+#degree: cuantos bloques se piden por vez; distance: a cuantos bloques (o pasos) por delante empieza
+#default_degree: el degree que usa make_prefetcher si no se le pasa uno
+
+
+#Clase NextLinePrefetcher: en un fallo (o al usar por primera vez un bloque prebuscado) pide los
+#degree bloques que siguen a partir de block + distance
+class NextLinePrefetcher:
+    buffered = False
+    default_degree = 1
+
+    def __init__(self, block_size, degree=1, distance=1):
+        self.block_size = block_size
+        self.degree = degree
+        self.distance = distance
+
+    def access(self, address, pc, trigger):
+        if not trigger:
+            return ()
+        first = address // self.block_size + self.distance
+        return range(first, first + self.degree)
+
+    def get_state(self):
+        return []
+
+    def set_state(self, state):
+        pass
+
+
+#Clase StridePrefetcher: tabla indexada por el PC del LOAD con la ultima direccion, el paso y la
+#confianza; cuando el mismo paso se repite pide las direcciones address + paso * (distance + i)
+#Sin PC (lecturas que llegan de otra cache) toda la cache comparte una sola entrada
+#entries: tamaño de la tabla; al llenarse se descarta la entrada mas vieja
+class StridePrefetcher:
+    buffered = False
+    default_degree = 1
+
+    def __init__(self, block_size, degree=1, distance=1, entries=64):
+        self.block_size = block_size
+        self.degree = degree
+        self.distance = distance
+        self.entries = entries
+        #pc -> [ultima direccion, paso, confianza]
+        self.table = {}
+
+    def access(self, address, pc, trigger):
+        entry = self.table.get(pc)
+        if entry is None:
+            if len(self.table) >= self.entries:
+                del self.table[next(iter(self.table))]
+            self.table[pc] = [address, 0, 0]
+            return ()
+        stride = address - entry[0]
+        entry[0] = address
+        if stride == 0:
+            return ()
+        if stride != entry[1]:
+            entry[1] = stride
+            entry[2] = 0
+            return ()
+        entry[2] += 1
+        block = address // self.block_size
+        blocks = []
+        for step in range(self.distance, self.distance + self.degree):
+            target = (address + stride * step) // self.block_size
+            if target != block and target not in blocks:
+                blocks.append(target)
+        return blocks
+
+    def get_state(self):
+        return [[pc, *entry] for pc, entry in self.table.items()]
+
+    def set_state(self, state):
+        self.table = {pc: [address, stride, confidence] for pc, address, stride, confidence in state}
+
+
+#Clase StreamBuffer: buffers FIFO aparte de la cache (Jouppi); un fallo que no esta en ningun
+#buffer arranca un flujo nuevo con los degree bloques desde block + distance (reemplaza al flujo
+#usado hace mas tiempo) y un fallo que encuentra su bloque en un buffer lo pasa a la cache,
+#descarta los anteriores de ese flujo y pide los siguientes para que el buffer vuelva a tener degree
+#Los bloques del buffer no ocupan lineas: un flujo equivocado no ensucia la cache
+#streams: numero de flujos (buffers) que se siguen a la vez
+class StreamBuffer:
+    buffered = True
+    #Con un solo bloque por flujo seria casi lo mismo que next_line
+    default_degree = 4
+
+    def __init__(self, block_size, degree=default_degree, distance=1, streams=4):
+        self.block_size = block_size
+        self.degree = degree
+        self.distance = distance
+        self.max_streams = streams
+        #Flujos del usado hace mas tiempo al mas reciente; cada uno es [siguiente bloque, entradas]
+        #y cada entrada es (bloque, ciclo en que llega)
+        self.streams = []
+        #Bloques descartados sin usar; la cache los suma a sus contadores y lo vuelve a 0
+        self.dropped = 0
+        self._taken = False
+
+    #Metodo take que saca el bloque de su buffer si esta (lo llama la cache en un fallo)
+    #Retorna el ciclo en que llega el bloque o None si no estaba en ningun buffer
+    def take(self, block):
+        for index, (_, entries) in enumerate(self.streams):
+            for position, (candidate, ready) in enumerate(entries):
+                if candidate == block:
+                    for _ in range(position + 1):
+                        entries.popleft()
+                    self.dropped += position
+                    self.streams.append(self.streams.pop(index))
+                    self._taken = True
+                    return ready
+        return None
+
+    def access(self, address, pc, trigger):
+        if not trigger:
+            return ()
+        if self._taken:
+            self._taken = False
+            stream = self.streams[-1]
+            first = stream[0]
+        else:
+            if len(self.streams) >= self.max_streams:
+                self.dropped += len(self.streams.pop(0)[1])
+            first = address // self.block_size + self.distance
+            stream = [first, deque()]
+            self.streams.append(stream)
+        count = self.degree - len(stream[1])
+        stream[0] = first + count
+        return range(first, first + count)
+
+    #Metodo insert que guarda en el flujo mas reciente un bloque pedido por access
+    def insert(self, block, ready):
+        self.streams[-1][1].append((block, ready))
+
+    #Metodo settle que da por llegados todos los bloques del buffer
+    def settle(self):
+        for stream in self.streams:
+            stream[1] = deque((block, 0) for block, _ in stream[1])
+
+    def get_state(self):
+        return [[first, [list(entry) for entry in entries]] for first, entries in self.streams]
+
+    def set_state(self, state):
+        self.streams = [[first, deque(tuple(entry) for entry in entries)] for first, entries in state]
+
+
+#Nombres de los prefetchers disponibles
+PREFETCHERS = {
+    'next_line': NextLinePrefetcher,
+    'stride': StridePrefetcher,
+    'stream': StreamBuffer,
+}
+
+
+#Devuelve el nombre (clave de PREFETCHERS) de un prefetcher ya creado, o None si es una clase propia
+def prefetcher_name(prefetcher):
+    for name, cls in PREFETCHERS.items():
+        if type(prefetcher) is cls:
+            return name
+    return None
+
+
+#Crea el prefetcher a partir de su nombre o de una clase con la misma interfaz
+#degree None usa el default_degree de la clase (1 si no lo tiene)
+def make_prefetcher(prefetcher, block_size, degree=None, distance=1):
+    if isinstance(prefetcher, str):
+        try:
+            prefetcher = PREFETCHERS[prefetcher]
+        except KeyError:
+            raise ValueError(f"Prefetcher desconocido: {prefetcher}") from None
+    if degree is None:
+        degree = getattr(prefetcher, 'default_degree', 1)
+    if degree < 1 or distance < 1:
+        raise ValueError(f"El grado ({degree}) y la distancia ({distance}) del prefetcher deben ser al menos 1")
+    return prefetcher(block_size, degree, distance)
@@ -0,0 +1,109 @@
+import mmap
+from array import array
+
+from cpu.registros import wrap
+
+
+#Clase DataMemory que simula la memoria de datos (RAM) de la CPU
+#Las palabras se guardan en un array de enteros de tamaño fijo (por defecto 'q', 64 bits con signo)
+#o en un memoryview sobre un archivo mapeado con mmap, asi una imagen grande se usa sin copiarla
+#Se comporta como la lista de antes: memory[i], memory[i] = v, len(memory) y memory[a:b] (copia)
+#Un valor que no entra en la palabra se trunca (complemento a dos, o modulo 2**bits si el tipo es sin signo)
+class DataMemory:
+    #Constructor que recibe como parametros
+    #size: numero de palabras de la memoria
+    #typecode: tipo de cada palabra segun el modulo array
+    def __init__(self, size=256, typecode='q'):
+        self.typecode = typecode
+        self.words = array(typecode, [0]) * size
+        self._mmap = None
+        self._file = None
+
+    #Crea una memoria con el contenido de values, del tamaño indicado (o justo el de values)
+    @classmethod
+    def from_values(cls, values, size=None, typecode='q'):
+        values = array(typecode, values)
+        memory = cls(max(size or 0, len(values)), typecode)
+        memory.load(values)
+        return memory
+
+    #Crea una memoria respaldada por un archivo binario mapeado en memoria
+    #Con writable=False el mapeo es copy-on-write: los STORE no modifican el archivo
+    @classmethod
+    def from_file(cls, path, typecode='q', writable=False):
+        memory = cls.__new__(cls)
+        memory.typecode = typecode
+        memory._file = open(path, 'r+b' if writable else 'rb')
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_COPY
+        memory._mmap = mmap.mmap(memory._file.fileno(), 0, access=access)
+        memory.words = memoryview(memory._mmap).cast(typecode)
+        return memory
+
+    #Copia en bloque los valores a partir de la direccion start
+    def load(self, values, start=0):
+        if not isinstance(values, array) or values.typecode != self.typecode:
+            try:
+                values = array(self.typecode, values)
+            except OverflowError:
+                values = array(self.typecode, [self.fit(value) for value in values])
+        self.words[start:start + len(values)] = values
+
+    #Trunca un valor al tamaño de palabra de la memoria
+    def fit(self, value):
+        bits = self.words.itemsize * 8
+        if self.typecode.isupper():
+            return value & ((1 << bits) - 1)
+        return wrap(value, bits)
+
+    #Devuelve una copia (lista) de size palabras a partir de start, la usa la cache para llenar una linea
+    def read_block(self, start, size):
+        return self.words[start:start + size].tolist()
+
+    #Escribe en bloque una lista de palabras a partir de start
+    def write_block(self, start, values):
+        self.load(values, start)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.words[index].tolist()
+        return self.words[index]
+
+    def __setitem__(self, index, value):
+        try:
+            self.words[index] = value
+        except (OverflowError, ValueError):
+            # Un memoryview (memoria sobre mmap) rechaza con ValueError los valores que no entran
+            if isinstance(index, slice):
+                raise
+            self.words[index] = self.fit(value)
+
+    def __len__(self):
+        return len(self.words)
+
+    def tolist(self):
+        return self.words.tolist()
+
+    def tobytes(self):
+        return self.words.tobytes()
+
+    #Guarda la imagen de la memoria en un archivo binario, se puede volver a abrir con from_file
+    def dump(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.words)
+
+    @property
+    def nbytes(self):
+        return len(self.words) * self.words.itemsize
+
+    #Libera el mapeo del archivo (si lo hay)
+    def close(self):
+        if self._mmap is not None:
+            self.words.release()
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+            self.words = array(self.typecode)
+
+    def __repr__(self):
+        return f"DataMemory(size={len(self.words)}, typecode='{self.typecode}')"
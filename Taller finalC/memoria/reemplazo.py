@@ -0,0 +1,134 @@
+from collections import OrderedDict
+
+#Politicas de reemplazo de la cache asociativa por conjuntos
+#Todas tienen la misma interfaz, por conjunto (set_index) y via (way):
+#touch(set_index, way): la via fue usada en un hit
+#insert(set_index, way): la via se acaba de llenar con un bloque nuevo
+#victim(set_index): elige la via a reemplazar cuando el conjunto esta lleno
+#get_state() / set_state(state): estado interno como listas de enteros, para los checkpoints
+#Las vias invalidas las administra la cache, la politica solo decide entre vias validas
+
+
+#Clase LRUPolicy: reemplaza la via usada hace mas tiempo
+#Cada conjunto guarda sus vias en un OrderedDict ordenado de la menos a la mas reciente,
+#mover una via al final y leer la primera cuesta O(1) sin importar la asociatividad
+class LRUPolicy:
+    def __init__(self, num_sets, ways, seed=0):
+        self.order = [OrderedDict() for _ in range(num_sets)]
+
+    def touch(self, set_index, way):
+        self.order[set_index].move_to_end(way)
+
+    def insert(self, set_index, way):
+        order = self.order[set_index]
+        order[way] = None
+        order.move_to_end(way)
+
+    def victim(self, set_index):
+        return next(iter(self.order[set_index]))
+
+    def get_state(self):
+        return [list(order) for order in self.order]
+
+    def set_state(self, state):
+        self.order = [OrderedDict.fromkeys(ways) for ways in state]
+
+
+#Clase FIFOPolicy: reemplaza la via que lleva mas tiempo en la cache
+#Igual que LRU pero los hits no cambian el orden
+class FIFOPolicy(LRUPolicy):
+    def touch(self, set_index, way):
+        pass
+
+
+#Clase RandomPolicy: reemplaza una via al azar, con semilla propia para que sea reproducible
+class RandomPolicy:
+    def __init__(self, num_sets, ways, seed=0):
+        import random
+
+        self.ways = ways
+        self.rng = random.Random(seed)
+
+    def touch(self, set_index, way):
+        pass
+
+    def insert(self, set_index, way):
+        pass
+
+    def victim(self, set_index):
+        return self.rng.randrange(self.ways)
+
+    #El estado del generador es (version, tupla de enteros, gauss_next)
+    def get_state(self):
+        version, internal, gauss_next = self.rng.getstate()
+        return [version, list(internal), gauss_next]
+
+    def set_state(self, state):
+        version, internal, gauss_next = state
+        self.rng.setstate((version, tuple(internal), gauss_next))
+
+
+#Clase TreePLRUPolicy: pseudo-LRU con un arbol binario de bits por conjunto
+#Cada nodo interno apunta a la mitad usada hace menos tiempo; touch y victim recorren
+#una sola rama, es decir log2(vias) pasos (a lo sumo 10 con 1024 vias)
+class TreePLRUPolicy:
+    def __init__(self, num_sets, ways, seed=0):
+        if ways & (ways - 1):
+            raise ValueError(f"Tree-PLRU necesita una asociatividad potencia de 2, no {ways}")
+        self.levels = ways.bit_length() - 1
+        self.bits = [[0] * max(ways - 1, 1) for _ in range(num_sets)]
+
+    def touch(self, set_index, way):
+        bits = self.bits[set_index]
+        node = 0
+        for level in range(self.levels - 1, -1, -1):
+            direction = (way >> level) & 1
+            #El nodo queda apuntando a la otra mitad
+            bits[node] = direction ^ 1
+            node = 2 * node + 1 + direction
+
+    def insert(self, set_index, way):
+        self.touch(set_index, way)
+
+    def victim(self, set_index):
+        bits = self.bits[set_index]
+        node = 0
+        way = 0
+        for _ in range(self.levels):
+            direction = bits[node]
+            way = (way << 1) | direction
+            node = 2 * node + 1 + direction
+        return way
+
+    def get_state(self):
+        return [list(bits) for bits in self.bits]
+
+    def set_state(self, state):
+        self.bits = [list(bits) for bits in state]
+
+
+#Nombres de las politicas disponibles
+POLICIES = {
+    'lru': LRUPolicy,
+    'plru': TreePLRUPolicy,
+    'fifo': FIFOPolicy,
+    'random': RandomPolicy,
+}
+
+
+#Devuelve el nombre (clave de POLICIES) de una politica ya creada, o None si es una clase propia
+def policy_name(policy):
+    for name, cls in POLICIES.items():
+        if type(policy) is cls:
+            return name
+    return None
+
+
+#Crea la politica de reemplazo a partir de su nombre o de una clase con la misma interfaz
+def make_policy(policy, num_sets, ways, seed=0):
+    if isinstance(policy, str):
+        try:
+            policy = POLICIES[policy]
+        except KeyError:
+            raise ValueError(f"Política de reemplazo desconocida: {policy}") from None
+    return policy(num_sets, ways, seed)